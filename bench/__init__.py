@@ -0,0 +1 @@
+"""benchmarks of the sync, run as scripts (see benchmark.py)"""
@@ -0,0 +1,507 @@
+#! /usr/bin/env python
+""" benchmark
+times full, incremental and no-op syncs of generated rdf-dump trees,
+against the MemoryRDFStore and a local stand-in sparql endpoint
+
+run as:  python bench/benchmark.py --help
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import rdflib
+from rdflib import BNode, Dataset, Graph, URIRef
+
+from syncfstriples import SyncFsTriples
+from syncfstriples.options import SyncOptions
+
+log = getLogger(__name__)
+
+SUFFIX_BY_FORMAT = {"turtle": ".ttl", "nt": ".nt", "json-ld": ".jsonld"}
+FORMAT_BY_CONTENT_TYPE = {
+    "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "application/ld+json": "json-ld",
+}
+STORE_KINDS = ("memory", "standin")
+SCENARIOS = ("full", "incremental", "noop")
+FOLDER_FANOUT = 4
+SPARQL_PATH = "/sparql"
+GSP_PATH = "/rdf-graphs"
+EXAMPLE_BASE = "https://example.org/"
+
+
+class CorpusFile(NamedTuple):
+    """a generated rdf-dump file and what it was generated from"""
+
+    fpath: Path
+    first: int  # number of the first triple, see make_corpus_graph
+    triples: int
+    bnodes: bool
+
+
+def parse_format_mix(spec: str) -> Dict[str, int]:
+    """parses a format mix like 'turtle:2,nt:1' into weights by format"""
+    mix: Dict[str, int] = dict()
+    for part in spec.split(","):
+        format, _, weight = part.strip().partition(":")
+        assert format in SUFFIX_BY_FORMAT, "unsupported format " + format
+        mix[format] = int(weight or 1)
+    return mix
+
+
+def generate_corpus(
+    root: Path,
+    files: int = 100,
+    depth: int = 2,
+    triples: int = 100,
+    format_mix: Dict[str, int] = None,
+    bnode_ratio: float = 0.0,
+    seed: int = 0,
+) -> List[CorpusFile]:
+    """generates a tree of rdf-dump files with sample graphs
+
+    :param root: the folder to generate the files in
+    :type root: Path
+    :param files: the number of files
+    :type files: int
+    :param depth: the max number of nested folders to put files in
+    :type depth: int
+    :param triples: the number of triples per file
+    :type triples: int
+    :param format_mix: the relative weight of each format in the tree
+        optional - defaults to None meaning all turtle
+    :type format_mix: Dict[str, int]
+    :param bnode_ratio: the part of the files having blank node subjects
+    :type bnode_ratio: float
+    :param seed: seed of the random choices of formats and blank nodes
+    :type seed: int
+    :returns: the generated files
+    :rtype: List[CorpusFile]
+    """
+    format_mix = format_mix or {"turtle": 1}
+    formats, weights = list(format_mix), list(format_mix.values())
+    rnd = random.Random(seed)
+    corpus: List[CorpusFile] = list()
+    for n in range(files):
+        format: str = rnd.choices(formats, weights)[0]
+        bnodes: bool = rnd.random() < bnode_ratio
+        level: int = n % (depth + 1)
+        folder: Path = root.joinpath(
+            *(f"d{k}-{(n // (k + 1)) % FOLDER_FANOUT}" for k in range(level))
+        )
+        folder.mkdir(parents=True, exist_ok=True)
+        entry = CorpusFile(
+            folder / f"dump-{n:06d}{SUFFIX_BY_FORMAT[format]}",
+            n * triples,
+            triples,
+            bnodes,
+        )
+        write_corpus_file(entry)
+        corpus.append(entry)
+    return corpus
+
+
+def make_corpus_graph(first: int, triples: int, bnodes: bool) -> Graph:
+    """makes the graph of a corpus file, a triple per number following
+    the pattern https://example.org/{part}-{number}
+
+    :param first: the number of the first triple
+    :type first: int
+    :param triples: the number of triples
+    :type triples: int
+    :param bnodes: use blank nodes as subjects
+    :type bnodes: bool
+    :returns: the graph
+    :rtype: Graph
+    """
+    graph = Graph()
+    for n in range(first, first + triples):
+        subject = BNode() if bnodes else URIRef(EXAMPLE_BASE + f"subject-{n}")
+        graph.add(
+            (
+                subject,
+                URIRef(EXAMPLE_BASE + f"predicate-{n}"),
+                URIRef(EXAMPLE_BASE + f"object-{n}"),
+            )
+        )
+    return graph
+
+
+def write_corpus_file(entry: CorpusFile) -> None:
+    """(re)writes the file of the corpus entry"""
+    graph = make_corpus_graph(entry.first, entry.triples, entry.bnodes)
+    suffix: str = entry.fpath.suffix
+    format: str = next(f for f, s in SUFFIX_BY_FORMAT.items() if s == suffix)
+    graph.serialize(destination=str(entry.fpath), format=format)
+
+
+def change_corpus(
+    corpus: List[CorpusFile], ratio: float = 0.1, seed: int = 0
+) -> List[CorpusFile]:
+    """changes a part of the files (one extra triple each), and removes
+    half as many others
+
+    :param corpus: the generated files
+    :type corpus: List[CorpusFile]
+    :param ratio: the part of the files to change
+    :type ratio: float
+    :param seed: seed of the random choice of files
+    :type seed: int
+    :returns: the remaining files
+    :rtype: List[CorpusFile]
+    """
+    rnd = random.Random(seed)
+    n_changed: int = int(len(corpus) * ratio)
+    picked = rnd.sample(range(len(corpus)), n_changed + n_changed // 2)
+    changed, removed = picked[:n_changed], set(picked[n_changed:])
+    remaining: List[CorpusFile] = list(corpus)
+    for n in changed:
+        entry = corpus[n]._replace(triples=corpus[n].triples + 1)
+        write_corpus_file(entry)
+        remaining[n] = entry
+    for n in removed:
+        corpus[n].fpath.unlink()
+    return [e for n, e in enumerate(remaining) if n not in removed]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """serves the sparql protocol (query and update) and the graph store
+    protocol (PUT and POST) on the rdflib Dataset of its endpoint
+    """
+
+    endpoint: "StandInEndpoint" = None
+
+    def log_message(self, format, *args):
+        log.debug("stand-in endpoint: " + format % args)
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks: List[bytes] = list()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _respond(self, status: int, payload: bytes = b"", ctype=None):
+        self.send_response(status)
+        if ctype is not None:
+            self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._sparql(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body: bytes = self._body()
+        if url.path == GSP_PATH:
+            return self._gsp(url.query, body, replace=False)
+        # else
+        ctype = self.headers.get("Content-Type", "").split(";")[0].strip()
+        params: Dict[str, List[str]] = parse_qs(url.query)
+        if ctype == "application/x-www-form-urlencoded":
+            params.update(parse_qs(body.decode("utf-8")))
+        elif ctype == "application/sparql-query":
+            params["query"] = [body.decode("utf-8")]
+        elif ctype == "application/sparql-update":
+            params["update"] = [body.decode("utf-8")]
+        self._sparql(params)
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        self._gsp(url.query, self._body(), replace=True)
+
+    def _sparql(self, params: Dict[str, List[str]]) -> None:
+        endpoint = self.endpoint
+        try:
+            if "update" in params:
+                with endpoint.lock:
+                    endpoint.requests += 1
+                    endpoint.dataset.update(params["update"][0])
+                return self._respond(204)
+            # else
+            if "query" not in params:
+                return self._respond(400, b"no query nor update")
+            # else
+            with endpoint.lock:
+                endpoint.requests += 1
+                result = endpoint.dataset.query(params["query"][0])
+                if result.type in ("SELECT", "ASK"):
+                    payload = result.serialize(format="json")
+                    ctype = "application/sparql-results+json"
+                else:
+                    payload = result.serialize(format="nt")
+                    ctype = "application/n-triples"
+            self._respond(200, payload, ctype)
+        except Exception as e:
+            log.exception("stand-in endpoint failed the request")
+            self._respond(400, str(e).encode("utf-8"), "text/plain")
+
+    def _gsp(self, query: str, body: bytes, replace: bool) -> None:
+        endpoint = self.endpoint
+        graph_uri = parse_qs(query).get("graph", [None])[0]
+        ctype = self.headers.get("Content-Type", "").split(";")[0].strip()
+        format = FORMAT_BY_CONTENT_TYPE.get(ctype)
+        if graph_uri is None or format is None:
+            return self._respond(400, b"need a graph and known content type")
+        # else
+        try:
+            with endpoint.lock:
+                endpoint.requests += 1
+                graph = endpoint.dataset.graph(URIRef(graph_uri))
+                if replace:
+                    graph.remove((None, None, None))
+                graph.parse(data=body, format=format, publicID=graph_uri)
+            self._respond(204)
+        except Exception as e:
+            log.exception("stand-in endpoint failed the upload")
+            self._respond(400, str(e).encode("utf-8"), "text/plain")
+
+
+class StandInEndpoint:
+    """A local sparql endpoint (with a graph store protocol endpoint) on an
+    in-memory rdflib Dataset, standing in for a triple store.
+    To be used as a context manager, serving from a background thread.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.dataset: Dataset = Dataset()
+        self.lock: Lock = Lock()
+        self.requests: int = 0
+        handler = type("Handler", (StandInHandler,), dict(endpoint=self))
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[Thread] = None
+
+    @property
+    def base_uri(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def sparql_uri(self) -> str:
+        return self.base_uri + SPARQL_PATH
+
+    @property
+    def gsp_uri(self) -> str:
+        return self.base_uri + GSP_PATH
+
+    def __enter__(self) -> "StandInEndpoint":
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_scenarios(
+    sft: SyncFsTriples,
+    corpus: List[CorpusFile],
+    change_ratio: float,
+    seed: int,
+) -> Iterable[Dict]:
+    """runs the full, incremental and no-op sync, yielding their reports"""
+    for scenario in SCENARIOS:
+        if scenario == "incremental":
+            corpus = change_corpus(corpus, change_ratio, seed)
+        report = sft.process().to_dict()
+        elapsed: float = report["elapsed"] or 1e-9
+        report.pop("file_seconds")
+        report.update(
+            scenario=scenario,
+            files_per_second=report["counters"]["files_scanned"] / elapsed,
+            triples_per_second=report["counters"]["triples"] / elapsed,
+        )
+        yield report
+
+
+def run_benchmark(
+    workdir: Path,
+    stores: Iterable[str] = STORE_KINDS,
+    files: int = 100,
+    depth: int = 2,
+    triples: int = 100,
+    format_mix: Dict[str, int] = None,
+    bnode_ratio: float = 0.0,
+    change_ratio: float = 0.1,
+    seed: int = 0,
+    repeat: int = 1,
+    options: SyncOptions = None,
+    state: bool = False,
+) -> Dict:
+    """runs the scenarios on a fresh copy of a generated corpus per store
+
+    :param workdir: folder to generate the corpus in
+    :type workdir: Path
+    :param stores: the kinds of store to sync to, of STORE_KINDS
+    :type stores: Iterable[str]
+    :param repeat: number of times to run the scenarios per store, keeping
+        the fastest run of each to dampen the noise
+    :type repeat: int
+    :param options: the settings of the syncs, see SyncOptions
+    :type options: SyncOptions
+    :param state: sync using a sync-state index
+    :type state: bool
+    :returns: the configuration, environment and results of the run
+    :rtype: Dict
+    """
+    config = dict(
+        files=files,
+        depth=depth,
+        triples=triples,
+        format_mix=format_mix or {"turtle": 1},
+        bnode_ratio=bnode_ratio,
+        change_ratio=change_ratio,
+        seed=seed,
+        repeat=repeat,
+        options=(options or SyncOptions())._asdict(),
+        state=state,
+    )
+    best: Dict[tuple, Dict] = dict()  # fastest report per store, scenario
+    for store in stores:
+        assert store in STORE_KINDS, "unknown store kind " + store
+        for _ in range(repeat):
+            root: Path = workdir / store
+            shutil.rmtree(root, ignore_errors=True)
+            corpus = generate_corpus(
+                root, files, depth, triples, format_mix, bnode_ratio, seed
+            )
+            with StandInEndpoint() as endpoint:
+                store_uris = dict()
+                if store == "standin":
+                    store_uris = dict(
+                        read_uri=endpoint.sparql_uri,
+                        write_uri=endpoint.sparql_uri,
+                        gsp_uri=endpoint.gsp_uri,
+                    )
+                sft = SyncFsTriples(
+                    str(root), **store_uris, options=options, state=state
+                )
+                for report in run_scenarios(sft, corpus, change_ratio, seed):
+                    run = (store, report["scenario"])
+                    if run not in best or (
+                        report["elapsed"] < best[run]["elapsed"]
+                    ):
+                        best[run] = dict(store=store, **report)
+    return dict(
+        config=config,
+        environment=dict(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            rdflib=rdflib.__version__,
+        ),
+        results=list(best.values()),
+    )
+
+
+def compare(
+    baseline: Dict, current: Dict, tolerance: float
+) -> Tuple[List[str], List[str]]:
+    """compares the elapsed times of the runs per store and scenario
+
+    :returns: the ratio to the baseline per run, and descriptions of the
+        regressions beyond the tolerance
+    :rtype: Tuple[List[str], List[str]]
+    """
+    base_by_run = {(r["store"], r["scenario"]): r for r in baseline["results"]}
+    ratios: List[str] = list()
+    regressions: List[str] = list()
+    for result in current["results"]:
+        base = base_by_run.get((result["store"], result["scenario"]))
+        if base is None or not base["elapsed"]:
+            continue
+        ratio: float = result["elapsed"] / base["elapsed"]
+        line = f"{result['store']:>8} {result['scenario']:<12} x{ratio:.2f}"
+        ratios.append(line)
+        if ratio > 1 + tolerance:
+            slowest = max(
+                result["seconds"],
+                key=lambda p: result["seconds"][p] - base["seconds"][p],
+            )
+            regressions.append(f"{line} (mostly in {slowest})")
+    return ratios, regressions
+
+
+def get_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Times full, incremental and no-op syncs of generated "
+        "rdf-dump trees.",
+    )
+    ap.add_argument("--files", type=int, default=1000)
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--triples", type=int, default=100)
+    ap.add_argument("--formats", default="turtle:2,nt:1,json-ld:1")
+    ap.add_argument("--bnode-ratio", type=float, default=0.1)
+    ap.add_argument("--change-ratio", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--stores", default=",".join(STORE_KINDS))
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--state", action="store_true")
+    ap.add_argument("--pipeline", action="store_true")
+    ap.add_argument("--workdir", help="defaults to a temporary folder")
+    ap.add_argument("--output", help="file to write the json results to")
+    ap.add_argument("--compare", help="json results of a baseline run")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    return ap
+
+
+def main(*cli_args) -> int:
+    args = get_arg_parser().parse_args(cli_args)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="syncfs-bench-"))
+    try:
+        outcome = run_benchmark(
+            workdir,
+            stores=args.stores.split(","),
+            files=args.files,
+            depth=args.depth,
+            triples=args.triples,
+            format_mix=parse_format_mix(args.formats),
+            bnode_ratio=args.bnode_ratio,
+            change_ratio=args.change_ratio,
+            seed=args.seed,
+            repeat=args.repeat,
+            options=SyncOptions(workers=args.workers, pipeline=args.pipeline),
+            state=args.state,
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    dumped: str = json.dumps(outcome, indent=2)
+    if args.output:
+        Path(args.output).write_text(dumped + "\n")
+    else:
+        print(dumped)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        ratios, regressions = compare(baseline, outcome, args.tolerance)
+        for ratio in ratios:
+            print(ratio)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
@@ -6,6 +6,13 @@
 ..moduleauthor::  "Open Science Team of the Flanders Marine Institute, VLIZ vzw" <opsci@vliz.be>
 """
 
-from syncfstriples.service import SyncFsTriples
-
 __all__ = ["SyncFsTriples"]
+
+
+def __getattr__(name: str):
+    # imported on first use (PEP 562), so the cli starts without rdflib
+    if name == "SyncFsTriples":
+        from syncfstriples.service import SyncFsTriples
+
+        return SyncFsTriples
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,48 @@
+import signal
 import sys
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace
 from logging import Logger, getLogger
 from logging.config import dictConfig
 from pathlib import Path
+from threading import Event
+from typing import TYPE_CHECKING, List
 
-from syncfstriples.service import DEFAULT_URN_BASE, SyncFsTriples
+from syncfstriples.budget import parse_size
+from syncfstriples.defaults import (
+    BNODE_MODES,
+    CHANGE_DETECTION_MODES,
+    DEFAULT_BATCH_GRAPHS,
+    DEFAULT_BATCH_TRIPLES,
+    DEFAULT_BNODE_MODE,
+    DEFAULT_CHANGE_DETECTION,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_INFLIGHT,
+    DEFAULT_SNAPSHOT_DIRNAME,
+    DEFAULT_UPDATE_STRATEGY,
+    DEFAULT_UPLOAD_MODE,
+    DEFAULT_URN_BASE,
+    DEFAULT_WORKERS,
+    UPDATE_STRATEGIES,
+    UPLOAD_MODES,
+)
+from syncfstriples.journal import SyncJournal
+from syncfstriples.options import SyncOptions
+from syncfstriples.report import SyncReport
+from syncfstriples.scan import DEFAULT_EXCLUDES, Shard, make_scanner
+from syncfstriples.session import (
+    DEFAULT_HTTP_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+)
+from syncfstriples.state import SyncStateIndex
+from syncfstriples.watch import (
+    DEFAULT_DEBOUNCE,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_POLL_INTERVAL,
+)
+
+if TYPE_CHECKING:
+    from syncfstriples.service import SyncFsTriples
 
 log: Logger = getLogger(__name__)
 
@@ -57,6 +95,387 @@ def get_arg_parser():
             "SPARQL endpoint to use as store. "
         ),
     )
+    ap.add_argument(
+        "-w",
+        "--workers",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_WORKERS,
+        help=(
+            "Number of worker processes to use for parsing the files. "
+            "Large n-triples and n-quads files (not compressed) also get "
+            "their chunks parsed in parallel."
+        ),
+    )
+    ap.add_argument(
+        "--state",
+        metavar="STATE_FILE",
+        nargs="?",
+        const=True,
+        default=False,
+        action="store",
+        required=False,
+        help=(
+            "Use a local sync-state index to skip unchanged files "
+            "without questioning the store. "
+            "Without a STATE_FILE the index is kept inside the root."
+        ),
+    )
+    ap.add_argument(
+        "--journal",
+        metavar="JOURNAL_FILE",
+        nargs="?",
+        const=True,
+        default=False,
+        action="store",
+        required=False,
+        help=(
+            "Keep a journal of the planned and completed operations, so an "
+            "interrupted sync is resumed (and the graphs it was writing "
+            "repaired) by the next run. "
+            "Without a JOURNAL_FILE the journal is kept inside the root."
+        ),
+    )
+    ap.add_argument(
+        "--reconcile",
+        action="store_true",
+        required=False,
+        help="Rebuild the local sync-state index from the store first.",
+    )
+    ap.add_argument(
+        "--change-detection",
+        choices=CHANGE_DETECTION_MODES,
+        action="store",
+        required=False,
+        default=DEFAULT_CHANGE_DETECTION,
+        help=(
+            "How changed files are detected. "
+            "'hash' compares size and content hash of files with a changed "
+            "mtime (and implies using the local sync-state index)."
+        ),
+    )
+    ap.add_argument(
+        "--include",
+        metavar="PATTERN",
+        action="append",
+        required=False,
+        help=(
+            "Glob-style pattern the files to sync should match. "
+            "Patterns with a '/' match the path relative to the root, "
+            "others match the file name. Can be repeated."
+        ),
+    )
+    ap.add_argument(
+        "--exclude",
+        metavar="PATTERN",
+        action="append",
+        required=False,
+        help=(
+            "Glob-style pattern of files and folders to skip, "
+            "matching folders are not descended into. Can be repeated. "
+            f"Always skipped: {', '.join(DEFAULT_EXCLUDES)}"
+        ),
+    )
+    ap.add_argument(
+        "--update-strategy",
+        choices=UPDATE_STRATEGIES,
+        action="store",
+        required=False,
+        default=DEFAULT_UPDATE_STRATEGY,
+        help=(
+            "How updated files are synced. "
+            "'reload' drops and reloads the graph, "
+            "'diff' only removes and adds the changed triples "
+            "as found by comparing with local snapshots."
+        ),
+    )
+    ap.add_argument(
+        "--bnodes",
+        choices=BNODE_MODES,
+        action="store",
+        required=False,
+        default=DEFAULT_BNODE_MODE,
+        help=(
+            "With the 'diff' update strategy: how graphs with blank nodes "
+            "are handled. 'reload' reloads them completely, 'skolemize' "
+            "replaces the blank nodes with deterministic iris."
+        ),
+    )
+    ap.add_argument(
+        "--snapshots",
+        metavar="SNAPSHOT_DIR",
+        type=str,
+        action="store",
+        required=False,
+        help=(
+            "With the 'diff' update strategy: the folder to keep the "
+            "snapshots in. Defaults to a folder inside the root."
+        ),
+    )
+    ap.add_argument(
+        "--chunk-size",
+        metavar="LINES",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_CHUNK_SIZE,
+        help=(
+            "Max number of lines of n-triples and n-quads files to parse "
+            "and insert at once, bounding the memory used for large dumps "
+            "(smaller files are loaded at once). Use 0 to load all files "
+            "at once."
+        ),
+    )
+    ap.add_argument(
+        "--batch-triples",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_BATCH_TRIPLES,
+        help="Max number of triples per batched insert request.",
+    )
+    ap.add_argument(
+        "--batch-graphs",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_BATCH_GRAPHS,
+        help=(
+            "Max number of graphs per batched insert or removal request. "
+            "Use 1 to send a request per file."
+        ),
+    )
+    ap.add_argument(
+        "--upload",
+        choices=UPLOAD_MODES,
+        action="store",
+        required=False,
+        default=DEFAULT_UPLOAD_MODE,
+        help=(
+            "How files get to the store. 'passthrough' uploads turtle, "
+            "n-triples and json-ld files as-is through the graph store "
+            "protocol endpoint (see --gsp), without parsing them."
+        ),
+    )
+    ap.add_argument(
+        "--gsp",
+        metavar="GSP_ENDPOINT",
+        type=str,
+        action="store",
+        required=False,
+        help="The SPARQL graph store protocol endpoint of the store.",
+    )
+    ap.add_argument(
+        "--precheck",
+        action="store_true",
+        required=False,
+        help="Do a fast syntax check of files uploaded as-is.",
+    )
+    ap.add_argument(
+        "--pipeline",
+        action="store_true",
+        required=False,
+        help=(
+            "Overlap the parsing of files with the writes to the store, "
+            "running them as concurrent stages of an asyncio pipeline."
+        ),
+    )
+    ap.add_argument(
+        "--inflight",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_INFLIGHT,
+        help="With --pipeline: max number of concurrent writes to the store.",
+    )
+    ap.add_argument(
+        "--max-inflight-bytes",
+        metavar="SIZE",
+        type=parse_size,
+        action="store",
+        required=False,
+        help=(
+            "Memory budget (e.g. 512M or 2G) for the graphs being parsed "
+            "and written, as estimated from the file sizes. Files are only "
+            "parsed when they fit, larger ones alone."
+        ),
+    )
+    ap.add_argument(
+        "--jsonld-cache",
+        metavar="CACHE_DIR",
+        type=str,
+        action="store",
+        required=False,
+        help=(
+            "Folder to cache the remote contexts of json-ld files in, so "
+            "they are fetched only once across runs."
+        ),
+    )
+    ap.add_argument(
+        "--jsonld-seed",
+        metavar="SEED_DIR",
+        type=str,
+        action="store",
+        required=False,
+        help=(
+            "Folder with json-ld context documents to use in stead of "
+            "fetching them, mapped by their url in its index.json."
+        ),
+    )
+    ap.add_argument(
+        "--jsonld-offline",
+        action="store_true",
+        required=False,
+        help=(
+            "Never fetch json-ld contexts: files with contexts not seeded "
+            "nor cached fail to sync."
+        ),
+    )
+    ap.add_argument(
+        "--http-pool-size",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_POOL_SIZE,
+        help="Max number of kept-alive connections to the triple-store.",
+    )
+    ap.add_argument(
+        "--http-timeout",
+        metavar="SECONDS",
+        type=float,
+        action="store",
+        required=False,
+        default=DEFAULT_HTTP_TIMEOUT,
+        help="Timeout of the requests to the triple-store.",
+    )
+    ap.add_argument(
+        "--http-retries",
+        metavar="N",
+        type=int,
+        action="store",
+        required=False,
+        default=DEFAULT_RETRIES,
+        help=(
+            "Max number of retries (with backoff) of idempotent requests "
+            "to the triple-store failing on a transient error."
+        ),
+    )
+    ap.add_argument(
+        "--report",
+        metavar="FILE",
+        action="store",
+        required=False,
+        help=(
+            "Write a json report of each sync to FILE: the time spent per "
+            "phase, counters and per-file durations."
+        ),
+    )
+    ap.add_argument(
+        "--metrics",
+        metavar="FILE",
+        action="store",
+        required=False,
+        help=(
+            "Write the metrics of each sync to FILE in the prometheus text "
+            "format, e.g. for the node_exporter textfile collector."
+        ),
+    )
+    ap.add_argument(
+        "--shard",
+        metavar="I/N",
+        action="store",
+        required=False,
+        help=(
+            "Only sync shard I (0 <= I < N) of N hash-based partitions of "
+            "the files, so N processes can sync one root to one store "
+            "without overlap. Graphs of other shards are never removed."
+        ),
+    )
+    ap.add_argument(
+        "--max-removal-pct",
+        metavar="PCT",
+        type=float,
+        action="store",
+        required=False,
+        help=(
+            "Refuse to sync when it would remove more than PCT percent of "
+            "the synced graphs, e.g. because the root is not mounted."
+        ),
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        required=False,
+        help="Sync even when exceeding the --max-removal-pct.",
+    )
+    ap.add_argument(
+        "--files-from",
+        metavar="FILE",
+        action="store",
+        required=False,
+        help=(
+            "Only sync the files listed in FILE ('-' for stdin), one path "
+            "relative to the root per line, in stead of scanning the whole "
+            "root. Listed files that no longer exist are removed."
+        ),
+    )
+    ap.add_argument(
+        "--dry-run",
+        action="store_true",
+        required=False,
+        help=(
+            "Only show the plan of the sync: the files to add, update, "
+            "remove and skip, with their size and estimated triples."
+        ),
+    )
+    ap.add_argument(
+        "--watch",
+        action="store_true",
+        required=False,
+        help=(
+            "Keep running after the initial sync, "
+            "syncing changed files as reported by filesystem events."
+        ),
+    )
+    ap.add_argument(
+        "--debounce",
+        metavar="SECONDS",
+        type=float,
+        action="store",
+        required=False,
+        default=DEFAULT_DEBOUNCE,
+        help="In watch mode: seconds of quiet before changes get synced.",
+    )
+    ap.add_argument(
+        "--max-delay",
+        metavar="SECONDS",
+        type=float,
+        action="store",
+        required=False,
+        default=DEFAULT_MAX_DELAY,
+        help="In watch mode: max seconds a change can wait to be synced.",
+    )
+    ap.add_argument(
+        "--poll-interval",
+        metavar="SECONDS",
+        type=float,
+        action="store",
+        required=False,
+        default=DEFAULT_POLL_INTERVAL,
+        help="In watch mode: seconds between scans when polling.",
+    )
+    ap.add_argument(
+        "--polling",
+        action="store_true",
+        required=False,
+        help="In watch mode: use polling in stead of inotify events.",
+    )
     return ap
 
 
@@ -74,12 +493,114 @@ def enable_logging(args: Namespace):
     log.info(f"Logging enabled according to config in {args.logconf}")
 
 
-def make_service(args) -> SyncFsTriples:
+def read_files_from(files_from: str) -> List[str]:
+    """reads the paths listed one per line in the file (or stdin for '-')"""
+    if files_from == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(files_from).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def nothing_to_sync(args: Namespace) -> bool:
+    """checks if a plain sync would find the tree unchanged since the last
+    one recorded in the sync-state index, so the run can end right away:
+    without importing the rdf stack nor contacting the store.
+    Any doubt (no index, an interrupted sync, other modes) means no.
+    """
+    modes = (args.dry_run, args.watch, args.files_from, args.reconcile)
+    state = args.state or args.change_detection == "hash"
+    if any(modes) or not state:
+        return False
+    # else
+    root = Path(args.root)
+    shard: Shard = Shard.parse(args.shard) if args.shard else None
+    state_path: Path = (
+        Path(args.state)
+        if isinstance(args.state, str)
+        else SyncStateIndex.default_path(root, shard)
+    )
+    if args.journal:
+        journal_path: Path = (
+            Path(args.journal)
+            if isinstance(args.journal, str)
+            else SyncJournal.default_path(root, shard)
+        )
+        if journal_path.exists():
+            return False
+    # else
+    if not state_path.exists():
+        return False
+    # else
+    exclude = list(DEFAULT_EXCLUDES) + (args.exclude or [])
+    if args.update_strategy == "diff":
+        exclude.append(DEFAULT_SNAPSHOT_DIRNAME)
+    scanner = make_scanner(args.include, exclude, shard)
+    report: SyncReport = SyncReport()
+    with report.phase("scan"):
+        stat_by_fname = scanner.scan(root)
+    with SyncStateIndex(state_path) as state:
+        if not state.covers(root, stat_by_fname):
+            return False
+    # else
+    report.count("files_scanned", len(stat_by_fname))
+    report.count("files_skipped", len(stat_by_fname))
+    report.finish()
+    log.info(f"nothing changed since the last sync of {root}")
+    if args.report:
+        report.write_json(args.report)
+    if args.metrics:
+        report.write_prometheus(args.metrics)
+    return True
+
+
+def make_service(args) -> "SyncFsTriples":
+    # imported here, as it pulls in the rdf stack
+    from syncfstriples.service import SyncFsTriples
+
     store_info: list = args.store or []
     root = args.root
     base = args.base
+    state = args.state
+    include = args.include
+    exclude = list(DEFAULT_EXCLUDES) + (args.exclude or [])
+    options: SyncOptions = SyncOptions(
+        workers=args.workers,
+        change_detection=args.change_detection,
+        bnode_mode=args.bnodes,
+        chunk_size=args.chunk_size,
+        max_batch_triples=args.batch_triples,
+        max_batch_graphs=args.batch_graphs,
+        upload=args.upload,
+        precheck=args.precheck,
+        pipeline=args.pipeline,
+        inflight=args.inflight,
+        max_removal_pct=None if args.force else args.max_removal_pct,
+        max_inflight_bytes=args.max_inflight_bytes,
+        jsonld_cache=args.jsonld_cache,
+        jsonld_seed=args.jsonld_seed,
+        jsonld_offline=args.jsonld_offline,
+    )
     log.debug(f"make service with {root=}, {base=}, {store_info=}")
-    service: SyncFsTriples = SyncFsTriples(root, base, *store_info)
+    service: SyncFsTriples = SyncFsTriples(
+        root,
+        base,
+        *store_info,
+        options=options,
+        state=state,
+        include=include,
+        exclude=exclude,
+        update_strategy=args.update_strategy,
+        snapshot_path=args.snapshots,
+        gsp_uri=args.gsp,
+        report_path=args.report,
+        metrics_path=args.metrics,
+        http_pool_size=args.http_pool_size,
+        http_timeout=args.http_timeout,
+        http_retries=args.http_retries,
+        shard=args.shard,
+        journal=args.journal,
+    )
     log.debug(f"target store type {type(service.rdfstore).__name__}")
     return service
 
@@ -87,14 +608,48 @@ def make_service(args) -> SyncFsTriples:
 def main(*cli_args):
     # parse cli args
     print(f"cli_args = {cli_args}")
-    args: Namespace = get_arg_parser().parse_args(cli_args)
+    ap: ArgumentParser = get_arg_parser()
+    args: Namespace = ap.parse_args(cli_args)
+    if args.files_from and (args.dry_run or args.watch):
+        ap.error("--files-from can't be combined with --dry-run or --watch")
     # enable logging
     enable_logging(args)
     log.debug(f"cli called with {args=}")
-    # build the core service
-    service: SyncFsTriples = make_service(args)
+    if nothing_to_sync(args):
+        return
+    # else build the core service
+    service = make_service(args)
     # do what needs to be done
-    service.process()
+    if args.dry_run:
+        print(service.plan(reconcile=args.reconcile))
+        return
+    # else
+    if args.files_from:
+        service.process(
+            reconcile=args.reconcile, paths=read_files_from(args.files_from)
+        )
+        return
+    # else
+    if not args.watch:
+        service.process(reconcile=args.reconcile)
+        return
+    # else keep watching until stopped
+    stop_event = Event()
+
+    def stop(signum, frame):
+        log.info(f"received signal {signum}, stopping the watch")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    service.watch(
+        stop_event=stop_event,
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        poll_interval=args.poll_interval,
+        polling=args.polling,
+        reconcile=args.reconcile,
+    )
 
 
 if __name__ == "__main__":
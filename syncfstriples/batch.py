@@ -0,0 +1,162 @@
+from logging import getLogger
+from typing import Callable, Dict, Iterable, List, Set
+
+from pyrdfstore.store import RDFStore
+from rdflib import Graph
+
+from syncfstriples.defaults import DEFAULT_BATCH_GRAPHS, DEFAULT_BATCH_TRIPLES
+from syncfstriples.pipeline import Submit, write_now
+from syncfstriples.store import drop_graphs_for_keys, insert_for_keys
+
+log = getLogger(__name__)
+
+
+class InsertBatcher:
+    """Collects the graphs of added files to insert them in batched
+    requests, limited in the number of triples and graphs per request.
+    When a batch fails, its keys are retried one by one so a single bad
+    graph does not fail the others. (Stores without a bulk insert get the
+    graphs of a batch inserted one by one right away, so none is inserted
+    twice.)
+    The actual inserts are handed to the submit function, which allows
+    running them concurrently (e.g. from an AsyncPipeline).
+    """
+
+    def __init__(
+        self,
+        store: RDFStore,
+        max_triples: int = DEFAULT_BATCH_TRIPLES,
+        max_graphs: int = DEFAULT_BATCH_GRAPHS,
+        submit: Submit = None,
+    ):
+        """Creates the batcher
+
+        :param store: the store to insert into
+        :type store: RDFStore
+        :param max_triples: max number of triples per request
+            (a single larger graph is still inserted, but on its own)
+            optional - defaults to DEFAULT_BATCH_TRIPLES = 10000
+        :type max_triples: int
+        :param max_graphs: max number of graphs per request
+            optional - defaults to DEFAULT_BATCH_GRAPHS = 100
+        :type max_graphs: int
+        :param submit: function executing a write and calling the callback
+            with its result once done
+            optional - defaults to None meaning the write is done right away
+        :type submit: Submit
+        """
+        assert max_triples > 0, "max_triples should be positive"
+        assert max_graphs > 0, "max_graphs should be positive"
+        self._store: RDFStore = store
+        self._max_triples: int = max_triples
+        self._max_graphs: int = max_graphs
+        self._graph_by_key: Dict[str, Graph] = dict()
+        self._done_by_key: Dict[str, Callable[[], None]] = dict()
+        self._triples: int = 0
+        self._submit: Submit = submit or write_now
+        self.failed: Set[str] = set()
+
+    def add(
+        self, key: str, graph: Graph, on_done: Callable[[], None] = None
+    ) -> None:
+        """adds the graph for the key to the batch, flushing as needed
+
+        :param key: the key to insert the graph for
+        :type key: str
+        :param graph: the graph to insert
+        :type graph: Graph
+        :param on_done: called once the graph got inserted
+            optional - defaults to None
+        :type on_done: Callable[[], None]
+        """
+        if self._graph_by_key and (
+            self._triples + len(graph) > self._max_triples
+        ):
+            self.flush()
+        self._graph_by_key[key] = graph
+        if on_done is not None:
+            self._done_by_key[key] = on_done
+        self._triples += len(graph)
+        if (
+            len(self._graph_by_key) >= self._max_graphs
+            or self._triples >= self._max_triples
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """submits the insert of the collected graphs"""
+        if not self._graph_by_key:
+            return
+        # else
+        graph_by_key = self._graph_by_key
+        done_by_key = self._done_by_key
+        self._graph_by_key, self._done_by_key = dict(), dict()
+        self._triples = 0
+
+        def inserted(succeeded: List[str]) -> None:
+            for key in succeeded:
+                on_done = done_by_key.get(key)
+                if on_done is not None:
+                    on_done()
+
+        self._submit(lambda: self._insert(graph_by_key), inserted)
+
+    def _insert(self, graph_by_key: Dict[str, Graph]) -> List[str]:
+        """inserts the graphs, returning the keys that got inserted"""
+        log.debug(f"inserting batch of {len(graph_by_key)} graphs")
+        if getattr(self._store, "insert_for_keys", None) is not None:
+            # one request, so on failure none of the graphs got inserted
+            try:
+                insert_for_keys(self._store, graph_by_key)
+                return list(graph_by_key)
+            except Exception:
+                log.exception("batched insert failed, retrying per key")
+        # else
+        succeeded: List[str] = list()
+        for key, graph in graph_by_key.items():
+            try:
+                insert_for_keys(self._store, {key: graph})
+                succeeded.append(key)
+            except Exception:
+                log.exception(f"failed to insert graph for {key}")
+                self.failed.add(key)
+        return succeeded
+
+
+def remove_keys(
+    store: RDFStore,
+    keys: Iterable[str],
+    max_graphs: int = DEFAULT_BATCH_GRAPHS,
+) -> List[str]:
+    """drops and forgets the graphs for the keys in batched requests of
+    at most max_graphs. When a batch fails, its keys are retried one by one.
+
+    :param store: the store to remove from
+    :type store: RDFStore
+    :param keys: the keys of the graphs to remove
+    :type keys: Iterable[str]
+    :param max_graphs: max number of graphs per request
+        optional - defaults to DEFAULT_BATCH_GRAPHS = 100
+    :type max_graphs: int
+    :returns: the keys that got removed
+    :rtype: List[str]
+    """
+    assert max_graphs > 0, "max_graphs should be positive"
+    keys = list(keys)
+    removed: List[str] = list()
+    for start in range(0, len(keys), max_graphs):
+        batch: List[str] = keys[start : start + max_graphs]
+        log.debug(f"removing batch of {len(batch)} graphs")
+        try:
+            drop_graphs_for_keys(store, batch)
+            removed.extend(batch)
+            continue
+        except Exception:
+            log.exception("batched removal failed, retrying per key")
+        for key in batch:
+            try:
+                drop_graphs_for_keys(store, [key])
+                removed.append(key)
+            except Exception:
+                log.exception(f"failed to remove graph for {key}")
+    return removed
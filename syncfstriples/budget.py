@@ -0,0 +1,92 @@
+import re
+from pathlib import Path
+from threading import Lock
+
+from syncfstriples.compression import compression_of
+from syncfstriples.plan import COMPRESSION_RATIO
+
+# rough size in memory of a parsed graph relative to the size of its dump,
+# rdflib holding about 1.2 kB per triple (terms and indexes included)
+EXPANSION_FACTOR = {
+    "turtle": 20,
+    "nt": 11,
+    "nquads": 9,
+    "json-ld": 10,
+}
+DEFAULT_EXPANSION_FACTOR = 12
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def estimate_memory(fpath: Path, size: int, format: str) -> int:
+    """estimates the memory needed to hold the parsed graph of a dump
+
+    :param fpath: path of the dump file
+    :type fpath: Path
+    :param size: the size of the file in bytes
+    :type size: int
+    :param format: the rdflib format of the file
+    :type format: str
+    :returns: the estimated number of bytes
+    :rtype: int
+    """
+    compression: str = compression_of(fpath)
+    if compression is not None:
+        size *= COMPRESSION_RATIO[compression]
+    return size * EXPANSION_FACTOR.get(format, DEFAULT_EXPANSION_FACTOR)
+
+
+def parse_size(spec: str) -> int:
+    """parses a number of bytes with an optional (binary) unit, like 512M
+
+    :param spec: the number of bytes, optionally followed by K, M, G or T
+    :type spec: str
+    :returns: the number of bytes
+    :rtype: int
+    """
+    found = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", spec, re.I)
+    if found is None:
+        raise ValueError(f"invalid size {spec!r}")
+    # else
+    number, unit = found.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+class MemoryBudget:
+    """Admits work by its estimated memory cost, up to a max number of bytes
+    in flight. Work larger than the budget is only admitted when nothing
+    else is in flight, so it runs alone. Work that is not admitted should
+    wait for work in flight to be released. Can be shared by threads.
+    """
+
+    def __init__(self, max_bytes: int):
+        """Creates the budget
+
+        :param max_bytes: the max number of bytes of the work in flight
+        :type max_bytes: int
+        """
+        assert max_bytes > 0, "the memory budget should be positive"
+        self.max_bytes: int = max_bytes
+        self.in_use: int = 0
+        self.peak: int = 0
+        self._lock: Lock = Lock()
+
+    def try_acquire(self, cost: int) -> bool:
+        """admits the work if it fits the budget now
+
+        :param cost: the estimated bytes of the work
+        :type cost: int
+        :returns: True if admitted (and to be released once done)
+        :rtype: bool
+        """
+        with self._lock:
+            if self.in_use and self.in_use + cost > self.max_bytes:
+                return False
+            # else
+            self.in_use += cost
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, cost: int) -> None:
+        """returns the bytes of finished work to the budget"""
+        with self._lock:
+            self.in_use -= cost
@@ -0,0 +1,68 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from pathlib import Path
+from typing import BinaryIO, Optional, TextIO, Union
+
+COMPRESSION_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+
+def compression_of(fpath: Union[str, Path]) -> Optional[str]:
+    """gives the compression suffix of the file at fpath, if any
+
+    :param fpath: path of the file to inspect
+    :type fpath: Union[str, Path]
+    :returns: one of COMPRESSION_SUFFIXES or None if not compressed
+    :rtype: str
+    """
+    suffix: str = os.path.splitext(fpath)[1].lower()
+    return suffix if suffix in COMPRESSION_SUFFIXES else None
+
+
+def strip_compression(fpath: Union[str, Path]) -> str:
+    """gives the fpath without its compression suffix (if any)"""
+    fpath = str(fpath)
+    if compression_of(fpath) is None:
+        return fpath
+    # else
+    return os.path.splitext(fpath)[0]
+
+
+def open_dump(fpath: Union[str, Path]) -> BinaryIO:
+    """opens the file at fpath for reading, decompressing its content
+    as a stream when it has one of the COMPRESSION_SUFFIXES
+
+    :param fpath: path of the file to open
+    :type fpath: Union[str, Path]
+    :returns: binary file object reading the (decompressed) content
+    :rtype: BinaryIO
+    """
+    compression: str = compression_of(fpath)
+    if compression == ".gz":
+        return gzip.open(fpath, "rb")
+    if compression == ".bz2":
+        return bz2.open(fpath, "rb")
+    if compression == ".xz":
+        return lzma.open(fpath, "rb")
+    if compression == ".zst":
+        # conditional dependency -- only needed for zstandard dumps
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                f"reading {fpath} requires the zstandard package, "
+                "install the 'zstd' extra: pip install syncfstriples[zstd]"
+            ) from e
+
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(fpath, "rb"), closefd=True
+        )
+    # else
+    return open(fpath, "rb")
+
+
+def open_dump_text(fpath: Union[str, Path], encoding="utf-8") -> TextIO:
+    """opens the file at fpath for reading text, see open_dump"""
+    return io.TextIOWrapper(open_dump(fpath), encoding=encoding)
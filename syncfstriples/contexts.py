@@ -0,0 +1,239 @@
+import json
+import os
+from hashlib import blake2b
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Union
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+
+log = getLogger(__name__)
+
+# the file in a seed folder mapping the context urls to the files holding them
+SEED_INDEX_FNAME = "index.json"
+CACHED_CONTEXT_SUFFIX = ".jsonld"
+CONTEXT_ACCEPT = "application/ld+json, application/json;q=0.9"
+DEFAULT_CONTEXT_TIMEOUT = 30
+# only contexts at these (remote) locations are memoized and cached
+REMOTE_SCHEMES = ("http", "https")
+
+
+class ContextUnavailable(Exception):
+    """Raised when a json-ld context referenced by url can't be resolved"""
+
+
+class ContextResolver:
+    """Resolves the json-ld contexts referenced by url, so they can be
+    inlined in the documents before parsing them. Remote contexts are
+    loaded once per process, looked up in turn in a seed folder (holding
+    the context documents mapped by url in its index.json), an on-disk
+    cache and finally fetched (and cached), unless offline.
+    Use get_resolver to share one per process, also in worker processes.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = None,
+        seed_dir: Union[str, Path] = None,
+        offline: bool = False,
+        timeout: float = DEFAULT_CONTEXT_TIMEOUT,
+    ):
+        """Creates the resolver
+
+        :param cache_dir: folder to keep the fetched contexts in
+            optional - defaults to None meaning they are only memoized
+        :type cache_dir: Union[str, Path]
+        :param seed_dir: folder with context documents to use in stead of
+            fetching them, mapped by url in its index.json
+            optional - defaults to None
+        :type seed_dir: Union[str, Path]
+        :param offline: never fetch contexts, failing on the ones not seeded
+            nor cached
+            optional - defaults to False
+        :type offline: bool
+        :param timeout: seconds to wait for fetching a context
+            optional - defaults to DEFAULT_CONTEXT_TIMEOUT = 30
+        :type timeout: float
+        """
+        self.cache_dir: Path = Path(cache_dir) if cache_dir else None
+        self.seed_dir: Path = Path(seed_dir) if seed_dir else None
+        self.offline: bool = offline
+        self.timeout: float = timeout
+        self._seeds: Dict[str, str] = None
+        self._memo: Dict[str, Any] = dict()
+        self._lock: Lock = Lock()
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def __reduce__(self):
+        # (unpickled as the resolver of the receiving process)
+        return (
+            get_resolver,
+            (self.cache_dir, self.seed_dir, self.offline, self.timeout),
+        )
+
+    def resolve(self, url: str) -> Any:
+        """gives the (json) document at the url
+
+        :param url: the absolute url of the context document
+        :type url: str
+        :returns: the parsed json document
+        :rtype: Any
+        """
+        if urlsplit(url).scheme not in REMOTE_SCHEMES:
+            # local contexts are read as they are now
+            return self._load(url)
+        # else
+        with self._lock:
+            if url not in self._memo:
+                self._memo[url] = self._lookup(url)
+            return self._memo[url]
+
+    def _lookup(self, url: str) -> Any:
+        document: Any = self._seeded(url)
+        if document is not None:
+            return document
+        # else
+        cache_path: Optional[Path] = self._cache_path(url)
+        if cache_path is not None and cache_path.exists():
+            log.debug(f"using cached context {cache_path} for {url}")
+            return json.loads(cache_path.read_text(encoding="utf-8"))
+        # else
+        if self.offline:
+            raise ContextUnavailable(
+                f"context {url} is not seeded nor cached (working offline)"
+            )
+        # else
+        document = self._load(url)
+        if cache_path is not None:
+            tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+            tmp_path.write_text(json.dumps(document), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+        return document
+
+    def _seeded(self, url: str) -> Any:
+        if self.seed_dir is None:
+            return None
+        # else
+        if self._seeds is None:
+            index_path: Path = self.seed_dir / SEED_INDEX_FNAME
+            self._seeds = json.loads(index_path.read_text(encoding="utf-8"))
+        fname: Optional[str] = self._seeds.get(url)
+        if fname is None:
+            return None
+        # else
+        log.debug(f"using seeded context {fname} for {url}")
+        return json.loads((self.seed_dir / fname).read_text(encoding="utf-8"))
+
+    def _cache_path(self, url: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        # else
+        digest: str = blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+        return self.cache_dir / (digest + CACHED_CONTEXT_SUFFIX)
+
+    def _load(self, url: str) -> Any:
+        log.debug(f"loading context {url}")
+        request = Request(url, headers={"Accept": CONTEXT_ACCEPT})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except (OSError, ValueError) as e:
+            raise ContextUnavailable(f"failed to load context {url}") from e
+
+    def inline(self, data: Any, base: str) -> Any:
+        """replaces the contexts referenced by url in the json-ld data with
+        their content (the @context of the documents at those urls)
+
+        :param data: the parsed json-ld document
+        :type data: Any
+        :param base: the url of the document, to resolve relative urls to
+        :type base: str
+        :returns: the document with only inline contexts
+        :rtype: Any
+        """
+        if isinstance(data, list):
+            return [self.inline(item, base) for item in data]
+        if not isinstance(data, dict):
+            return data
+        # else
+        return {
+            key: (
+                self._inline_context(value, base, frozenset())
+                if key == "@context"
+                else self.inline(value, base)
+            )
+            for key, value in data.items()
+        }
+
+    def _inline_context(
+        self, context: Any, base: str, referenced: FrozenSet[str]
+    ) -> Any:
+        if isinstance(context, list):
+            inlined: list = list()
+            for item in context:
+                item = self._inline_context(item, base, referenced)
+                inlined.extend(item if isinstance(item, list) else [item])
+            return inlined
+        if isinstance(context, str):
+            url: str = urljoin(base, context)
+            if url in referenced:
+                raise ContextUnavailable(f"context {url} includes itself")
+            # else
+            document: Any = self.resolve(url)
+            if not isinstance(document, dict) or "@context" not in document:
+                raise ContextUnavailable(f"no @context found at {url}")
+            # else
+            return self._inline_context(
+                document["@context"], url, referenced | {url}
+            )
+        if not isinstance(context, dict):
+            return context
+        # else
+        inlined: dict = dict()
+        for key, value in context.items():
+            if isinstance(value, dict) and "@context" in value:
+                # a scoped context of a term definition
+                value = dict(value)
+                value["@context"] = self._inline_context(
+                    value["@context"], base, referenced
+                )
+            inlined[key] = value
+        imported: Any = inlined.pop("@import", None)
+        if isinstance(imported, str):
+            url = urljoin(base, imported)
+            imported = self._inline_context(imported, base, referenced)
+            if not isinstance(imported, dict):
+                raise ContextUnavailable(
+                    f"context imported from {url} is no single context"
+                )
+            # else
+            # the importing context takes precedence
+            inlined = {**imported, **inlined}
+        return inlined
+
+
+_resolvers: Dict[Tuple, ContextResolver] = dict()
+_resolvers_lock: Lock = Lock()
+
+
+def get_resolver(
+    cache_dir: Union[str, Path] = None,
+    seed_dir: Union[str, Path] = None,
+    offline: bool = False,
+    timeout: float = DEFAULT_CONTEXT_TIMEOUT,
+) -> ContextResolver:
+    """gives the ContextResolver of this process for the given settings
+    (see ContextResolver for their meaning)
+    """
+    settings: Tuple = (
+        str(cache_dir) if cache_dir else None,
+        str(seed_dir) if seed_dir else None,
+        bool(offline),
+        timeout,
+    )
+    with _resolvers_lock:
+        if settings not in _resolvers:
+            _resolvers[settings] = ContextResolver(*settings)
+        return _resolvers[settings]
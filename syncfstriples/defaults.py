@@ -0,0 +1,18 @@
+# the defaults and choices of the sync options, kept free of the rdf stack
+# so the cli can declare (and check) its arguments without importing it
+
+DEFAULT_URN_BASE = "urn:sync:"
+DEFAULT_WORKERS = 1
+CHANGE_DETECTION_MODES = ("mtime", "hash")
+DEFAULT_CHANGE_DETECTION = "mtime"
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_BATCH_TRIPLES = 10000
+DEFAULT_BATCH_GRAPHS = 100
+DEFAULT_INFLIGHT = 4
+UPDATE_STRATEGIES = ("reload", "diff")
+DEFAULT_UPDATE_STRATEGY = "reload"
+BNODE_MODES = ("reload", "skolemize")
+DEFAULT_BNODE_MODE = "reload"
+DEFAULT_SNAPSHOT_DIRNAME = ".syncfs-snapshots"
+UPLOAD_MODES = ("parse", "passthrough")
+DEFAULT_UPLOAD_MODE = "parse"
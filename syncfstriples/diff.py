@@ -0,0 +1,147 @@
+from hashlib import blake2b
+from logging import getLogger
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from pyrdfstore.store import RDFStore
+from rdflib import BNode, Graph, URIRef
+from rdflib.compare import to_canonical_graph
+
+from syncfstriples.defaults import DEFAULT_SNAPSHOT_DIRNAME
+from syncfstriples.store import named_graph_of_key, replace_graph_for_key
+
+log = getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SKOLEM_PATH = "/.well-known/genid/"
+
+
+def has_bnodes(graph: Graph) -> bool:
+    """checks if any of the triples in the graph has a blank node"""
+    return any(isinstance(term, BNode) for triple in graph for term in triple)
+
+
+def skolemize(graph: Graph, base: str) -> Graph:
+    """replaces the blank nodes in the graph with deterministic iris.
+    The blank nodes are first canonically labeled, so identical content
+    always leads to the same iris, whatever the labels used in the file.
+
+    :param graph: the graph to skolemize
+    :type graph: Graph
+    :param base: the base for the iris replacing the blank nodes
+    :type base: str
+    :returns: the skolemized graph (or the graph itself if no blank nodes)
+    :rtype: Graph
+    """
+    if not has_bnodes(graph):
+        return graph
+    # else
+
+    def skolem(term):
+        return URIRef(f"{base}{term}") if isinstance(term, BNode) else term
+
+    skolemized = Graph()
+    for s, p, o in to_canonical_graph(graph):
+        skolemized.add((skolem(s), p, skolem(o)))
+    return skolemized
+
+
+def skolemize_for_key(store: RDFStore, key: str, graph: Graph) -> Graph:
+    """skolemizes the graph with iris based on the named graph of the key"""
+    return skolemize(graph, named_graph_of_key(store, key) + SKOLEM_PATH)
+
+
+def graph_delta(previous: Graph, current: Graph) -> Tuple[Graph, Graph]:
+    """calculates the triples removed from and added to the previous graph
+
+    :param previous: the graph as it was
+    :type previous: Graph
+    :param current: the graph as it is now
+    :type current: Graph
+    :returns: the removed and the added triples
+    :rtype: Tuple[Graph, Graph]
+    """
+    removed, added = Graph(), Graph()
+    for triple in previous:
+        if triple not in current:
+            removed.add(triple)
+    for triple in current:
+        if triple not in previous:
+            added.add(triple)
+    return removed, added
+
+
+def apply_graph_delta(
+    store: RDFStore, key: str, previous: Graph, current: Graph
+) -> None:
+    """changes the graph for the key in the store from previous to current
+    by only removing and adding the triples that differ.
+    Stores without support for targeted removal of triples only get the
+    additions, or a complete replace if triples were removed.
+
+    :param store: the store holding the graph
+    :type store: RDFStore
+    :param key: the key of the graph to change
+    :type key: str
+    :param previous: the content of the graph as it was synced before
+    :type previous: Graph
+    :param current: the content the graph should get
+    :type current: Graph
+    :rtype: None
+    """
+    removed, added = graph_delta(previous, current)
+    log.debug(f"delta for {key}: -{len(removed)} +{len(added)} triples")
+    apply_delta = getattr(store, "apply_delta_for_key", None)
+    if apply_delta is not None:
+        apply_delta(removed, added, key)
+    elif not len(removed):
+        store.insert_for_key(added, key)
+    else:
+        replace_graph_for_key(store, current, key)
+
+
+class SnapshotStore:
+    """Local folder of canonical (sorted n-triples) snapshots of the graphs
+    as they were last synced, to calculate deltas against.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Creates the snapshot store
+
+        :param path: the folder to keep the snapshots in
+        :type path: Union[str, Path]
+        """
+        self.path: Path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def default_path(root: Path) -> Path:
+        """gives the default location of the snapshots for a given root"""
+        return Path(root) / DEFAULT_SNAPSHOT_DIRNAME
+
+    def _fpath(self, key: str) -> Path:
+        digest: str = blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.path / digest[:2] / (digest + SNAPSHOT_SUFFIX)
+
+    def load(self, key: str) -> Optional[Graph]:
+        """gets the snapshot for the key, if any"""
+        fpath: Path = self._fpath(key)
+        if not fpath.exists():
+            return None
+        return Graph().parse(location=str(fpath), format="nt")
+
+    def save(self, key: str, graph: Graph) -> None:
+        """keeps the graph as the snapshot for the key"""
+        fpath: Path = self._fpath(key)
+        fpath.parent.mkdir(exist_ok=True)
+        # n-triples keep a triple per line (escaping multi-line literals)
+        lines = sorted(graph.serialize(format="nt").splitlines())
+        tmppath: Path = fpath.with_suffix(".tmp")
+        with open(tmppath, "w", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+        tmppath.replace(fpath)
+
+    def forget(self, key: str) -> None:
+        """removes the snapshot for the key"""
+        self._fpath(key).unlink(missing_ok=True)
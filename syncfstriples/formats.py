@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+from typing import Union
+
+from syncfstriples.compression import strip_compression
+
+SUFFIX_TO_FORMAT = {
+    ".ttl": "turtle",
+    ".turtle": "turtle",
+    ".jsonld": "json-ld",
+    ".json-ld": "json-ld",
+    ".json": "json-ld",
+    ".nt": "nt",
+    ".ntriples": "nt",
+    ".nq": "nquads",
+    ".nquads": "nquads",
+}
+SUPPORTED_RDF_DUMP_SUFFIXES = [sfx for sfx in SUFFIX_TO_FORMAT]
+
+
+def is_supported_dump(fpath: Union[str, Path]) -> bool:
+    """checks if the file at fpath is an rdf dump that can be synced
+    (possibly compressed, e.g. with a compound suffix like .ttl.gz)
+    """
+    suffix: str = os.path.splitext(strip_compression(fpath))[1]
+    return suffix in SUPPORTED_RDF_DUMP_SUFFIXES
+
+
+def format_from_filepath(fpath: Path) -> str:
+    """extracts the rdflib file format from the suffix of the file in fpath
+    (for compressed files the suffix before the compression suffix is used)
+
+    :param fpath: path of file to inspect
+    :type fpath: Path
+    :returns: value for rdflib format=  for that file
+    :rtype: str
+    """
+    suffix = Path(strip_compression(fpath)).suffix.lower()
+    return SUFFIX_TO_FORMAT.get(suffix, None)
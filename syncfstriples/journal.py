@@ -0,0 +1,150 @@
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import IO, Iterable, List, NamedTuple, Optional, Union
+
+from syncfstriples.scan import Shard
+
+log = getLogger(__name__)
+
+DEFAULT_JOURNAL_FNAME = ".syncfs-journal.jsonl"
+# number of completed operations between forcing the journal to disk
+CHECKPOINT_INTERVAL = 100
+
+
+class PendingSync(NamedTuple):
+    """What remains to be done of an interrupted sync, by key"""
+
+    root: str
+    removals: List[str]
+    syncs: List[str]
+
+
+class SyncJournal:
+    """Append-only (json-lines) journal of a sync in progress.
+    It holds the planned operations followed by the keys completed, so an
+    interrupted sync can be resumed without planning it anew. Keys planned
+    but not completed may have been written in part, and need repair.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Creates the journal at the given path (not touching it yet)
+
+        :param path: the path to the journal file
+        :type path: Union[str, Path]
+        """
+        self.path: Path = Path(path)
+        self._file: IO[str] = None
+        self._lock: Lock = Lock()
+        self._unsynced: int = 0
+
+    @staticmethod
+    def default_path(root: Path, shard: Shard = None) -> Path:
+        """gives the default location of the journal for a given root
+        (and shard, as each shard keeps a journal of its own)
+        """
+        if shard is None:
+            return Path(root) / DEFAULT_JOURNAL_FNAME
+        # else
+        stem, suffix = DEFAULT_JOURNAL_FNAME.rsplit(".", 1)
+        fname = f"{stem}.shard-{shard.index}-of-{shard.count}.{suffix}"
+        return Path(root) / fname
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def pending(self) -> Optional[PendingSync]:
+        """reads what remains to be done of an interrupted sync
+
+        :returns: the planned keys not completed, or None if no sync was
+            interrupted
+        :rtype: PendingSync
+        """
+        if not self.path.exists():
+            return None
+        # else
+        planned: dict = None
+        completed = set()
+        with open(self.path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                if not line.strip():
+                    continue
+                try:
+                    record: dict = json.loads(line)
+                except ValueError:
+                    # the last line was being written when interrupted
+                    log.debug(f"ignoring truncated line in {self.path}")
+                    continue
+                if "plan" in record:
+                    planned = record["plan"]
+                elif "done" in record:
+                    completed.add(record["done"])
+        if planned is None:
+            return None
+        # else
+        return PendingSync(
+            planned["root"],
+            [key for key in planned["removals"] if key not in completed],
+            [key for key in planned["syncs"] if key not in completed],
+        )
+
+    def start(
+        self, root: Path, removals: Iterable[str], syncs: Iterable[str]
+    ) -> None:
+        """starts the journal of a new sync with its planned operations
+
+        :param root: the folder synced from
+        :type root: Path
+        :param removals: the keys to remove
+        :type removals: Iterable[str]
+        :param syncs: the keys to add or update
+        :type syncs: Iterable[str]
+        """
+        self.close()
+        plan = dict(
+            root=str(Path(root).absolute()),
+            removals=list(removals),
+            syncs=list(syncs),
+        )
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"plan": plan}, checkpoint=True)
+
+    def resume(self) -> None:
+        """continues the journal of the interrupted sync"""
+        self.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+        # a truncated last line should not swallow the next record
+        self._file.write("\n")
+
+    def done(self, key: str) -> None:
+        """records the key as completed (written to disk in checkpoints)"""
+        self._write({"done": key})
+
+    def _write(self, record: dict, checkpoint: bool = False) -> None:
+        line: str = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                return
+            # else
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if checkpoint or self._unsynced >= CHECKPOINT_INTERVAL:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def finish(self) -> None:
+        """ends the journal of a completed sync, removing it"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,107 @@
+from typing import NamedTuple
+
+from syncfstriples.contexts import ContextResolver, get_resolver
+from syncfstriples.defaults import (
+    BNODE_MODES,
+    CHANGE_DETECTION_MODES,
+    DEFAULT_BATCH_GRAPHS,
+    DEFAULT_BATCH_TRIPLES,
+    DEFAULT_BNODE_MODE,
+    DEFAULT_CHANGE_DETECTION,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_INFLIGHT,
+    DEFAULT_UPLOAD_MODE,
+    DEFAULT_WORKERS,
+    UPLOAD_MODES,
+)
+
+
+class SyncOptions(NamedTuple):
+    """The settings deciding how a sync is executed, handed as one to
+    perform_sync, sync_paths, execute_plan and execute_syncs.
+    (Kept free of the rdf stack, so the cli can build them up front.)
+    """
+
+    # number of worker processes parsing the files to sync, or the chunks
+    # of the (not compressed) n-triples and n-quads files streamed in chunks
+    workers: int = DEFAULT_WORKERS
+    # how changed files are detected, one of CHANGE_DETECTION_MODES. In
+    # 'hash' mode files with a changed mtime but unchanged size and content
+    # hash are not considered updated (requires a sync-state index)
+    change_detection: str = DEFAULT_CHANGE_DETECTION
+    # one of BNODE_MODES, deciding how graphs with blank nodes are updated
+    # when using snapshots: 'reload' reloads them completely, 'skolemize'
+    # replaces the blank nodes with deterministic iris to make them diffable
+    bnode_mode: str = DEFAULT_BNODE_MODE
+    # max number of lines of n-triples and n-quads files to parse and
+    # insert at once, only files estimated to hold more get streamed in
+    # chunks. 0 or None disables (ignored when using snapshots)
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    # max number of triples per batched insert
+    max_batch_triples: int = DEFAULT_BATCH_TRIPLES
+    # max number of graphs per batched insert or removal, 1 disables batching
+    max_batch_graphs: int = DEFAULT_BATCH_GRAPHS
+    # one of UPLOAD_MODES, 'passthrough' uploads the files the store can
+    # ingest natively as-is, without parsing them (ignored with snapshots)
+    upload: str = DEFAULT_UPLOAD_MODE
+    # do a fast syntax check of files uploaded as-is
+    precheck: bool = False
+    # run the parsing and the writes to the store as concurrent stages of
+    # an asyncio pipeline
+    pipeline: bool = False
+    # max number of concurrent writes in the pipeline
+    inflight: int = DEFAULT_INFLIGHT
+    # max percentage of the synced graphs a sync may remove, so an empty or
+    # unmounted root does not wipe the store, None means there is no limit
+    max_removal_pct: float = None
+    # memory budget for the graphs being parsed and written, as estimated
+    # from the file sizes (times a per-format expansion factor). Files are
+    # parsed when they fit, larger ones alone. (Graphs waiting in an insert
+    # batch are bounded by max_batch_triples in stead.) None means only the
+    # prefetch of the workers is bounded
+    max_inflight_bytes: int = None
+    # folder to cache the remote contexts of json-ld files in across runs,
+    # None means they are only kept (loaded once) per process
+    jsonld_cache: str = None
+    # folder with json-ld context documents to use in stead of fetching
+    # them, mapped by their url in its index.json
+    jsonld_seed: str = None
+    # never fetch json-ld contexts, files with contexts not seeded nor
+    # cached fail to sync
+    jsonld_offline: bool = False
+
+    @property
+    def contexts(self) -> ContextResolver:
+        """the (per process shared) resolver of the json-ld contexts"""
+        return get_resolver(
+            self.jsonld_cache, self.jsonld_seed, self.jsonld_offline
+        )
+
+    def check(self) -> "SyncOptions":
+        """asserts the options are valid, giving them back"""
+        assert self.workers >= 1, "the number of workers should be at least 1."
+        assert (
+            self.change_detection in CHANGE_DETECTION_MODES
+        ), "unknown change_detection mode " + str(self.change_detection)
+        assert self.bnode_mode in BNODE_MODES, "unknown bnode_mode " + str(
+            self.bnode_mode
+        )
+        assert (
+            not self.chunk_size or self.chunk_size > 0
+        ), "chunk_size can't be negative"
+        assert (
+            self.max_batch_triples > 0 and self.max_batch_graphs > 0
+        ), "batch limits should be positive"
+        assert self.upload in UPLOAD_MODES, "unknown upload mode " + str(
+            self.upload
+        )
+        assert (
+            self.inflight >= 1
+        ), "the number of inflight writes should be >= 1"
+        assert (
+            self.max_removal_pct is None or 0 <= self.max_removal_pct <= 100
+        ), "max_removal_pct should be a percentage"
+        assert (
+            self.max_inflight_bytes is None or self.max_inflight_bytes > 0
+        ), "max_inflight_bytes should be positive"
+        return self
@@ -0,0 +1,228 @@
+import asyncio
+from collections import deque
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Deque, Iterable, List, Optional, Tuple
+
+from rdflib import Graph
+
+from syncfstriples.defaults import DEFAULT_INFLIGHT
+
+log = getLogger(__name__)
+
+PARSE_PREFETCH = 2  # parsed graphs waiting per parse worker
+
+# a write to the store, run in a worker thread, and the callback to run
+# (in the thread driving the sync) with the result once it succeeded
+WriteJob = Tuple[Callable[[], Any], Optional[Callable[[Any], None]]]
+# a function taking on a write and its callback
+Submit = Callable[[Callable[[], Any], Optional[Callable[[Any], None]]], None]
+
+
+def write_now(
+    write: Callable[[], Any], on_done: Callable[[Any], None] = None
+) -> None:
+    """executes the write right away (the non-pipelined way)
+
+    :param write: the write to execute
+    :type write: Callable[[], Any]
+    :param on_done: called with the result of the write
+        optional - defaults to None
+    :type on_done: Callable[[Any], None]
+    :rtype: None
+    """
+    result = write()
+    if on_done is not None:
+        on_done(result)
+
+
+class AsyncPipeline:
+    """Runs the parsing of files and the writes to the store as concurrent
+    stages on an asyncio event loop, joined by bounded queues:
+    parsing happens in a pool of workers (keeping a bounded number of parsed
+    graphs ahead), while up to `inflight` writes are sent to the store from
+    a pool of threads. Callbacks of finished writes (e.g. recording the
+    sync-state) run on the loop, so never concurrently.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        inflight: int = DEFAULT_INFLIGHT,
+        concurrent_writes: bool = True,
+    ):
+        """Creates the pipeline
+
+        :param workers: number of worker processes parsing the files
+            (1 means parsing in a thread next to the event loop)
+            optional - defaults to 1
+        :type workers: int
+        :param inflight: max number of concurrent writes to the store
+            optional - defaults to DEFAULT_INFLIGHT = 4
+        :type inflight: int
+        :param concurrent_writes: indicates the store can handle writes
+            from concurrent threads, if not these are serialized (while
+            still overlapping with the parsing)
+            optional - defaults to True
+        :type concurrent_writes: bool
+        """
+        assert workers >= 1, "the number of workers should be at least 1."
+        assert inflight >= 1, "the number of inflight writes should be >= 1"
+        self._workers: int = workers
+        self._inflight: int = inflight
+        self._write_lock: Optional[Lock] = (
+            None if concurrent_writes else Lock()
+        )
+        self._jobs: List[WriteJob] = list()
+
+    def submit(
+        self, write: Callable[[], Any], on_done: Callable[[Any], None] = None
+    ) -> None:
+        """queues the write to be executed by the running pipeline
+
+        :param write: the write to execute
+        :type write: Callable[[], Any]
+        :param on_done: called with the result of the write once it succeeded
+            optional - defaults to None
+        :type on_done: Callable[[Any], None]
+        :rtype: None
+        """
+        self._jobs.append((write, on_done))
+
+    def _locked(self, write: Callable[[], Any]) -> Callable[[], Any]:
+        if self._write_lock is None:
+            return write
+        # else
+
+        def locked_write():
+            with self._write_lock:
+                return write()
+
+        return locked_write
+
+    def _parse_pool(self) -> Executor:
+        if self._workers > 1:
+            return ProcessPoolExecutor(max_workers=self._workers)
+        return ThreadPoolExecutor(max_workers=1)
+
+    def run(
+        self,
+        fpaths: Iterable[Path],
+        parse: Callable[[Path], Graph],
+        handle: Callable[[Path, Graph], None],
+        finish: Callable[[], None] = None,
+        admit: Callable[[Path], bool] = None,
+    ) -> None:
+        """runs the pipeline to completion, raising the first error that
+        occurred (after letting the writes in flight finish)
+
+        :param fpaths: the files to parse
+        :type fpaths: Iterable[Path]
+        :param parse: (picklable) function parsing a file into a graph
+        :type parse: Callable[[Path], Graph]
+        :param handle: function called on the loop with each parsed graph,
+            submitting the writes it needs
+        :type handle: Callable[[Path, Graph], None]
+        :param finish: function called on the loop after the last graph,
+            submitting any remaining writes
+            optional - defaults to None
+        :type finish: Callable[[], None]
+        :param admit: function called on the loop deciding if parsing a
+            next file can start now, else it waits for the graphs parsed
+            ahead of it or the writes in flight to finish (the first file
+            waiting for nothing is always admitted, not to stall)
+            optional - defaults to None meaning all files are admitted
+        :type admit: Callable[[Path], bool]
+        :rtype: None
+        """
+        asyncio.run(self._run(fpaths, parse, handle, finish, admit))
+
+    async def _run(self, fpaths, parse, handle, finish, admit) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self._inflight)
+        in_flight: set = set()
+        errors: List[BaseException] = list()
+
+        def written(on_done, future: asyncio.Future) -> None:
+            slots.release()
+            in_flight.discard(future)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None and on_done is not None:
+                try:
+                    on_done(future.result())
+                except Exception as e:
+                    error = e
+            if error is not None:
+                errors.append(error)
+
+        async def drain_jobs(write_pool: Executor) -> None:
+            while self._jobs and not errors:
+                write, on_done = self._jobs.pop(0)
+                await slots.acquire()
+                future = loop.run_in_executor(write_pool, self._locked(write))
+                in_flight.add(future)
+                future.add_done_callback(lambda f, d=on_done: written(d, f))
+
+        prefetch: int = self._workers * PARSE_PREFETCH
+        todo = iter(fpaths)
+        waiting: Optional[Path] = None
+        parsing: Deque[Tuple[Path, asyncio.Future]] = deque()
+        with self._parse_pool() as parse_pool, ThreadPoolExecutor(
+            max_workers=self._inflight
+        ) as write_pool:
+            try:
+                await drain_jobs(write_pool)
+                while not errors:
+                    while len(parsing) < prefetch:
+                        fpath = waiting or next(todo, None)
+                        waiting = None
+                        if fpath is None:
+                            break
+                        if (
+                            admit is not None
+                            and not admit(fpath)
+                            and (parsing or in_flight)
+                        ):
+                            waiting = fpath
+                            break
+                        parsing.append(
+                            (
+                                fpath,
+                                loop.run_in_executor(parse_pool, parse, fpath),
+                            )
+                        )
+                    if not parsing and waiting is not None:
+                        # for writes in flight to give back memory
+                        await asyncio.wait(
+                            list(in_flight),
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                        await asyncio.sleep(0)
+                        continue
+                    if not parsing:
+                        break
+                    fpath, parsed = parsing.popleft()
+                    graph: Graph = await parsed
+                    handle(fpath, graph)
+                    await drain_jobs(write_pool)
+                if not errors and finish is not None:
+                    finish()
+                    await drain_jobs(write_pool)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                for _, parsed in parsing:
+                    parsed.cancel()
+                self._jobs.clear()
+                if in_flight:
+                    await asyncio.wait(list(in_flight))
+        if errors:
+            raise errors[0]
@@ -0,0 +1,178 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from syncfstriples.compression import compression_of
+from syncfstriples.state import SyncStateEntry
+
+# rough average size of a triple in the supported formats
+BYTES_PER_TRIPLE = {
+    "turtle": 60,
+    "nt": 110,
+    "nquads": 130,
+    "json-ld": 120,
+}
+DEFAULT_BYTES_PER_TRIPLE = 100
+# rough compression ratios of rdf dumps
+COMPRESSION_RATIO = {
+    ".gz": 8,
+    ".bz2": 10,
+    ".xz": 10,
+    ".zst": 8,
+}
+PLAN_CATEGORIES = ("additions", "updates", "removals", "skipped")
+
+
+class TooManyRemovals(Exception):
+    """Raised when a sync would remove a larger part of the graphs in the
+    store than allowed, as happens when the synced volume is not mounted
+    """
+
+
+def check_removals(
+    removals: int, known: int, max_removal_pct: Optional[float]
+) -> None:
+    """checks the number of removals stays within the allowed part of the
+    known keys in the store
+
+    :param removals: the number of keys to remove
+    :type removals: int
+    :param known: the number of keys in the store (in scope of the sync)
+    :type known: int
+    :param max_removal_pct: the max percentage of the known keys to remove
+        or None meaning there is no limit
+    :type max_removal_pct: float
+    :raises TooManyRemovals: when more than allowed would be removed
+    :rtype: None
+    """
+    if max_removal_pct is None or removals == 0:
+        return
+    # else
+    pct: float = 100.0 * removals / max(known, removals)
+    if pct > max_removal_pct:
+        raise TooManyRemovals(
+            f"refusing to remove {removals} of {known} graphs ({pct:.1f}%), "
+            f"more than the allowed {max_removal_pct}% - "
+            "force the sync to remove them anyway"
+        )
+
+
+def estimate_triples(fpath: Path, size: int, format: str) -> int:
+    """estimates the number of triples in a dump without parsing it
+
+    :param fpath: path of the dump file
+    :type fpath: Path
+    :param size: the size of the file in bytes
+    :type size: int
+    :param format: the rdflib format of the file
+    :type format: str
+    :returns: the estimated number of triples
+    :rtype: int
+    """
+    compression: str = compression_of(fpath)
+    if compression is not None:
+        size *= COMPRESSION_RATIO[compression]
+    return size // BYTES_PER_TRIPLE.get(format, DEFAULT_BYTES_PER_TRIPLE)
+
+
+class SyncPlan:
+    """The decided actions of a sync, before executing them.
+    Lists the files to add or update, the keys to remove and the unchanged
+    keys to skip, along with what is needed to execute and record them.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        additions: List[Path],
+        updates: List[Path],
+        removals: List[str],
+        skipped: List[str],
+        stat_by_fname: Dict[str, os.stat_result],
+        hash_by_fname: Dict[str, str] = None,
+        triples_by_fname: Dict[str, int] = None,
+        refreshed: List[SyncStateEntry] = None,
+    ):
+        """Creates the plan
+
+        :param root: the folder the plan syncs from
+        :type root: Path
+        :param additions: the new files to add to the store
+        :type additions: List[Path]
+        :param updates: the changed files to update in the store
+        :type updates: List[Path]
+        :param removals: the keys of the files that no longer exist
+        :type removals: List[str]
+        :param skipped: the keys of the unchanged files
+        :type skipped: List[str]
+        :param stat_by_fname: the stat of the files as scanned
+        :type stat_by_fname: Dict[str, os.stat_result]
+        :param hash_by_fname: the content hashes of the files to record
+            optional - defaults to None meaning no hashes
+        :type hash_by_fname: Dict[str, str]
+        :param triples_by_fname: the estimated triples in the files
+            optional - defaults to None meaning no estimates
+        :type triples_by_fname: Dict[str, int]
+        :param refreshed: the sync-state entries of unchanged files to record
+            anew (e.g. with a new mtime)
+            optional - defaults to None
+        :type refreshed: List[SyncStateEntry]
+        """
+        self.root: Path = Path(root)
+        self.additions: List[Path] = additions
+        self.updates: List[Path] = updates
+        self.removals: List[str] = removals
+        self.skipped: List[str] = skipped
+        self.stat_by_fname: Dict[str, os.stat_result] = stat_by_fname
+        self.hash_by_fname: Dict[str, str] = hash_by_fname or dict()
+        self.triples_by_fname: Dict[str, int] = triples_by_fname or dict()
+        self.refreshed: List[SyncStateEntry] = refreshed or list()
+
+    @property
+    def known(self) -> int:
+        """the number of keys in the store the plan has considered"""
+        return len(self.updates) + len(self.removals) + len(self.skipped)
+
+    @property
+    def is_empty(self) -> bool:
+        """indicates there is nothing to add, update or remove"""
+        return not (self.additions or self.updates or self.removals)
+
+    def _fnames(self, category: str) -> List[str]:
+        if category in ("additions", "updates"):
+            return [str(fpath) for fpath in getattr(self, category)]
+        # else keys relative to root
+        return [str(self.root / key) for key in getattr(self, category)]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """gives the number of files, bytes and estimated triples per
+        category (of PLAN_CATEGORIES). Removed files have no known size.
+
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        summary: Dict[str, Dict[str, int]] = dict()
+        for category in PLAN_CATEGORIES:
+            fnames: List[str] = self._fnames(category)
+            stats = [
+                self.stat_by_fname[fname]
+                for fname in fnames
+                if fname in self.stat_by_fname
+            ]
+            summary[category] = dict(
+                files=len(fnames),
+                bytes=sum(stat.st_size for stat in stats),
+                triples=sum(
+                    self.triples_by_fname.get(fname, 0) for fname in fnames
+                ),
+            )
+        return summary
+
+    def __str__(self) -> str:
+        lines: List[str] = [f"sync plan for {self.root}"]
+        for category, totals in self.summary().items():
+            lines.append(
+                f"  {category:<10} {totals['files']:>8} files "
+                f"{totals['bytes']:>14} bytes "
+                f"~{totals['triples']:>12} triples"
+            )
+        return "\n".join(lines)
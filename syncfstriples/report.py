@@ -0,0 +1,149 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, Union
+
+# the phases of a sync that get timed
+PHASES = ("scan", "keys", "detect", "parse", "insert", "drop")
+# the counters of a sync
+COUNTERS = (
+    "files_scanned",
+    "files_added",
+    "files_updated",
+    "files_removed",
+    "files_skipped",
+    "files_failed",
+    "bytes",
+    "triples",
+    "requests",
+)
+METRICS_PREFIX = "syncfstriples"
+
+
+class SyncReport:
+    """Collects the timings and counters of one sync run.
+    Time spent per phase is summed over all threads and worker processes,
+    so with concurrent parsing or writes it can exceed the elapsed time.
+    Safe to update from concurrent threads.
+    """
+
+    def __init__(self):
+        """Creates an empty report, starting the clock"""
+        self.started: float = time.time()
+        self.elapsed: float = None
+        self.seconds: Dict[str, float] = {phase: 0.0 for phase in PHASES}
+        self.counters: Dict[str, int] = {name: 0 for name in COUNTERS}
+        self.file_seconds: Dict[str, float] = dict()
+        self._t0: float = time.perf_counter()
+        self._lock: Lock = Lock()
+
+    def add_time(self, phase: str, seconds: float, key: str = None) -> None:
+        """adds seconds spent in the phase, on the file with key if given
+
+        :param phase: one of PHASES
+        :type phase: str
+        :param seconds: the time spent
+        :type seconds: float
+        :param key: the key of the file the time was spent on
+            optional - defaults to None meaning not on a single file
+        :type key: str
+        """
+        with self._lock:
+            self.seconds[phase] += seconds
+            if key is not None:
+                self.file_seconds[key] = (
+                    self.file_seconds.get(key, 0.0) + seconds
+                )
+
+    @contextmanager
+    def phase(self, phase: str, key: str = None) -> Iterator[None]:
+        """times the enclosed block as part of the phase
+
+        :param phase: one of PHASES
+        :type phase: str
+        :param key: the key of the file the block works on
+            optional - defaults to None meaning not on a single file
+        :type key: str
+        """
+        t0: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - t0, key)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """increments the counter with name (one of COUNTERS) by n"""
+        with self._lock:
+            self.counters[name] += n
+
+    def finish(self) -> "SyncReport":
+        """stops the clock, returns the report itself"""
+        self.elapsed = time.perf_counter() - self._t0
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """gives the report as a json-serializable dict"""
+        elapsed = self.elapsed
+        if elapsed is None:
+            elapsed = time.perf_counter() - self._t0
+        with self._lock:
+            return dict(
+                started=self.started,
+                elapsed=elapsed,
+                seconds=dict(self.seconds),
+                counters=dict(self.counters),
+                file_seconds=dict(self.file_seconds),
+            )
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """writes the report as json to the file at path"""
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def write_prometheus(
+        self, path: Union[str, Path], prefix: str = METRICS_PREFIX
+    ) -> None:
+        """writes the report in the prometheus text exposition format to
+        the file at path, as picked up by the node_exporter textfile
+        collector (so without the per-file durations)
+
+        :param path: path of the file to write, should end in .prom
+        :type path: Union[str, Path]
+        :param prefix: prefix of the metric names
+            optional - defaults to METRICS_PREFIX = "syncfstriples"
+        :type prefix: str
+        """
+        report: Dict[str, Any] = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_phase_seconds time spent per sync phase",
+            f"# TYPE {prefix}_phase_seconds gauge",
+        ]
+        for phase, seconds in report["seconds"].items():
+            lines.append(
+                f'{prefix}_phase_seconds{{phase="{phase}"}} {seconds}'
+            )
+        for name, value in report["counters"].items():
+            lines.extend(
+                [
+                    f"# TYPE {prefix}_{name} gauge",
+                    f"{prefix}_{name} {value}",
+                ]
+            )
+        for name in ("started", "elapsed"):
+            lines.extend(
+                [
+                    f"# TYPE {prefix}_{name}_seconds gauge",
+                    f"{prefix}_{name}_seconds {report[name]}",
+                ]
+            )
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _write_atomic(path: Union[str, Path], content: str) -> None:
+    """writes the content so readers never see a partial file"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
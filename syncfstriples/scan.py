@@ -0,0 +1,177 @@
+import os
+from fnmatch import fnmatchcase
+from hashlib import blake2b
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+from syncfstriples.formats import is_supported_dump
+
+# folders holding version-control metadata never contain dumps to sync
+DEFAULT_EXCLUDES = (".git", ".hg", ".svn")
+
+
+def matches_any(relpath: str, patterns: Iterable[str]) -> bool:
+    """checks if the relpath matches any of the glob-style patterns
+    Patterns containing a '/' are matched against the complete relative
+    path, others only against the last part (the name) of it.
+
+    :param relpath: the '/'-separated path relative to the scanned root
+    :type relpath: str
+    :param patterns: the glob-style patterns to match
+    :type patterns: Iterable[str]
+    :rtype: bool
+    """
+    name: str = relpath.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if fnmatchcase(relpath if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+class Shard(NamedTuple):
+    """One of count deterministic, hash-based partitions of the relative
+    paths (and so the keys) of a tree, allowing multiple processes to each
+    sync their own part of it
+    """
+
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(spec: str) -> "Shard":
+        """parses the 'i/N' notation of shard i (0 <= i < N) out of N"""
+        index, _, count = spec.partition("/")
+        shard = Shard(int(index), int(count))
+        assert 0 <= shard.index < shard.count, (
+            "shard " + str(spec) + " should be i/N with 0 <= i < N"
+        )
+        return shard
+
+    def owns(self, relpath: str) -> bool:
+        """checks if the '/'-separated relpath belongs to this shard"""
+        digest = blake2b(relpath.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count == self.index
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+class TreeScanner:
+    """Lists the files in a folder tree using os.scandir.
+    Files are selected by the accept-function and the include patterns,
+    while the exclude patterns drop files and prune complete folders.
+    With a shard only the files owned by it are selected.
+    """
+
+    def __init__(
+        self,
+        include: Iterable[str] = None,
+        exclude: Iterable[str] = DEFAULT_EXCLUDES,
+        accept: Callable[[str], bool] = None,
+        shard: Shard = None,
+    ):
+        """Creates the scanner
+
+        :param include: glob-style patterns files should match
+            optional - defaults to None meaning all files are included
+        :type include: Iterable[str]
+        :param exclude: glob-style patterns of files and folders to skip
+            optional - defaults to DEFAULT_EXCLUDES
+        :type exclude: Iterable[str]
+        :param accept: function deciding on the file-names to consider
+            optional - defaults to None meaning all names are accepted
+        :type accept: Callable[[str], bool]
+        :param shard: the shard of the tree to limit the scan to
+            optional - defaults to None meaning the whole tree is scanned
+        :type shard: Shard
+        """
+        self.include: List[str] = list(include or [])
+        self.exclude: List[str] = list(exclude or [])
+        self._accept: Callable[[str], bool] = accept
+        self.shard: Shard = shard
+
+    def owns(self, relpath: str) -> bool:
+        """checks if the file at relpath belongs to the shard scanned"""
+        return self.shard is None or self.shard.owns(relpath)
+
+    def accepts_dir(self, reldir: str) -> bool:
+        """checks if the scan should descend in the folder at reldir"""
+        return not matches_any(reldir, self.exclude)
+
+    def accepts_file(self, relpath: str) -> bool:
+        """checks if the file at relpath should be part of the scan"""
+        name: str = relpath.rsplit("/", 1)[-1]
+        if self._accept is not None and not self._accept(name):
+            return False
+        if self.include and not matches_any(relpath, self.include):
+            return False
+        if matches_any(relpath, self.exclude):
+            return False
+        return self.owns(relpath)
+
+    def accepts_path(self, relpath: str, is_dir: bool = False) -> bool:
+        """checks if the file (or folder) at relpath would be found (or
+        descended into) when scanning, taking into account the pruning of
+        any of its parent folders
+        """
+        parts: List[str] = relpath.split("/")
+        for n in range(1, len(parts) + int(is_dir)):
+            if not self.accepts_dir("/".join(parts[:n])):
+                return False
+        return is_dir or self.accepts_file(relpath)
+
+    def scan(self, root: Path, top: Path = None) -> Dict[str, os.stat_result]:
+        """lists the selected files with their stat info
+
+        :param root: the root folder the patterns are relative to
+        :type root: Path
+        :param top: the folder inside root to start the scan from
+            optional - defaults to None meaning the root itself
+        :type top: Path
+        :returns: dict of fnames + their stat_result on disk
+        :rtype: Dict[ str, os.stat_result ]
+        """
+        found: Dict[str, os.stat_result] = dict()
+        top = top if top is not None else root
+        reltop: str = Path(os.path.relpath(top, root)).as_posix()
+        prefix: str = "" if reltop == "." else reltop + "/"
+        stack: List[Tuple[str, str]] = [(str(top), prefix)]
+        while stack:
+            dirpath, prefix = stack.pop()
+            try:
+                entries = os.scandir(dirpath)
+            except (FileNotFoundError, NotADirectoryError):
+                continue  # vanished while scanning
+            with entries:
+                for entry in entries:
+                    relpath: str = prefix + entry.name
+                    try:
+                        if entry.is_dir():
+                            if self.accepts_dir(relpath):
+                                stack.append((entry.path, relpath + "/"))
+                        elif entry.is_file() and self.accepts_file(relpath):
+                            found[entry.path] = entry.stat()
+                    except FileNotFoundError:
+                        continue  # vanished while scanning
+        return found
+
+
+def make_scanner(
+    include: Iterable[str] = None,
+    exclude: Iterable[str] = DEFAULT_EXCLUDES,
+    shard: Shard = None,
+) -> TreeScanner:
+    """creates the scanner listing the rdf dump files in a folder tree
+
+    :param include: glob-style patterns files should match
+        optional - defaults to None meaning all rdf dump files are included
+    :type include: Iterable[str]
+    :param exclude: glob-style patterns of files and folders to skip
+        optional - defaults to DEFAULT_EXCLUDES
+    :type exclude: Iterable[str]
+    :param shard: the shard of the tree to limit the scan to
+        optional - defaults to None meaning the whole tree is scanned
+    :type shard: Shard
+    :rtype: TreeScanner
+    """
+    return TreeScanner(include, exclude, accept=is_supported_dump, shard=shard)
@@ -1,72 +1,370 @@
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timezone
+from functools import partial
 from logging import getLogger
 from pathlib import Path
-from typing import Dict
+from threading import Event
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from uuid import uuid4
+
+from pyrdfstore.store import GraphNameMapper, MemoryRDFStore, RDFStore
+from rdflib import ConjunctiveGraph, Graph
 
-from pyrdfstore.store import (
-    GraphNameMapper,
-    MemoryRDFStore,
-    RDFStore,
-    URIRDFStore,
+from syncfstriples.batch import InsertBatcher, remove_keys
+from syncfstriples.budget import MemoryBudget, estimate_memory
+from syncfstriples.compression import compression_of, open_dump
+from syncfstriples.contexts import ContextResolver
+from syncfstriples.defaults import (
+    CHANGE_DETECTION_MODES,
+    DEFAULT_BATCH_GRAPHS,
+    DEFAULT_CHANGE_DETECTION,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_SNAPSHOT_DIRNAME,
+    DEFAULT_UPDATE_STRATEGY,
+    DEFAULT_URN_BASE,
+    DEFAULT_WORKERS,
+    UPDATE_STRATEGIES,
+)
+from syncfstriples.diff import (
+    SnapshotStore,
+    apply_graph_delta,
+    has_bnodes,
+    skolemize_for_key,
+)
+from syncfstriples.formats import format_from_filepath
+from syncfstriples.journal import PendingSync, SyncJournal
+from syncfstriples.options import SyncOptions
+from syncfstriples.pipeline import AsyncPipeline, Submit, write_now
+from syncfstriples.plan import SyncPlan, check_removals, estimate_triples
+from syncfstriples.report import SyncReport
+from syncfstriples.scan import (
+    DEFAULT_EXCLUDES,
+    Shard,
+    TreeScanner,
+    make_scanner,
+)
+from syncfstriples.session import (
+    DEFAULT_HTTP_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+)
+from syncfstriples.state import SyncStateEntry, SyncStateIndex, content_hash
+from syncfstriples.store import (
+    SyncURIRDFStore,
+    insert_for_keys,
+    lastmod_by_key,
+    lastmod_of_key,
+    replace_graph_for_key,
+)
+from syncfstriples.stream import (
+    STREAMABLE_FORMATS,
+    can_map,
+    collapse_quads,
+    iter_graph_chunks,
+    iter_line_spans,
+    parse_span,
+)
+from syncfstriples.upload import (
+    CONTENT_TYPE_BY_FORMAT,
+    can_upload,
+    precheck_dump,
+)
+from syncfstriples.watch import (
+    DEFAULT_DEBOUNCE,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_POLL_INTERVAL,
+    make_watcher,
+    watch_changes,
 )
-from rdflib import Graph
 
 log = getLogger(__name__)
 
 UTC_tz = timezone.utc
-SUFFIX_TO_FORMAT = {
-    ".ttl": "turtle",
-    ".turtle": "turtle",
-    ".jsonld": "json-ld",
-    ".json-ld": "json-ld",
-    ".json": "json-ld",
-}
-SUPPORTED_RDF_DUMP_SUFFIXES = [sfx for sfx in SUFFIX_TO_FORMAT]
-DEFAULT_URN_BASE = "urn:sync:"
-
-
-def get_lastmod_by_fname(from_path: Path) -> Dict[str, datetime]:
+PREFETCH_PER_WORKER = 2
+
+
+def owned_keys(keys: Iterable[str], scanner: TreeScanner) -> List[str]:
+    """filters the keys (in the store) down to the ones owned by the shard
+    of the scanner, so a shard never touches the graphs of another one
+    """
+    return [key for key in keys if scanner.owns(Path(key).as_posix())]
+
+
+def get_stat_by_fname(
+    from_path: Path, scanner: TreeScanner = None
+) -> Dict[str, os.stat_result]:
+    """lists all files in path with their stat info
+
+    :param from_path: root to list contents from
+    :type from_path: Path
+    :param scanner: the scanner selecting the files to list
+        optional - defaults to None meaning all rdf dumps are listed
+    :type scanner: TreeScanner
+    :returns: dict of fnames + their stat_result on disk
+    :rtype: Dict[ str, os.stat_result ]
+    """
+    scanner = scanner or make_scanner()
+    return scanner.scan(from_path)
+
+
+def get_lastmod_by_fname(
+    from_path: Path, scanner: TreeScanner = None
+) -> Dict[str, datetime]:
     """lists all files in path with their lastmod timestamp
 
     :param from_path: root to list contents from
     :type from_path: Path
+    :param scanner: the scanner selecting the files to list
+        optional - defaults to None meaning all rdf dumps are listed
+    :type scanner: TreeScanner
     :returns: dict of fnames + their lastmod on disk
     :rtype: Dict[ str, datetime ]
     """
     return {
-        str(p): datetime.fromtimestamp(p.stat().st_mtime, UTC_tz)
-        for p in from_path.glob("**/*")
-        if p.is_file() and p.suffix in SUPPORTED_RDF_DUMP_SUFFIXES
+        fname: datetime.fromtimestamp(stat.st_mtime, UTC_tz)
+        for fname, stat in get_stat_by_fname(from_path, scanner).items()
     }
 
 
-def format_from_filepath(fpath: Path) -> str:
-    """extracts the rdflib file format from the suffix of the file in fpath
-
-    :param fpath: path of file to inspect
-    :type fpath: Path
-    :returns: value for rdflib format=  for that file
-    :rtype: str
-    """
-    suffix = fpath.suffix.lower()
-    return SUFFIX_TO_FORMAT.get(suffix, None)
-
-
-def load_graph_fpath(fpath: Path, format: str = None) -> Graph:
+def load_graph_fpath(
+    fpath: Path, format: str = None, contexts: ContextResolver = None
+) -> Graph:
     """loads content of file at fpath into a graph
     :param fpath: path of file to load
     :type fpath: Path
     :param format: rdflib format to apply when parsing the file
         optional - if left None, autodetected base on file-extension
     :type format: str
+    :param contexts: resolves the remote contexts of json-ld files, to
+        inline them before parsing
+        optional - defaults to None meaning rdflib fetches them
+    :type contexts: ContextResolver
     :returns: the graph containing the triples from the file
     :rtype: Graph
     """
     format = format or format_from_filepath(fpath)
-    graph: Graph = Graph().parse(location=str(fpath), format=format)
+    if format == "json-ld" and contexts is not None:
+        base: str = Path(fpath).absolute().as_uri()
+        with open_dump(fpath) as f:
+            data = contexts.inline(json.load(f), base)
+        if not isinstance(data, dict):
+            # rdflib only takes already parsed json-ld as a single object
+            data = json.dumps(data)
+        return parse_graph(format, data=data, publicID=base)
+    # else
+    if compression_of(fpath) is not None:
+        # decompress while parsing, relative iris still resolve to the file
+        with open_dump(fpath) as f:
+            return parse_graph(
+                format, source=f, publicID=Path(fpath).absolute().as_uri()
+            )
+    # else
+    return parse_graph(format, location=str(fpath))
+
+
+def load_graph_timed(
+    fpath: Path, contexts: ContextResolver = None
+) -> Tuple[Optional[Graph], float]:
+    """loads the file at fpath like load_graph_fpath, also giving the
+    seconds it took (measured where the parsing happens, e.g. in a worker)
+    Failing to parse is logged, and gives no graph.
+
+    :param fpath: path of file to load
+    :type fpath: Path
+    :param contexts: resolves the remote contexts of json-ld files
+        optional - defaults to None
+    :type contexts: ContextResolver
+    :returns: the graph containing the triples from the file (None if it
+        failed to parse), and the time spent parsing it
+    :rtype: Tuple[Optional[Graph], float]
+    """
+    t0: float = time.perf_counter()
+    graph: Optional[Graph] = None
+    try:
+        graph = load_graph_fpath(fpath, contexts=contexts)
+    except Exception:
+        log.exception(f"failed to parse {fpath}")
+    return graph, time.perf_counter() - t0
+
+
+def parse_graph(format: str, **parse_args) -> Graph:
+    """parses the content described by the parse_args into a graph
+    (with the quads of all graphs in nquads content collapsed into it)
+
+    :param format: rdflib format of the content
+    :type format: str
+    :param parse_args: the arguments for rdflib Graph.parse
+    :returns: the graph containing the parsed triples
+    :rtype: Graph
+    """
+    if format == "nquads":
+        # the quads of all graphs in the file end up in its named graph
+        dataset = ConjunctiveGraph()
+        # (parse gives the graph parsed into, so keep the dataset at hand)
+        dataset.parse(format=format, **parse_args)
+        return collapse_quads(dataset)
+    # else
+    graph: Graph = Graph().parse(format=format, **parse_args)
     return graph
 
 
+def is_streamable(fpath: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bool:
+    """checks if the file at fpath is to be synced in chunks of chunk_size,
+    being an n-triples or n-quads file estimated to hold more than a chunk
+    (smaller ones are parsed, batched and budgeted like other files)
+
+    :param fpath: path of the file to sync
+    :type fpath: Path
+    :param chunk_size: max number of lines per chunk, 0 or None disables
+    :type chunk_size: int
+    :rtype: bool
+    """
+    if not chunk_size:
+        return False
+    # else
+    format: str = format_from_filepath(fpath)
+    if format not in STREAMABLE_FORMATS:
+        return False
+    # else
+    try:
+        size: int = fpath.stat().st_size
+    except OSError:
+        # gone, left to fail (and be isolated) as any other file
+        return False
+    return estimate_triples(fpath, size, format) > chunk_size
+
+
+def insert_chunks(
+    store: RDFStore,
+    fpath: Path,
+    key: str,
+    chunk_size: int,
+    replace: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> int:
+    """inserts the content of the (line-based) dump at fpath for the key,
+    parsing and inserting it one chunk of lines at a time.
+    With workers > 1 a not compressed file is memory-mapped and split on
+    line boundaries, its chunks being parsed in a pool of worker processes
+    (each reading only its own chunk) while inserted in order.
+
+    :param store: target store to insert in
+    :type store: RDFStore
+    :param fpath: path of the n-triples or n-quads file to insert
+    :type fpath: Path
+    :param key: the key of the graph to insert into
+    :type key: str
+    :param chunk_size: max number of lines per chunk
+    :type chunk_size: int
+    :param replace: replace the current content of the graph with the first
+        chunk, so the graph is never seen empty
+        optional - defaults to False
+    :type replace: bool
+    :param workers: number of worker processes parsing the chunks
+        optional - defaults to DEFAULT_WORKERS = 1 meaning in-process parsing
+    :type workers: int
+    :returns: the number of inserted triples
+    :rtype: int
+    """
+    format: str = format_from_filepath(fpath)
+    graphs: Iterable[Graph] = None
+    if workers > 1 and can_map(fpath):
+        spans = list(iter_line_spans(fpath, format, chunk_size))
+        if len(spans) > 1:
+            log.debug(f"parsing {len(spans)} chunks of {fpath} in parallel")
+            # the blank nodes of all chunks share a scope unique to the file
+            parse = partial(parse_span, fpath, format, uuid4().hex)
+            parsed = iter_parsed_graphs(spans, workers, parse=parse)
+            graphs = (graph for _, graph in parsed)
+    if graphs is None:
+        graphs = iter_graph_chunks(fpath, format, chunk_size)
+    triples: int = 0
+    for graph in graphs:
+        triples += len(graph)
+        if replace:
+            replace_graph_for_key(store, graph, key)
+            replace = False
+        elif len(graph):
+            insert_for_keys(store, {key: graph})
+    if replace:  # no chunks at all
+        replace_graph_for_key(store, Graph(), key)
+    return triples
+
+
+def iter_parsed_graphs(
+    fpaths: Iterable[Path],
+    workers: int = DEFAULT_WORKERS,
+    parse: Callable[[Path], Any] = load_graph_fpath,
+    admit: Callable[[Path], bool] = None,
+) -> Iterator[Tuple[Path, Any]]:
+    """parses the files in fpaths and yields them with their graph
+    when workers > 1 the parsing happens in a pool of worker processes,
+    keeping at most PREFETCH_PER_WORKER parsed graphs per worker ahead
+    of the consumer (to bound the memory held by waiting results)
+
+    :param fpaths: paths of the files to parse
+    :type fpaths: Iterable[Path]
+    :param workers: number of worker processes to use for parsing
+        optional - defaults to DEFAULT_WORKERS = 1 meaning in-process parsing
+    :type workers: int
+    :param parse: (picklable) function parsing a file
+        optional - defaults to load_graph_fpath
+    :type parse: Callable[[Path], Any]
+    :param admit: decides if parsing a next file can start now, else it
+        waits for the consumer to handle the files parsed ahead of it
+        (the first file waiting is always admitted, not to stall)
+        optional - defaults to None meaning all files are admitted
+    :type admit: Callable[[Path], bool]
+    :returns: iterator of (fpath, parsed) tuples in the order of fpaths
+    :rtype: Iterator[Tuple[Path, Any]]
+    """
+    if workers <= 1:
+        for fpath in fpaths:
+            if admit is not None:
+                admit(fpath)
+            yield fpath, parse(fpath)
+        return
+    # else
+    todo: Iterator[Path] = iter(fpaths)
+    waiting: Optional[Path] = None
+    pending: Deque[Tuple[Path, Future]] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # keep the pool busy while the consumer handles the results
+            while len(pending) < workers * PREFETCH_PER_WORKER:
+                fpath: Path = waiting or next(todo, None)
+                waiting = None
+                if fpath is None:
+                    break
+                if admit is not None and not admit(fpath) and pending:
+                    waiting = fpath
+                    break
+                pending.append((fpath, pool.submit(parse, fpath)))
+            if not pending:
+                return
+            # else
+            fpath, future = pending.popleft()
+            yield fpath, future.result()
+
+
 def relative_pathname(subpath: Path, ancestorpath: Path) -> str:
     """gives the relative part pointing to the subpath from the ancestorpath"""
     return str(subpath.absolute().relative_to(ancestorpath.absolute()))
@@ -92,7 +390,14 @@ def sync_removal(store: RDFStore, fpath: Path, rootpath: Path) -> None:
     store.forget_graph_for_key(key)
 
 
-def sync_addition(store: RDFStore, fpath: Path, rootpath: Path) -> None:
+def sync_addition(
+    store: RDFStore,
+    fpath: Path,
+    rootpath: Path,
+    graph: Graph = None,
+    chunk_size: int = None,
+    workers: int = DEFAULT_WORKERS,
+) -> Optional[int]:
     """Handles addition event triggered when a new file on disk appeared.
     (i.e. has not yet a matching graph in store).
     Resolution should ensure addition of the matching graph in the store
@@ -103,16 +408,36 @@ def sync_addition(store: RDFStore, fpath: Path, rootpath: Path) -> None:
     :type fpath: Path
     :param rootpath: root containing the sub fpath
     :type rootpath: Path
-    :param nmapper: convertor between fnames and graphnames to be used
-    :type nmapper: GraphFileNameMapper
-    :rtype: None
+    :param graph: the already parsed content of the file
+        optional - if left None, the file at fpath is loaded
+    :type graph: Graph
+    :param chunk_size: max number of lines to parse and insert at once,
+        only applies to not yet parsed n-triples and n-quads files
+        optional - defaults to None meaning the file is loaded at once
+    :type chunk_size: int
+    :param workers: number of worker processes parsing the chunks
+        optional - defaults to DEFAULT_WORKERS = 1 meaning in-process parsing
+    :type workers: int
+    :returns: the number of inserted triples when streamed in chunks
+    :rtype: Optional[int]
     """
     key: str = relative_pathname(fpath, rootpath)
-    g: Graph = load_graph_fpath(fpath)
+    if graph is None and is_streamable(fpath, chunk_size):
+        return insert_chunks(store, fpath, key, chunk_size, workers=workers)
+    # else
+    g: Graph = graph if graph is not None else load_graph_fpath(fpath)
     store.insert_for_key(g, key)
 
 
-def sync_update(store: RDFStore, fpath: Path, rootpath: Path) -> None:
+def sync_update(
+    store: RDFStore,
+    fpath: Path,
+    rootpath: Path,
+    graph: Graph = None,
+    previous: Graph = None,
+    chunk_size: int = None,
+    workers: int = DEFAULT_WORKERS,
+) -> Optional[int]:
     """Handles update event triggered when a file on disk was changed
     (i.e. has a more recent lastmod then matching graph in store).
     Resolution should ensure addition of the matching graph in the store
@@ -123,47 +448,990 @@ def sync_update(store: RDFStore, fpath: Path, rootpath: Path) -> None:
     :type fpath: Path
     :param rootpath: root containing the sub fpath
     :type rootpath: Path
-    :param nmapper: convertor between fnames and graphnames to be used
-    :type nmapper: GraphFileNameMapper
+    :param graph: the already parsed content of the file
+        optional - if left None, the file at fpath is loaded
+    :type graph: Graph
+    :param previous: the content of the file as it was synced before
+        optional - if given only the difference is applied to the store,
+        else the graph in the store is replaced (in one request if the
+        store allows for it)
+    :type previous: Graph
+    :param chunk_size: max number of lines to parse and insert at once,
+        only applies to reloading not yet parsed n-triples and n-quads files
+        optional - defaults to None meaning the file is loaded at once
+    :type chunk_size: int
+    :param workers: number of worker processes parsing the chunks
+        optional - defaults to DEFAULT_WORKERS = 1 meaning in-process parsing
+    :type workers: int
+    :returns: the number of inserted triples when streamed in chunks
+    :rtype: Optional[int]
+    """
+    key: str = relative_pathname(fpath, rootpath)
+    streamed: bool = previous is None and is_streamable(fpath, chunk_size)
+    if graph is None and streamed:
+        # too large to replace in one request, readers see it grow
+        return insert_chunks(
+            store, fpath, key, chunk_size, replace=True, workers=workers
+        )
+    # else
+    g: Graph = graph if graph is not None else load_graph_fpath(fpath)
+    if previous is not None:
+        apply_graph_delta(store, key, previous, g)
+        return
+    # else
+    replace_graph_for_key(store, g, key)
+
+
+def sync_upload(
+    store: RDFStore,
+    fpath: Path,
+    rootpath: Path,
+    replace: bool = True,
+    precheck: bool = False,
+) -> None:
+    """Handles addition or update of a file by uploading its content as-is
+    to the store, without parsing it.
+
+    :param store: target store to upload to, offering upload_file_for_key
+    :type store: RDFStore
+    :param fpath: file-path of file that was added or updated
+    :type fpath: Path
+    :param rootpath: root containing the sub fpath
+    :type rootpath: Path
+    :param replace: replace the graph in the store (for updates)
+        optional - defaults to True
+    :type replace: bool
+    :param precheck: do a fast syntax check of the file first
+        optional - defaults to False
+    :type precheck: bool
     :rtype: None
     """
     key: str = relative_pathname(fpath, rootpath)
-    store.drop_graph_for_key(key)
-    g: Graph = load_graph_fpath(fpath)
-    store.insert_for_key(g, key)
+    format: str = format_from_filepath(fpath)
+    if precheck:
+        precheck_dump(fpath, format)
+    store.upload_file_for_key(
+        str(fpath), CONTENT_TYPE_BY_FORMAT[format], key, replace=replace
+    )
 
 
-def perform_sync(from_path: Path, to_store: RDFStore) -> None:
-    """synchronizes found rdf-dump files in the from_path to the RDFStore specified
+def execute_syncs(
+    from_path: Path,
+    to_store: RDFStore,
+    handler_by_fpath: Dict[Path, Callable],
+    options: SyncOptions = None,
+    state: SyncStateIndex = None,
+    stat_by_fname: Dict[str, os.stat_result] = None,
+    hash_by_fname: Dict[str, str] = None,
+    snapshots: SnapshotStore = None,
+    report: SyncReport = None,
+    journal: SyncJournal = None,
+) -> Set[str]:
+    """executes the decided sync handlers for the files, keeping the state
+    index, snapshots and journal (if any) up to date.
+    Additions are inserted in batches. Files failing to parse or to sync
+    are isolated (logged and not recorded, so they are retried on the next
+    sync) rather than ending the sync.
 
     :param from_path: folder path to sync from
     :type from_path: Path
     :param to_store: rdf store target for the sync operation
     :type to_store: RDFStore
-    :param nmapper: convertor between fnames and graphnames to be used
-    :type nmapper: GraphFileNameMapper
-    :rtype: None
+    :param handler_by_fpath: sync_addition or sync_update per file to sync
+    :type handler_by_fpath: Dict[Path, Callable]
+    :param options: the settings of the sync, see SyncOptions
+        optional - defaults to None meaning the default SyncOptions
+    :type options: SyncOptions
+    :param state: local index of the sync-state to keep up to date
+        optional - defaults to None
+    :type state: SyncStateIndex
+    :param stat_by_fname: the stat of the files as scanned
+        optional - defaults to None meaning the files are stat-ed when synced
+    :type stat_by_fname: Dict[str, os.stat_result]
+    :param hash_by_fname: the content hashes of the files to record
+        optional - defaults to None meaning no hashes are recorded
+    :type hash_by_fname: Dict[str, str]
+    :param snapshots: snapshots of the synced graphs, when given updates are
+        applied as the difference with the snapshot
+        optional - defaults to None meaning updates drop and reload
+    :type snapshots: SnapshotStore
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :param journal: journal of the sync in progress to check off the
+        synced files in
+        optional - defaults to None
+    :type journal: SyncJournal
+    :returns: the keys that failed to sync
+    :rtype: Set[str]
+    """
+    options = options or SyncOptions()
+    workers: int = options.workers
+    chunk_size: int = options.chunk_size
+    stat_by_fname = stat_by_fname or dict()
+    hash_by_fname = hash_by_fname or dict()
+    report = report or SyncReport()
+    failed: Set[str] = set()
+    budget: MemoryBudget = None
+    if options.max_inflight_bytes:
+        budget = MemoryBudget(options.max_inflight_bytes)
+    held: Dict[str, int] = dict()  # the admitted cost by key
+
+    def admit(fpath: Path) -> bool:
+        stat = stat_by_fname.get(str(fpath)) or fpath.stat()
+        cost: int = estimate_memory(
+            fpath, stat.st_size, format_from_filepath(fpath)
+        )
+        if not budget.try_acquire(cost):
+            return False
+        # else
+        held[relative_pathname(fpath, from_path)] = cost
+        return True
+
+    def free(key: str) -> None:
+        cost: Optional[int] = held.pop(key, None)
+        if cost is not None:
+            budget.release(cost)
+
+    def record(fpath: Path) -> None:
+        if state is None:
+            return
+        # else
+        stat = stat_by_fname.get(str(fpath)) or fpath.stat()
+        state.record(
+            relative_pathname(fpath, from_path),
+            stat.st_mtime,
+            stat.st_size,
+            hash=hash_by_fname.get(str(fpath)),
+        )
+
+    def synced(fpath: Path, graph: Graph = None, result=None) -> None:
+        relname = relative_pathname(fpath, from_path)
+        if snapshots is not None and graph is not None:
+            if options.bnode_mode == "reload" and has_bnodes(graph):
+                # blank nodes make the delta unreliable, reload next time
+                snapshots.forget(relname)
+            else:
+                snapshots.save(relname, graph)
+        record(fpath)
+        if journal is not None:
+            journal.done(relname)
+        if handler_by_fpath[fpath] is sync_update:
+            report.count("files_updated")
+        else:
+            report.count("files_added")
+        stat = stat_by_fname.get(str(fpath))
+        report.count("bytes", stat.st_size if stat else fpath.stat().st_size)
+        if graph is not None:
+            report.count("triples", len(graph))
+        elif isinstance(result, int):  # streamed in chunks
+            report.count("triples", result)
+
+    def timed(write: Callable[[], Any], key: str = None) -> Callable:
+        def timed_write():
+            report.count("requests")
+            with report.phase("insert", key):
+                return write()
+
+        return timed_write
+
+    runner: AsyncPipeline = None
+    submit: Submit = write_now
+    if options.pipeline:
+        runner = AsyncPipeline(
+            workers,
+            options.inflight,
+            concurrent_writes=getattr(to_store, "concurrent_writes", False),
+        )
+        submit = runner.submit
+
+    def timed_submit(write: Callable[[], Any], on_done=None) -> None:
+        submit(timed(write), on_done)
+
+    def submit_file(
+        key: str, write: Callable[[], Any], on_done: Callable[[Any], None]
+    ) -> None:
+        """submits the write for the file with key, a failing write is
+        logged and collected in failed, rather than ending the sync
+        """
+
+        def guarded_write() -> Tuple[bool, Any]:
+            try:
+                return True, write()
+            except Exception:
+                log.exception(f"failed to sync {key}")
+                return False, None
+
+        def done(outcome: Tuple[bool, Any]) -> None:
+            succeeded, result = outcome
+            free(key)
+            if succeeded:
+                on_done(result)
+            else:
+                failed.add(key)
+
+        submit(timed(guarded_write, key), done)
+
+    batcher = InsertBatcher(
+        to_store,
+        options.max_batch_triples,
+        options.max_batch_graphs,
+        submit=timed_submit,
+    )
+    # snapshots need the complete graph, so no passthrough nor streaming then
+    uploaded: Set[Path] = set()
+    streamed: Set[Path] = set()
+    if snapshots is None:
+        if options.upload == "passthrough":
+            uploaded = {
+                fpath
+                for fpath in handler_by_fpath
+                if can_upload(to_store, format_from_filepath(fpath))
+            }
+        streamed = {
+            fpath
+            for fpath in handler_by_fpath
+            if fpath not in uploaded and is_streamable(fpath, chunk_size)
+        }
+    for fpath in uploaded:
+        log.debug(f"uploading {fpath} as-is")
+        replace: bool = handler_by_fpath[fpath] is sync_update
+        submit_file(
+            relative_pathname(fpath, from_path),
+            partial(
+                sync_upload,
+                to_store,
+                fpath,
+                from_path,
+                replace,
+                options.precheck,
+            ),
+            partial(synced, fpath, None),
+        )
+    for fpath in streamed:
+        log.debug(f"streaming {fpath} in chunks of {chunk_size} lines")
+        submit_file(
+            relative_pathname(fpath, from_path),
+            partial(
+                handler_by_fpath[fpath],
+                to_store,
+                fpath,
+                from_path,
+                chunk_size=chunk_size,
+                workers=workers,
+            ),
+            partial(synced, fpath, None),
+        )
+
+    def handle(fpath: Path, graph: Graph) -> None:
+        relname = relative_pathname(fpath, from_path)
+        handler: Callable = handler_by_fpath[fpath]
+        if snapshots is not None and options.bnode_mode == "skolemize":
+            graph = skolemize_for_key(to_store, relname, graph)
+        if handler is sync_addition:
+            batcher.add(relname, graph, partial(synced, fpath, graph))
+            free(relname)
+            return
+        # else
+        previous: Graph = None
+        if snapshots is not None and handler is sync_update:
+            previous = snapshots.load(relname)
+        write = partial(handler, to_store, fpath, from_path, graph=graph)
+        if previous is not None:
+            write = partial(write, previous=previous)
+        submit_file(relname, write, partial(synced, fpath, graph))
+
+    def handle_timed(
+        fpath: Path, parsed: Tuple[Optional[Graph], float]
+    ) -> None:
+        graph, seconds = parsed
+        relname = relative_pathname(fpath, from_path)
+        report.add_time("parse", seconds, relname)
+        if graph is None:  # failed to parse
+            free(relname)
+            failed.add(relname)
+            return
+        # else
+        try:
+            handle(fpath, graph)
+        except Exception:
+            log.exception(f"failed to sync {relname}")
+            free(relname)
+            failed.add(relname)
+
+    parsed: Iterable[Path] = [
+        fpath
+        for fpath in handler_by_fpath
+        if fpath not in uploaded and fpath not in streamed
+    ]
+    parse = partial(load_graph_timed, contexts=options.contexts)
+    if runner is not None:
+        runner.run(
+            parsed,
+            parse,
+            handle_timed,
+            finish=batcher.flush,
+            admit=admit if budget is not None else None,
+        )
+    else:
+        for fpath, timed_graph in iter_parsed_graphs(
+            parsed,
+            workers,
+            parse=parse,
+            admit=admit if budget is not None else None,
+        ):
+            handle_timed(fpath, timed_graph)
+        batcher.flush()
+    if budget is not None:
+        log.debug(
+            f"peak of the estimated memory in flight: {budget.peak} bytes "
+            f"(budget {budget.max_bytes} bytes)"
+        )
+    failed |= batcher.failed
+    if failed:
+        log.warning(
+            f"{len(failed)} files failed to sync, "
+            f"to be retried with the next sync: {sorted(failed)}"
+        )
+    report.count("files_failed", len(failed))
+    return failed
+
+
+def forget_removed(
+    key: str, state: SyncStateIndex = None, snapshots: SnapshotStore = None
+) -> None:
+    """drops the local knowledge about the key of a removed file"""
+    if state is not None:
+        state.forget(key)
+    if snapshots is not None:
+        snapshots.forget(key)
+
+
+def execute_removals(
+    to_store: RDFStore,
+    keys: Iterable[str],
+    state: SyncStateIndex = None,
+    snapshots: SnapshotStore = None,
+    max_batch_graphs: int = DEFAULT_BATCH_GRAPHS,
+    report: SyncReport = None,
+    journal: SyncJournal = None,
+) -> List[str]:
+    """removes the graphs for the keys of removed files from the store in
+    batches, and drops the local knowledge about the ones that got removed
+
+    :param to_store: rdf store target for the sync operation
+    :type to_store: RDFStore
+    :param keys: the keys of the removed files
+    :type keys: Iterable[str]
+    :param state: local index of the sync-state to keep up to date
+        optional - defaults to None
+    :type state: SyncStateIndex
+    :param snapshots: snapshots of the synced graphs to keep up to date
+        optional - defaults to None
+    :type snapshots: SnapshotStore
+    :param max_batch_graphs: max number of graphs per removal request
+        optional - defaults to DEFAULT_BATCH_GRAPHS = 100
+    :type max_batch_graphs: int
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :param journal: journal of the sync in progress to check off the
+        removed keys in
+        optional - defaults to None
+    :type journal: SyncJournal
+    :returns: the keys that got removed
+    :rtype: List[str]
+    """
+    report = report or SyncReport()
+    keys = list(keys)
+    with report.phase("drop"):
+        removed: List[str] = remove_keys(to_store, keys, max_batch_graphs)
+    report.count("requests", math.ceil(len(keys) / max_batch_graphs))
+    report.count("files_removed", len(removed))
+    for key in removed:
+        forget_removed(key, state, snapshots)
+        if journal is not None:
+            journal.done(key)
+    return removed
+
+
+def get_store_lastmods(
+    store: RDFStore, keys: Iterable[str]
+) -> Dict[str, Optional[datetime]]:
+    """gets the lastmod in the store of all given keys
+    using a bulk lookup where the store supports it, else per key
+
+    :param store: the store to question
+    :type store: RDFStore
+    :param keys: the keys to get the lastmod for
+    :type keys: Iterable[str]
+    :returns: the lastmod by key (None for keys without a known lastmod)
+    :rtype: Dict[str, Optional[datetime]]
+    """
+    keys = list(keys)
+    lastmods = lastmod_by_key(store, keys)
+    if lastmods is None:
+        lastmods = {key: lastmod_of_key(store, key) for key in keys}
+    return lastmods
+
+
+def plan_sync(
+    from_path: Path,
+    to_store: RDFStore,
+    state: SyncStateIndex = None,
+    reconcile: bool = False,
+    change_detection: str = DEFAULT_CHANGE_DETECTION,
+    scanner: TreeScanner = None,
+    report: SyncReport = None,
+) -> SyncPlan:
+    """decides what a sync of the rdf-dump files in the from_path to the
+    RDFStore would do, without writing to the store
+
+    :param from_path: folder path to sync from
+    :type from_path: Path
+    :param to_store: rdf store target for the sync operation
+    :type to_store: RDFStore
+    :param state: local index of the sync-state to decide on changes
+        optional - defaults to None meaning the store is questioned per file
+    :type state: SyncStateIndex
+    :param reconcile: forces rebuilding the state index from the store
+        optional - defaults to False, ignored if no state is provided
+    :type reconcile: bool
+    :param change_detection: how changed files are detected, one of
+        CHANGE_DETECTION_MODES. In 'hash' mode files with a changed mtime
+        but unchanged size and content hash are not considered updated.
+        optional - defaults to DEFAULT_CHANGE_DETECTION = "mtime"
+    :type change_detection: str
+    :param scanner: the scanner selecting the files to sync
+        optional - defaults to None meaning all rdf dumps are synced
+    :type scanner: TreeScanner
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :returns: the plan to execute
+    :rtype: SyncPlan
     """
-    known_relnames_in_store = to_store.keys
-    current_lastmod_by_fname = get_lastmod_by_fname(from_path)
-    log.debug(f"current_lastmod_by_fname: {current_lastmod_by_fname}")
+    assert (
+        change_detection in CHANGE_DETECTION_MODES
+    ), "unknown change_detection mode " + str(change_detection)
+    use_hash: bool = change_detection == "hash"
+    assert (
+        not use_hash or state is not None
+    ), "change_detection 'hash' requires a state index to keep the hashes"
+    report = report or SyncReport()
+    scanner = scanner or make_scanner()
+    store_lastmods: Dict[str, datetime] = None
+    with report.phase("keys"):
+        if state is not None:
+            if reconcile or not state.reconciled:
+                state.reconcile(
+                    get_store_lastmods(
+                        to_store, owned_keys(to_store.keys, scanner)
+                    )
+                )
+            entries = state.entries
+            known_relnames_in_store = owned_keys(entries, scanner)
+        else:
+            known_relnames_in_store = owned_keys(to_store.keys, scanner)
+            # one bulk lookup in stead of questions per file, if it can
+            store_lastmods = lastmod_by_key(to_store, known_relnames_in_store)
+    with report.phase("scan"):
+        current_stat_by_fname = get_stat_by_fname(from_path, scanner)
+    report.count("files_scanned", len(current_stat_by_fname))
+    log.debug(f"current_stat_by_fname: {current_stat_by_fname}")
+    detect_t0: float = time.perf_counter()
+    removed_relnames: List[str] = list()
     for relname in known_relnames_in_store:
         fname = str(from_path / relname)
-        if fname not in current_lastmod_by_fname:
+        if fname not in current_stat_by_fname:
             log.debug(f"old file {fname} no longer exists")
-            sync_removal(to_store, Path(fname), from_path)
-    for fname, lastmod in current_lastmod_by_fname.items():
+            removed_relnames.append(relname)
+    known_relnames_in_store = set(known_relnames_in_store)
+    additions: List[Path] = list()
+    updates: List[Path] = list()
+    skipped: List[str] = list()
+    refreshed: List[SyncStateEntry] = list()
+    hash_by_fname: Dict[str, str] = dict()
+    triples_by_fname: Dict[str, int] = dict()
+    for fname, stat in current_stat_by_fname.items():
         relname = relative_pathname(Path(fname), from_path)
+        lastmod = datetime.fromtimestamp(stat.st_mtime, UTC_tz)
+        triples_by_fname[fname] = estimate_triples(
+            Path(fname), stat.st_size, format_from_filepath(Path(fname))
+        )
+        if use_hash:
+            # only (and always) hashed when the mtime or size changed
+            entry = entries.get(relname)
+            if (
+                entry is None
+                or entry.mtime != stat.st_mtime
+                or entry.size != stat.st_size
+            ):
+                hash_by_fname[fname] = content_hash(Path(fname))
         if relname not in known_relnames_in_store:
             log.debug(f"new file {fname} with lastmod {lastmod}")
-            sync_addition(to_store, Path(fname), from_path)
+            additions.append(Path(fname))
+        elif state is not None:
+            entry = entries[relname]
+            content_hash_now: str = hash_by_fname.get(fname, entry.hash)
+            if entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                log.debug(f"skip file {fname} - unchanged since last sync")
+                skipped.append(relname)
+            elif use_hash and entry.hash is not None:
+                # the content decides, regardless of the mtime
+                if (
+                    entry.size == stat.st_size
+                    and entry.hash == content_hash_now
+                ):
+                    log.debug(f"skip file {fname} - content unchanged")
+                    skipped.append(relname)
+                    refreshed.append(
+                        SyncStateEntry(
+                            relname,
+                            stat.st_mtime,
+                            stat.st_size,
+                            entry.synced,
+                            content_hash_now,
+                        )
+                    )
+                else:
+                    log.debug(f"updated content in file {fname}")
+                    updates.append(Path(fname))
+            elif entry.mtime is None and entry.synced >= stat.st_mtime:
+                # only entries reconciled from the store lack the file stat
+                log.debug(f"skip file {fname} - older than last sync")
+                skipped.append(relname)
+                refreshed.append(
+                    SyncStateEntry(
+                        relname,
+                        stat.st_mtime,
+                        stat.st_size,
+                        entry.synced,
+                        content_hash_now if use_hash else None,
+                    )
+                )
+            else:
+                log.debug(f"updated file {fname} with lastmod {lastmod}")
+                updates.append(Path(fname))
+        elif store_lastmods is not None:
+            store_lastmod = store_lastmods.get(relname)
+            if store_lastmod is None or store_lastmod < lastmod:
+                log.debug(f"updated file {fname} with lastmod {lastmod}")
+                updates.append(Path(fname))
+            else:
+                log.debug(f"skip file {fname} - unchanged")
+                skipped.append(relname)
         elif not to_store.verify_max_age_of_key(
             relname, reference_time=lastmod
         ):
             log.debug(f"updated file {fname} with lastmod {lastmod}")
-            sync_update(to_store, Path(fname), from_path)
+            updates.append(Path(fname))
         else:
             log.debug(f"skip file {fname} with lastmod {lastmod} - unchanged")
+            skipped.append(relname)
+    report.add_time("detect", time.perf_counter() - detect_t0)
+    return SyncPlan(
+        from_path,
+        additions,
+        updates,
+        removed_relnames,
+        skipped,
+        current_stat_by_fname,
+        hash_by_fname=hash_by_fname,
+        triples_by_fname=triples_by_fname,
+        refreshed=refreshed,
+    )
+
+
+def execute_plan(
+    plan: SyncPlan,
+    to_store: RDFStore,
+    options: SyncOptions = None,
+    state: SyncStateIndex = None,
+    snapshots: SnapshotStore = None,
+    report: SyncReport = None,
+    journal: SyncJournal = None,
+) -> Set[str]:
+    """executes the removals, additions and updates of the plan, keeping the
+    state index, snapshots and journal (if any) up to date
+
+    :param plan: the plan to execute, as made by plan_sync
+    :type plan: SyncPlan
+    :param to_store: rdf store target for the sync operation
+    :type to_store: RDFStore
+    :param options: the settings of the sync, see SyncOptions
+        optional - defaults to None meaning the default SyncOptions
+    :type options: SyncOptions
+    :param state: local index of the sync-state to keep up to date
+        optional - defaults to None
+    :type state: SyncStateIndex
+    :param snapshots: snapshots of the synced graphs, when given updates are
+        applied as the difference with the snapshot
+        optional - defaults to None meaning updates drop and reload
+    :type snapshots: SnapshotStore
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :param journal: journal of the sync in progress to check off the
+        completed operations in
+        optional - defaults to None
+    :type journal: SyncJournal
+    :returns: the keys that failed to sync
+    :rtype: Set[str]
+    """
+    options = (options or SyncOptions()).check()
+    report = report or SyncReport()
+    execute_removals(
+        to_store,
+        plan.removals,
+        state,
+        snapshots,
+        options.max_batch_graphs,
+        report,
+        journal,
+    )
+    report.count("files_skipped", len(plan.skipped))
+    if state is not None:
+        for entry in plan.refreshed:
+            state.record(*entry)
+    handler_by_fpath: Dict[Path, Callable] = dict()
+    for fpath in plan.additions:
+        handler_by_fpath[fpath] = sync_addition
+    for fpath in plan.updates:
+        handler_by_fpath[fpath] = sync_update
+    # parsing (possibly in parallel) while feeding the store from here
+    return execute_syncs(
+        plan.root,
+        to_store,
+        handler_by_fpath,
+        options,
+        state=state,
+        stat_by_fname=plan.stat_by_fname,
+        hash_by_fname=plan.hash_by_fname,
+        snapshots=snapshots,
+        report=report,
+        journal=journal,
+    )
+
+
+def plan_resume(
+    from_path: Path,
+    pending: PendingSync,
+    change_detection: str = DEFAULT_CHANGE_DETECTION,
+) -> SyncPlan:
+    """plans the remainder of an interrupted sync, as found in its journal.
+    The files planned to be added or updated may have been written in part,
+    so they are all reloaded as updates (or removed if no longer there).
+
+    :param from_path: folder path to sync from
+    :type from_path: Path
+    :param pending: what remains to be done of the interrupted sync
+    :type pending: PendingSync
+    :param change_detection: one of CHANGE_DETECTION_MODES, in 'hash' mode
+        the content hashes of the files are calculated to be recorded
+        optional - defaults to DEFAULT_CHANGE_DETECTION = "mtime"
+    :type change_detection: str
+    :returns: the plan to execute
+    :rtype: SyncPlan
+    """
+    updates: List[Path] = list()
+    removals: List[str] = list(pending.removals)
+    stat_by_fname: Dict[str, os.stat_result] = dict()
+    hash_by_fname: Dict[str, str] = dict()
+    for relname in pending.syncs:
+        fpath: Path = from_path / relname
+        try:
+            stat_by_fname[str(fpath)] = fpath.stat()
+        except FileNotFoundError:
+            log.debug(f"file {fpath} to resume no longer exists")
+            removals.append(relname)
+            continue
+        updates.append(fpath)
+        if change_detection == "hash":
+            hash_by_fname[str(fpath)] = content_hash(fpath)
+    return SyncPlan(
+        from_path,
+        [],
+        updates,
+        removals,
+        [],
+        stat_by_fname,
+        hash_by_fname=hash_by_fname,
+    )
+
+
+def perform_sync(
+    from_path: Path,
+    to_store: RDFStore,
+    options: SyncOptions = None,
+    state: SyncStateIndex = None,
+    reconcile: bool = False,
+    scanner: TreeScanner = None,
+    snapshots: SnapshotStore = None,
+    report: SyncReport = None,
+    journal: SyncJournal = None,
+) -> None:
+    """synchronizes found rdf-dump files in the from_path to the RDFStore specified
+
+    :param from_path: folder path to sync from
+    :type from_path: Path
+    :param to_store: rdf store target for the sync operation
+    :type to_store: RDFStore
+    :param options: the settings of the sync, see SyncOptions
+        optional - defaults to None meaning the default SyncOptions
+    :type options: SyncOptions
+    :param state: local index of the sync-state to decide on changes
+        optional - defaults to None meaning the store is questioned per file
+    :type state: SyncStateIndex
+    :param reconcile: forces rebuilding the state index from the store
+        optional - defaults to False, ignored if no state is provided
+    :type reconcile: bool
+    :param scanner: the scanner selecting the files to sync
+        optional - defaults to None meaning all rdf dumps are synced
+    :type scanner: TreeScanner
+    :param snapshots: snapshots of the synced graphs, when given updates are
+        applied as the difference with the snapshot
+        optional - defaults to None meaning updates drop and reload
+    :type snapshots: SnapshotStore
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :param journal: journal of the planned and completed operations. If it
+        holds an interrupted sync, that one is resumed (and the files it
+        was writing repaired) in stead of planning a new sync. Files that
+        failed to sync are kept pending in it, to be resumed likewise.
+        optional - defaults to None meaning no journal is kept
+    :type journal: SyncJournal
+    :raises TooManyRemovals: when more keys would be removed than allowed
+    :rtype: None
+    """
+    options = (options or SyncOptions()).check()
+    pending: PendingSync = journal.pending() if journal is not None else None
+    if pending is not None and pending.root != str(from_path.absolute()):
+        log.warning(f"ignoring the journal of a sync of {pending.root}")
+        pending = None
+    if pending is not None:
+        log.info(
+            f"resuming the interrupted sync of {from_path}: "
+            f"{len(pending.removals)} removals, {len(pending.syncs)} files"
+        )
+        plan: SyncPlan = plan_resume(
+            from_path, pending, options.change_detection
+        )
+        journal.resume()
+    else:
+        plan = plan_sync(
+            from_path,
+            to_store,
+            state,
+            reconcile,
+            options.change_detection,
+            scanner,
+            report=report,
+        )
+        check_removals(len(plan.removals), plan.known, options.max_removal_pct)
+        if journal is not None and not plan.is_empty:
+            journal.start(
+                from_path,
+                plan.removals,
+                (
+                    relative_pathname(fpath, from_path)
+                    for fpath in plan.additions + plan.updates
+                ),
+            )
+    try:
+        failed: Set[str] = execute_plan(
+            plan,
+            to_store,
+            options,
+            state=state,
+            snapshots=snapshots,
+            report=report,
+            journal=journal,
+        )
+    except BaseException:
+        if journal is not None:
+            # keep it, to resume from
+            journal.close()
+        raise
+    if journal is None:
+        return
+    # else
+    if failed:
+        # these may be written in part (and got a fresh lastmod), keep them
+        # pending to be resumed (and so reloaded) by the next sync
+        journal.close()
+    else:
+        journal.finish()
+
+
+def sync_paths(
+    from_path: Path,
+    to_store: RDFStore,
+    fpaths: Iterable[Path],
+    known_keys: Set[str],
+    options: SyncOptions = None,
+    state: SyncStateIndex = None,
+    scanner: TreeScanner = None,
+    snapshots: SnapshotStore = None,
+    report: SyncReport = None,
+) -> None:
+    """synchronizes only the given paths (known to have changed) in stead
+    of comparing the complete from_path folder with the store.
+    Existing files are added or updated, paths that no longer exist are
+    removed (for folders this applies to all files nested in it)
+
+    :param from_path: folder path to sync from
+    :type from_path: Path
+    :param to_store: rdf store target for the sync operation
+    :type to_store: RDFStore
+    :param fpaths: paths of the changed files or folders inside from_path
+    :type fpaths: Iterable[Path]
+    :param known_keys: the keys currently in the store,
+        this set is updated to reflect the changes made
+    :type known_keys: Set[str]
+    :param options: the settings of the sync, see SyncOptions
+        optional - defaults to None meaning the default SyncOptions
+    :type options: SyncOptions
+    :param state: local index of the sync-state to keep up to date
+        optional - defaults to None
+    :type state: SyncStateIndex
+    :param scanner: the scanner deciding on the files to sync
+        optional - defaults to None meaning all rdf dumps are synced
+    :type scanner: TreeScanner
+    :param snapshots: snapshots of the synced graphs, when given updates are
+        applied as the difference with the snapshot
+        optional - defaults to None meaning updates drop and reload
+    :type snapshots: SnapshotStore
+    :param report: collects the timings and counters of the sync
+        optional - defaults to None meaning nothing is reported
+    :type report: SyncReport
+    :raises TooManyRemovals: when more keys would be removed than allowed
+    :rtype: None
+    """
+    options = (options or SyncOptions()).check()
+    scanner = scanner or make_scanner()
+    use_hash: bool = options.change_detection == "hash" and state is not None
+    handler_by_fpath: Dict[Path, Callable] = dict()
+    hash_by_fname: Dict[str, str] = dict()
+    gone: Set[str] = set()
+    for fpath in fpaths:
+        relname = relative_pathname(fpath, from_path)
+        relposix = Path(relname).as_posix()
+        if fpath.is_dir():
+            # a folder appeared, all its files need to be synced
+            if not scanner.accepts_path(relposix, is_dir=True):
+                continue
+            fnames = list(scanner.scan(from_path, top=fpath))
+        elif fpath.is_file() and scanner.accepts_path(relposix):
+            fnames = [str(fpath)]
+        else:
+            # gone, along with anything nested in it
+            nested = relname + os.sep
+            gone.update(
+                k
+                for k in owned_keys(known_keys, scanner)
+                if k == relname or k.startswith(nested)
+            )
+            continue
+        for fname in fnames:
+            key = relative_pathname(Path(fname), from_path)
+            if key not in known_keys:
+                handler_by_fpath[Path(fname)] = sync_addition
+            else:
+                handler_by_fpath[Path(fname)] = sync_update
+            if use_hash:
+                hash_by_fname[fname] = content_hash(Path(fname))
+                entry = state.get(key)
+                stat = Path(fname).stat()
+                if (
+                    entry is not None
+                    and entry.size == stat.st_size
+                    and entry.hash == hash_by_fname[fname]
+                ):
+                    log.debug(f"skip file {fname} - content unchanged")
+                    del handler_by_fpath[Path(fname)]
+                    state.record(
+                        key,
+                        stat.st_mtime,
+                        stat.st_size,
+                        entry.synced,
+                        entry.hash,
+                    )
+    if gone:
+        log.debug(f"old files {sorted(gone)} no longer exist")
+        check_removals(len(gone), len(known_keys), options.max_removal_pct)
+        known_keys.difference_update(
+            execute_removals(
+                to_store,
+                gone,
+                state,
+                snapshots,
+                options.max_batch_graphs,
+                report,
+            )
+        )
+    failed: Set[str] = execute_syncs(
+        from_path,
+        to_store,
+        handler_by_fpath,
+        options,
+        state=state,
+        hash_by_fname=hash_by_fname,
+        snapshots=snapshots,
+        report=report,
+    )
+    known_keys.update(
+        relname
+        for relname in (
+            relative_pathname(fpath, from_path) for fpath in handler_by_fpath
+        )
+        if relname not in failed
+    )
+
+
+def get_listed_keys(
+    to_store: RDFStore,
+    relnames: Iterable[str],
+    state: SyncStateIndex = None,
+    reconcile: bool = False,
+    scanner: TreeScanner = None,
+) -> Set[str]:
+    """gets the keys in the store for a list of files, in as few requests
+    as possible: the state index (if used) or a bulk lookup of only those
+    keys is preferred over listing all the keys in the store
+
+    :param to_store: the store to question
+    :type to_store: RDFStore
+    :param relnames: the paths of the files relative to the synced folder
+    :type relnames: Iterable[str]
+    :param state: local index of the sync-state
+        optional - defaults to None meaning the store is questioned
+    :type state: SyncStateIndex
+    :param reconcile: forces rebuilding the state index from the store
+        optional - defaults to False, ignored if no state is provided
+    :type reconcile: bool
+    :param scanner: the scanner (and shard) deciding on the files to sync
+        optional - defaults to None meaning all rdf dumps are synced
+    :type scanner: TreeScanner
+    :returns: a set holding (at least) the listed keys in the store
+    :rtype: Set[str]
+    """
+    scanner = scanner or make_scanner()
+    if state is not None:
+        if reconcile or not state.reconciled:
+            state.reconcile(
+                get_store_lastmods(
+                    to_store, owned_keys(to_store.keys, scanner)
+                )
+            )
+        return set(state.entries)
+    # else
+    lastmods = lastmod_by_key(to_store, relnames)
+    if lastmods is None:
+        return set(to_store.keys)
+    # else
+    return {key for key, lastmod in lastmods.items() if lastmod is not None}
 
 
 class SyncFsTriples:
@@ -175,6 +1443,20 @@ class SyncFsTriples:
         named_graph_base: str = DEFAULT_URN_BASE,
         read_uri: str = None,
         write_uri: str = None,
+        options: SyncOptions = None,
+        state: Union[bool, str] = False,
+        include: Iterable[str] = None,
+        exclude: Iterable[str] = DEFAULT_EXCLUDES,
+        update_strategy: str = DEFAULT_UPDATE_STRATEGY,
+        snapshot_path: str = None,
+        gsp_uri: str = None,
+        report_path: str = None,
+        metrics_path: str = None,
+        http_pool_size: int = DEFAULT_POOL_SIZE,
+        http_timeout: float = DEFAULT_HTTP_TIMEOUT,
+        http_retries: int = DEFAULT_RETRIES,
+        shard: Union[str, Shard] = None,
+        journal: Union[bool, str] = False,
     ):
         """Creates the process-wrapper instance
 
@@ -189,6 +1471,70 @@ class SyncFsTriples:
         :param write_uri: uri for write operations to the triple store
             optional - defaults to None - leading to a store that can only be read from
         :type write_uri: str
+        :param options: the settings of each sync, see SyncOptions. The
+            'hash' change_detection keeps content hashes in the sync-state
+            index, so implies using one. The max_removal_pct does not limit
+            explicitly listed paths.
+            optional - defaults to None meaning the default SyncOptions
+        :type options: SyncOptions
+        :param state: use a local sync-state index to avoid questioning the
+            store about unchanged files. True uses the default location
+            inside the root, a str points to the index file to use.
+            optional - defaults to False meaning no index is used
+        :type state: Union[bool, str]
+        :param include: glob-style patterns the files to sync should match,
+            patterns with a '/' match the relative path, others the name
+            optional - defaults to None meaning all rdf dump files are synced
+        :type include: Iterable[str]
+        :param exclude: glob-style patterns of files and folders to skip,
+            matching folders are not descended into
+            optional - defaults to DEFAULT_EXCLUDES
+        :type exclude: Iterable[str]
+        :param update_strategy: one of UPDATE_STRATEGIES. 'reload' drops and
+            reloads updated graphs, 'diff' only applies the changed triples
+            as calculated against local snapshots of the synced graphs.
+            optional - defaults to DEFAULT_UPDATE_STRATEGY = "reload"
+        :type update_strategy: str
+        :param snapshot_path: folder to keep the snapshots in 'diff' strategy
+            optional - defaults to None meaning a folder inside the root
+        :type snapshot_path: str
+        :param gsp_uri: uri of the graph store protocol endpoint of the
+            triple store, required for the 'passthrough' upload
+            optional - defaults to None
+        :type gsp_uri: str
+        :param report_path: file to write the json report of each sync to,
+            with the time spent per phase, counters and per-file durations
+            optional - defaults to None meaning no report is written
+        :type report_path: str
+        :param metrics_path: file to write the metrics of each sync to in
+            the prometheus text format (for the node_exporter textfile
+            collector)
+            optional - defaults to None meaning no metrics are written
+        :type metrics_path: str
+        :param http_pool_size: max number of kept-alive connections to the
+            triple-store (per endpoint)
+            optional - defaults to DEFAULT_POOL_SIZE = 4
+        :type http_pool_size: int
+        :param http_timeout: timeout in seconds of requests to the store
+            optional - defaults to DEFAULT_HTTP_TIMEOUT = 60
+        :type http_timeout: float
+        :param http_retries: max number of retries of idempotent requests
+            to the store failing on a transient error (with backoff)
+            optional - defaults to DEFAULT_RETRIES = 3
+        :type http_retries: int
+        :param shard: the shard 'i/N' of the tree to sync, so N processes
+            can each sync a (hash-based) part of it to the same store.
+            Each shard only adds, updates and removes the keys it owns,
+            and keeps a state index of its own.
+            optional - defaults to None meaning the whole tree is synced
+        :type shard: Union[str, Shard]
+        :param journal: keep a journal of the planned and completed
+            operations of each sync, so an interrupted sync is resumed
+            (repairing the graphs it was writing) by the next one. True
+            uses the default location inside the root, a str points to
+            the journal file to use.
+            optional - defaults to False meaning no journal is kept
+        :type journal: Union[bool, str]
         """
         self.source_path: Path = Path(root)
         assert self.source_path.exists(), (
@@ -197,16 +1543,306 @@ class SyncFsTriples:
         assert self.source_path.is_dir(), (
             "source-path " + str(root) + " should be a folder."
         )
+        self.options: SyncOptions = (options or SyncOptions()).check()
+        assert (
+            update_strategy in UPDATE_STRATEGIES
+        ), "unknown update_strategy " + str(update_strategy)
+        assert self.options.upload != "passthrough" or (
+            read_uri and gsp_uri
+        ), "the passthrough upload requires a store with a gsp_uri"
+        self.report_path: Path = Path(report_path) if report_path else None
+        self.metrics_path: Path = Path(metrics_path) if metrics_path else None
+        self.snapshot_path: Path = None
+        if update_strategy == "diff":
+            self.snapshot_path = (
+                Path(snapshot_path)
+                if snapshot_path
+                else SnapshotStore.default_path(self.source_path)
+            )
+            # the snapshots are no dumps to sync, not even to look at
+            exclude = list(exclude or []) + [DEFAULT_SNAPSHOT_DIRNAME]
+        if isinstance(shard, str):
+            shard = Shard.parse(shard)
+        self.shard: Shard = shard
+        self.scanner: TreeScanner = make_scanner(include, exclude, shard)
+        if self.options.change_detection == "hash" and not state:
+            state = True
+        self.state_path: Path = None
+        if state is True:
+            self.state_path = SyncStateIndex.default_path(
+                self.source_path, shard
+            )
+        elif state:
+            self.state_path = Path(state)
+        self.journal_path: Path = None
+        if journal is True:
+            self.journal_path = SyncJournal.default_path(
+                self.source_path, shard
+            )
+        elif journal:
+            self.journal_path = Path(journal)
         nmapper: GraphNameMapper = GraphNameMapper(base=named_graph_base)
         self.rdfstore: RDFStore = None
         if not read_uri:
             self.rdfstore = MemoryRDFStore(mapper=nmapper)
         else:
-            self.rdfstore = URIRDFStore(read_uri, write_uri, mapper=nmapper)
+            self.rdfstore = SyncURIRDFStore(
+                read_uri,
+                write_uri,
+                mapper=nmapper,
+                gsp_uri=gsp_uri,
+                timeout=http_timeout,
+                pool_size=http_pool_size,
+                retries=http_retries,
+            )
+
+    def _open_state(self):
+        """opens the sync-state index if one is used"""
+        if self.state_path is None:
+            return nullcontext()
+        return SyncStateIndex(self.state_path)
+
+    def _open_journal(self) -> Optional[SyncJournal]:
+        """opens the journal if one is kept"""
+        if self.journal_path is None:
+            return None
+        return SyncJournal(self.journal_path)
 
-    def process(self) -> None:
-        """executes the SyncFs command"""
+    def _open_snapshots(self) -> Optional[SnapshotStore]:
+        """opens the snapshots if the 'diff' update strategy is used"""
+        if self.snapshot_path is None:
+            return None
+        return SnapshotStore(self.snapshot_path)
+
+    def _listed_fpaths(self, paths: Iterable[Union[str, Path]]) -> List[Path]:
+        """resolves the listed paths against the root, dropping doubles"""
+        fpaths: Dict[Path, None] = dict()
+        for path in paths:
+            fpath: Path = Path(os.path.normpath(self.source_path / path))
+            assert fpath.absolute().is_relative_to(
+                self.source_path.absolute()
+            ), ("listed path " + str(path) + " is outside the root")
+            fpaths[fpath] = None
+        return list(fpaths)
+
+    def _write_report(self, report: SyncReport) -> SyncReport:
+        """finishes the report, writing it out where configured"""
+        report.finish()
+        log.info(
+            f"synced in {report.elapsed:.3f}s: "
+            + ", ".join(f"{k}={v}" for k, v in report.counters.items())
+        )
+        if self.report_path is not None:
+            report.write_json(self.report_path)
+        if self.metrics_path is not None:
+            report.write_prometheus(self.metrics_path)
+        return report
+
+    def _sync(
+        self, state: SyncStateIndex, reconcile: bool = False
+    ) -> SyncReport:
+        report: SyncReport = SyncReport()
         perform_sync(
             from_path=self.source_path,
             to_store=self.rdfstore,
+            options=self.options,
+            state=state,
+            reconcile=reconcile,
+            scanner=self.scanner,
+            snapshots=self._open_snapshots(),
+            report=report,
+            journal=self._open_journal(),
+        )
+        return self._write_report(report)
+
+    def _sync_paths(
+        self,
+        state: SyncStateIndex,
+        fpaths: Iterable[Path],
+        known_keys: Set[str],
+        snapshots: SnapshotStore = None,
+        max_removal_pct: float = None,
+    ) -> SyncReport:
+        report: SyncReport = SyncReport()
+        sync_paths(
+            self.source_path,
+            self.rdfstore,
+            fpaths,
+            known_keys,
+            options=self.options._replace(max_removal_pct=max_removal_pct),
+            state=state,
+            scanner=self.scanner,
+            snapshots=snapshots,
+            report=report,
+        )
+        return self._write_report(report)
+
+    def plan(self, reconcile: bool = False) -> SyncPlan:
+        """decides what the SyncFs command would do, without writing to the
+        store. The returned plan can be handed to process to execute it.
+
+        :param reconcile: forces rebuilding the sync-state index from the store
+            optional - defaults to False, ignored if no state index is used
+        :type reconcile: bool
+        :returns: the plan, listing the additions, updates, removals and
+            skipped files with their size and estimated number of triples
+        :rtype: SyncPlan
+        """
+        with self._open_state() as state:
+            return plan_sync(
+                self.source_path,
+                self.rdfstore,
+                state=state,
+                reconcile=reconcile,
+                change_detection=self.options.change_detection,
+                scanner=self.scanner,
+            )
+
+    def process(
+        self,
+        plan: SyncPlan = None,
+        reconcile: bool = False,
+        paths: Iterable[Union[str, Path]] = None,
+    ) -> SyncReport:
+        """executes the SyncFs command
+
+        :param plan: a plan made earlier by the plan method, to execute as is
+            in stead of deciding anew (files changed since are picked up by
+            the next sync)
+            optional - defaults to None meaning a fresh plan is made
+        :type plan: SyncPlan
+        :param reconcile: forces rebuilding the sync-state index from the store
+            optional - defaults to False, ignored if no state index is used
+            or a plan is given
+        :type reconcile: bool
+        :param paths: paths (relative to the root) of the files to sync, in
+            stead of scanning the whole root. Listed files are added or
+            updated, listed files that no longer exist are removed.
+            optional - defaults to None meaning the whole root is synced
+        :type paths: Iterable[Union[str, Path]]
+        :returns: the report of the sync
+        :rtype: SyncReport
+        """
+        assert (
+            plan is None or paths is None
+        ), "either execute a plan or sync listed paths, not both"
+        with self._open_state() as state:
+            if paths is not None:
+                fpaths: List[Path] = self._listed_fpaths(paths)
+                known_keys: Set[str] = get_listed_keys(
+                    self.rdfstore,
+                    [relative_pathname(p, self.source_path) for p in fpaths],
+                    state,
+                    reconcile=reconcile,
+                    scanner=self.scanner,
+                )
+                return self._sync_paths(
+                    state, fpaths, known_keys, self._open_snapshots()
+                )
+            # else
+            if plan is None:
+                return self._sync(state, reconcile)
+            # else
+            check_removals(
+                len(plan.removals), plan.known, self.options.max_removal_pct
+            )
+            report: SyncReport = SyncReport()
+            execute_plan(
+                plan,
+                self.rdfstore,
+                self.options,
+                state=state,
+                snapshots=self._open_snapshots(),
+                report=report,
+            )
+            return self._write_report(report)
+
+    def watch(
+        self,
+        stop_event: Event = None,
+        debounce: float = DEFAULT_DEBOUNCE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        polling: bool = False,
+        reconcile: bool = False,
+    ) -> None:
+        """executes an initial full sync, then keeps syncing the changed files
+        as reported by filesystem events, until the stop_event is set
+
+        :param stop_event: event to signal the watching should stop
+            optional - defaults to None meaning watching till interrupted
+        :type stop_event: Event
+        :param debounce: seconds of quiet before changes get synced
+            optional - defaults to DEFAULT_DEBOUNCE = 2.0
+        :type debounce: float
+        :param max_delay: max seconds a change can wait before being synced
+            optional - defaults to DEFAULT_MAX_DELAY = 30.0
+        :type max_delay: float
+        :param poll_interval: seconds between scans when polling
+            optional - defaults to DEFAULT_POLL_INTERVAL = 10.0
+        :type poll_interval: float
+        :param polling: forces polling in stead of using inotify events
+            optional - defaults to False
+        :type polling: bool
+        :param reconcile: forces rebuilding the sync-state index from the store
+            optional - defaults to False, ignored if no state index is used
+        :type reconcile: bool
+        :rtype: None
+        """
+        stop_event = stop_event or Event()
+        # start watching before the initial sync, so no change gets lost
+        watcher = make_watcher(
+            self.source_path,
+            partial(get_stat_by_fname, scanner=self.scanner),
+            poll_interval,
+            polling,
+            accept_dir=partial(self.scanner.accepts_path, is_dir=True),
         )
+        log.info(f"watching {self.source_path} using {type(watcher).__name__}")
+        try:
+            with self._open_state() as state:
+                self._sync(state, reconcile)
+
+                def current_keys() -> Set[str]:
+                    if state is not None:
+                        return set(state.entries)
+                    return set(owned_keys(self.rdfstore.keys, self.scanner))
+
+                known_keys: Set[str] = current_keys()
+                snapshots: SnapshotStore = self._open_snapshots()
+
+                resync_needed: bool = False
+
+                def on_changes(fpaths: Set[Path]) -> None:
+                    nonlocal known_keys, resync_needed
+                    try:
+                        if resync_needed or self.source_path in fpaths:
+                            log.info("doing a full sync to catch up")
+                            self._sync(state)
+                            known_keys = current_keys()
+                            resync_needed = False
+                            return
+                        # else
+                        self._sync_paths(
+                            state,
+                            fpaths,
+                            known_keys,
+                            snapshots,
+                            self.options.max_removal_pct,
+                        )
+                    except Exception:
+                        log.exception(
+                            "failed to sync changes, "
+                            "a full sync will follow with the next changes"
+                        )
+                        resync_needed = True
+
+                watch_changes(
+                    watcher,
+                    on_changes,
+                    stop_event,
+                    debounce=debounce,
+                    max_delay=max_delay,
+                )
+        finally:
+            watcher.close()
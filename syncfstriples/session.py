@@ -0,0 +1,233 @@
+import random
+import time
+from http.client import (
+    HTTPConnection,
+    HTTPException,
+    HTTPSConnection,
+    RemoteDisconnected,
+)
+from io import BytesIO
+from logging import getLogger
+from threading import BoundedSemaphore, Lock
+from typing import IO, Dict, List, Optional, Tuple, Union
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+log = getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_HTTP_TIMEOUT = 60
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+# statuses telling the server is (temporarily) unable to handle the request
+RETRY_STATUSES = (429, 502, 503, 504)
+
+PoolKey = Tuple[str, str]  # scheme, netloc
+Body = Union[bytes, IO[bytes], None]
+
+
+class HttpSession:
+    """Pool of keep-alive http(s) connections, shared by concurrent threads.
+    Requests failing on connection errors or with one of RETRY_STATUSES are
+    retried with bounded exponential backoff, if they are idempotent.
+    Failing requests raise a urllib HTTPError (for error statuses) or the
+    connection error, as urlopen would.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+    ):
+        """Creates the session
+
+        :param pool_size: max number of connections per host (also bounding
+            the number of concurrent requests)
+            optional - defaults to DEFAULT_POOL_SIZE = 4
+        :type pool_size: int
+        :param timeout: timeout in seconds for connecting and reading
+            optional - defaults to DEFAULT_HTTP_TIMEOUT = 60
+        :type timeout: float
+        :param retries: max number of retries of a failed idempotent request
+            optional - defaults to DEFAULT_RETRIES = 3
+        :type retries: int
+        :param backoff: seconds to wait before the first retry, doubling
+            with each next one (with random jitter)
+            optional - defaults to DEFAULT_BACKOFF = 0.5
+        :type backoff: float
+        :param max_backoff: max seconds to wait before a retry
+            optional - defaults to DEFAULT_MAX_BACKOFF = 30.0
+        :type max_backoff: float
+        """
+        assert pool_size >= 1, "the pool_size should be at least 1"
+        assert retries >= 0, "the number of retries can't be negative"
+        self._pool_size: int = pool_size
+        self._timeout: float = timeout
+        self._retries: int = retries
+        self._backoff: float = backoff
+        self._max_backoff: float = max_backoff
+        self._idle: Dict[PoolKey, List[HTTPConnection]] = dict()
+        self._slots: Dict[PoolKey, BoundedSemaphore] = dict()
+        self._lock: Lock = Lock()
+
+    def _slots_for(self, key: PoolKey) -> BoundedSemaphore:
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = BoundedSemaphore(self._pool_size)
+            return self._slots[key]
+
+    def _connection(self, key: PoolKey) -> Tuple[HTTPConnection, bool]:
+        """gives an idle connection to reuse, or a new one"""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        # else
+        scheme, netloc = key
+        if scheme == "https":
+            return HTTPSConnection(netloc, timeout=self._timeout), False
+        return HTTPConnection(netloc, timeout=self._timeout), False
+
+    def _keep(self, key: PoolKey, conn: HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(key, list()).append(conn)
+
+    def _send(
+        self, method: str, url: str, body: Body, headers: Dict[str, str]
+    ) -> Tuple[int, str, object, bytes]:
+        """sends the request on a pooled connection, returning the status,
+        reason, headers and content of the response
+        """
+        parts = urlsplit(url)
+        key: PoolKey = (parts.scheme, parts.netloc)
+        target: str = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        with self._slots_for(key):
+            conn, reused = self._connection(key)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                resp = conn.getresponse()
+                payload: bytes = resp.read()
+            except RemoteDisconnected:
+                conn.close()
+                if not reused:
+                    raise
+                # else the server closed the idle connection, send again
+                conn, _ = self._connection(key)
+                try:
+                    _rewind(body)
+                    conn.request(method, target, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    payload = resp.read()
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._keep(key, conn)
+        return resp.status, resp.reason, resp.headers, payload
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.strip().isdigit():
+            return min(self._max_backoff, float(retry_after))
+        # else
+        delay: float = min(self._max_backoff, self._backoff * 2**attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Body = None,
+        headers: Dict[str, str] = None,
+        idempotent: bool = True,
+    ) -> bytes:
+        """sends the request, retrying it if idempotent, and gives the
+        content of the (successful) response
+
+        :param method: the http method
+        :type method: str
+        :param url: the url to send the request to
+        :type url: str
+        :param body: the content to send, a file is streamed (and rewound
+            for retries, so retries need it to be seekable)
+            optional - defaults to None
+        :type body: Union[bytes, IO[bytes]]
+        :param headers: the request headers
+            optional - defaults to None
+        :type headers: Dict[str, str]
+        :param idempotent: indicates the request can safely be sent again
+            optional - defaults to True
+        :type idempotent: bool
+        :raises HTTPError: when the response has an error status
+        :returns: the content of the response
+        :rtype: bytes
+        """
+        headers = headers or dict()
+        retries: int = self._retries if idempotent else 0
+        if retries and not _rewindable(body):
+            retries = 0
+        attempt: int = 0
+        while True:
+            retry_after: Optional[str] = None
+            try:
+                if attempt:
+                    _rewind(body)
+                status, reason, resp_headers, payload = self._send(
+                    method, url, body, headers
+                )
+                if status < 400:
+                    return payload
+                # else
+                error: Exception = HTTPError(
+                    url, status, reason, resp_headers, BytesIO(payload)
+                )
+                if status not in RETRY_STATUSES:
+                    raise error
+                retry_after = resp_headers.get("Retry-After")
+            except (OSError, HTTPException) as e:  # incl. timeouts
+                if isinstance(e, HTTPError):
+                    raise
+                error = e
+            if attempt >= retries:
+                raise error
+            # else
+            delay: float = self._delay(attempt, retry_after)
+            attempt += 1
+            log.warning(
+                f"{method} {url} failed ({error}), "
+                f"retry {attempt}/{retries} in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+    def close(self) -> None:
+        """closes the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def _rewindable(body: Body) -> bool:
+    if body is None or isinstance(body, (bytes, bytearray)):
+        return True
+    # else
+    try:
+        return body.seekable()
+    except AttributeError:
+        return False
+
+
+def _rewind(body: Body) -> None:
+    if body is not None and not isinstance(body, (bytes, bytearray)):
+        body.seek(0)
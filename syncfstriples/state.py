@@ -0,0 +1,221 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+from hashlib import blake2b
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+from syncfstriples.scan import Shard
+
+log = getLogger(__name__)
+
+DEFAULT_STATE_FNAME = ".syncfs-state.sqlite"
+HASH_BLOCK_SIZE = 1 << 20
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    mtime REAL,
+    size INTEGER,
+    synced REAL NOT NULL,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SyncStateEntry(NamedTuple):
+    """The recorded state of one synced file (by key)"""
+
+    key: str
+    mtime: Optional[float]  # None if unknown (e.g. after reconcile)
+    size: Optional[int]  # None if unknown (e.g. after reconcile)
+    synced: float  # timestamp of the last sync of the key to the store
+    hash: Optional[str] = None  # content hash, only kept in 'hash' mode
+
+
+def content_hash(fpath: Path) -> str:
+    """calculates a fast hash of the content of the file at fpath
+
+    :param fpath: path of the file to hash
+    :type fpath: Path
+    :returns: hex digest of the file content
+    :rtype: str
+    """
+    hasher = blake2b(digest_size=16)
+    with open(fpath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class SyncStateIndex:
+    """Local (sqlite) index of what was synced to the store.
+    Allows to decide about unchanged files without questioning the store.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """Opens (or creates) the index at the given path
+
+        :param path: the path to the sqlite file holding the index
+        :type path: Union[str, Path]
+        """
+        self.path: Path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        # WAL + NORMAL sync keeps the commit per recorded key affordable
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(STATE_SCHEMA)
+        self._upgrade_schema()
+        self._conn.commit()
+
+    def _upgrade_schema(self) -> None:
+        """adds the columns missing in indexes made by earlier versions"""
+        table_info = self._conn.execute("PRAGMA table_info(sync_state)")
+        columns = {row[1] for row in table_info}
+        if "hash" not in columns:
+            self._conn.execute("ALTER TABLE sync_state ADD COLUMN hash TEXT")
+
+    @staticmethod
+    def default_path(root: Path, shard: Shard = None) -> Path:
+        """gives the default location of the index for a given root
+        (and shard, as each shard keeps an index of its own)
+        """
+        if shard is None:
+            return Path(root) / DEFAULT_STATE_FNAME
+        # else
+        stem, suffix = DEFAULT_STATE_FNAME.rsplit(".", 1)
+        fname = f"{stem}.shard-{shard.index}-of-{shard.count}.{suffix}"
+        return Path(root) / fname
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @property
+    def reconciled(self) -> bool:
+        """indicates if the index was ever (re)built from the store"""
+        row = self._conn.execute(
+            "SELECT value FROM sync_meta WHERE name = 'reconciled'"
+        ).fetchone()
+        return row is not None
+
+    @property
+    def entries(self) -> Dict[str, SyncStateEntry]:
+        """all recorded entries by their key"""
+        return {
+            row[0]: SyncStateEntry(*row)
+            for row in self._conn.execute(
+                "SELECT key, mtime, size, synced, hash FROM sync_state"
+            )
+        }
+
+    def covers(
+        self, root: Path, stat_by_fname: Dict[str, os.stat_result]
+    ) -> bool:
+        """checks if the scanned files are exactly the ones recorded, with
+        the same mtime and size, i.e. a sync would find nothing to do
+
+        :param root: the folder that was scanned
+        :type root: Path
+        :param stat_by_fname: the scanned fnames + their stat_result
+        :type stat_by_fname: Dict[str, os.stat_result]
+        :rtype: bool
+        """
+        if not self.reconciled:
+            return False
+        # else
+        entries: Dict[str, SyncStateEntry] = self.entries
+        if len(entries) != len(stat_by_fname):
+            return False
+        # else
+        root = Path(root).absolute()
+        for fname, stat in stat_by_fname.items():
+            key: str = str(Path(fname).absolute().relative_to(root))
+            entry: SyncStateEntry = entries.get(key)
+            if entry is None or (entry.mtime, entry.size) != (
+                stat.st_mtime,
+                stat.st_size,
+            ):
+                return False
+        return True
+
+    def get(self, key: str) -> Optional[SyncStateEntry]:
+        row = self._conn.execute(
+            "SELECT key, mtime, size, synced, hash "
+            "FROM sync_state WHERE key = ?",
+            (key,),
+        ).fetchone()
+        return SyncStateEntry(*row) if row is not None else None
+
+    def record(
+        self,
+        key: str,
+        mtime: Optional[float],
+        size: Optional[int],
+        synced: Optional[float] = None,
+        hash: Optional[str] = None,
+    ) -> None:
+        """records the state of a key after it got synced
+
+        :param key: the key that was synced
+        :type key: str
+        :param mtime: the mtime of the file that was synced
+        :type mtime: float
+        :param size: the size of the file that was synced
+        :type size: int
+        :param synced: timestamp of the sync
+            optional - defaults to None meaning 'now'
+        :type synced: float
+        :param hash: the content hash of the file that was synced
+            optional - defaults to None meaning not known
+        :type hash: str
+        """
+        if synced is None:
+            synced = datetime.now(timezone.utc).timestamp()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_state "
+            "(key, mtime, size, synced, hash) VALUES (?, ?, ?, ?, ?)",
+            (key, mtime, size, synced, hash),
+        )
+        self._conn.commit()
+
+    def forget(self, key: str) -> None:
+        """removes the key from the index"""
+        self._conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def reconcile(self, lastmod_by_key: Dict[str, Optional[datetime]]) -> None:
+        """rebuilds the index from the keys and lastmods found in the store.
+        Since the file mtime and size are unknown at this point, the next
+        sync will compare the files against the store lastmod instead.
+
+        :param lastmod_by_key: the lastmod by key as known in the store
+        :type lastmod_by_key: Dict[str, Optional[datetime]]
+        """
+        log.info(f"reconciling sync-state index {self.path} with store")
+        rows = [
+            (key, None, None, lastmod.timestamp() if lastmod else 0.0)
+            for key, lastmod in lastmod_by_key.items()
+        ]
+        with self._conn:
+            self._conn.execute("DELETE FROM sync_state")
+            self._conn.executemany(
+                "INSERT INTO sync_state (key, mtime, size, synced) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_meta (name, value) "
+                "VALUES ('reconciled', ?)",
+                (datetime.now(timezone.utc).isoformat(),),
+            )
+        log.debug(f"reconciled sync-state index with {len(rows)} keys")
@@ -0,0 +1,424 @@
+import json
+import os
+from datetime import datetime, timezone
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from pyrdfstore.store import GraphNameMapper, RDFStore, URIRDFStore
+from rdflib import BNode, Graph
+
+from syncfstriples.compression import compression_of, open_dump
+from syncfstriples.session import (
+    DEFAULT_BACKOFF,
+    DEFAULT_HTTP_TIMEOUT,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+    HttpSession,
+)
+
+log = getLogger(__name__)
+
+# where the admin registry of pyrdfstore is expected to hold the lastmods,
+# only read by the bulk lookup (which checks it against the store itself)
+ADMIN_NAMED_GRAPH = "urn:py-rdf-store:admin"
+SCHEMA_DATEMODIFIED = "https://schema.org/dateModified"
+DEFAULT_LOOKUP_BATCH_SIZE = 1000
+
+
+def parse_xsd_datetime(value: str) -> datetime:
+    """converts an xsd:dateTime lexical value into a tz-aware datetime
+    (values without timezone are assumed to be in UTC)
+    """
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    ts: datetime = datetime.fromisoformat(value)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def named_graph_of_key(store: RDFStore, key: str) -> str:
+    """gives the named graph the store uses for the key"""
+    return store._nmapper.key_to_ng(key)
+
+
+def is_ground(graph: Graph) -> bool:
+    """checks the graph has no blank nodes, so inserting it twice has the
+    same effect as inserting it once
+    """
+    return not any(
+        isinstance(term, BNode) for triple in graph for term in triple
+    )
+
+
+def triples_block(graph: Graph) -> str:
+    """formats the triples of the graph for use in sparql data blocks"""
+    return "\n".join(
+        " ".join(term.n3() for term in triple) + " ." for triple in graph
+    )
+
+
+def lastmod_of_key(store: RDFStore, key: str) -> Optional[datetime]:
+    """gets the lastmod of the graph for the key in the store
+
+    :param store: the store to question
+    :type store: RDFStore
+    :param key: the key to get the lastmod for
+    :type key: str
+    :returns: the lastmod timestamp or None if the store does not know it
+    :rtype: datetime
+    """
+    return store.lastmod_ts(named_graph_of_key(store, key))
+
+
+def lastmod_by_key(
+    store: RDFStore, keys: Iterable[str]
+) -> Optional[Dict[str, Optional[datetime]]]:
+    """gets the lastmod of the graphs for all keys in as few store requests
+    as the store allows for.
+
+    :param store: the store to question
+    :type store: RDFStore
+    :param keys: the keys to get the lastmod for
+    :type keys: Iterable[str]
+    :returns: the lastmod by key, or None if the store offers no bulk lookup
+        (in which case the caller should fall back to per key questions)
+    :rtype: Dict[str, Optional[datetime]]
+    """
+    bulk_lookup = getattr(store, "lastmod_by_key", None)
+    if bulk_lookup is None:
+        return None
+    # else
+    return bulk_lookup(keys)
+
+
+def replace_graph_for_key(store: RDFStore, graph: Graph, key: str) -> None:
+    """replaces the content of the graph for the key in one store request
+    (so readers never see it empty) if the store allows for, else by
+    dropping and inserting it.
+
+    :param store: the store holding the graph
+    :type store: RDFStore
+    :param graph: the new content of the graph
+    :type graph: Graph
+    :param key: the key of the graph to replace
+    :type key: str
+    :rtype: None
+    """
+    replace = getattr(store, "replace_graph_for_key", None)
+    if replace is not None:
+        replace(graph, key)
+        return
+    # else
+    store.drop_graph_for_key(key)
+    store.insert_for_key(graph, key)
+
+
+def insert_for_keys(store: RDFStore, graph_by_key: Dict[str, Graph]) -> None:
+    """inserts the graphs for their keys in as few store requests as the
+    store allows for.
+
+    :param store: the store to insert into
+    :type store: RDFStore
+    :param graph_by_key: the graphs to insert by their key
+    :type graph_by_key: Dict[str, Graph]
+    :rtype: None
+    """
+    bulk_insert = getattr(store, "insert_for_keys", None)
+    if bulk_insert is not None:
+        bulk_insert(graph_by_key)
+        return
+    # else
+    for key, graph in graph_by_key.items():
+        store.insert_for_key(graph, key)
+
+
+def drop_graphs_for_keys(store: RDFStore, keys: Iterable[str]) -> None:
+    """drops and forgets the graphs for the keys in as few store requests
+    as the store allows for.
+
+    :param store: the store to remove from
+    :type store: RDFStore
+    :param keys: the keys of the graphs to remove
+    :type keys: Iterable[str]
+    :rtype: None
+    """
+    bulk_drop = getattr(store, "drop_graphs_for_keys", None)
+    if bulk_drop is not None:
+        bulk_drop(keys)
+        return
+    # else
+    for key in keys:
+        store.drop_graph_for_key(key)
+        store.forget_graph_for_key(key)
+
+
+class SyncURIRDFStore(URIRDFStore):
+    """URIRDFStore extended with the bulk operations the sync relies on.
+    Their own requests only touch the content of the named graphs and go
+    directly to the endpoints, over a pool of keep-alive connections
+    (retrying idempotent requests that failed on a transient error).
+    The admin registry of the lastmods is left to the (public) insert and
+    forget operations of the URIRDFStore itself.
+    """
+
+    def __init__(
+        self,
+        read_uri: str,
+        write_uri: str = None,
+        *,
+        cleaner=None,
+        mapper: GraphNameMapper = None,
+        admin_graph: str = ADMIN_NAMED_GRAPH,
+        lookup_batch_size: int = DEFAULT_LOOKUP_BATCH_SIZE,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        gsp_uri: str = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ):
+        """Creates the store
+
+        :param read_uri: uri of the sparql (query) endpoint
+        :type read_uri: str
+        :param write_uri: uri of the sparql (update) endpoint
+            optional - defaults to None - leading to a store that can only be read from
+        :type write_uri: str
+        :param cleaner: see URIRDFStore
+        :param mapper: see URIRDFStore
+        :param admin_graph: named graph expected to hold the lastmod
+            registry, for the bulk lookup
+            optional - defaults to ADMIN_NAMED_GRAPH
+        :type admin_graph: str
+        :param lookup_batch_size: max number of keys per bulk lookup query
+            optional - defaults to DEFAULT_LOOKUP_BATCH_SIZE = 1000
+        :type lookup_batch_size: int
+        :param timeout: timeout in seconds for the direct http requests
+            optional - defaults to DEFAULT_HTTP_TIMEOUT = 60
+        :type timeout: float
+        :param gsp_uri: uri of the graph store protocol endpoint, needed to
+            upload files as-is
+            optional - defaults to None
+        :type gsp_uri: str
+        :param pool_size: max number of kept-alive connections per endpoint
+            optional - defaults to DEFAULT_POOL_SIZE = 4
+        :type pool_size: int
+        :param retries: max number of retries of failed idempotent requests
+            optional - defaults to DEFAULT_RETRIES = 3
+        :type retries: int
+        :param backoff: seconds before the first retry, doubling with each
+            next one
+            optional - defaults to DEFAULT_BACKOFF = 0.5
+        :type backoff: float
+        """
+        super().__init__(read_uri, write_uri, cleaner=cleaner, mapper=mapper)
+        self._read_uri: str = read_uri
+        self._write_uri: str = write_uri
+        self._admin_graph: str = admin_graph
+        self._lookup_batch_size: int = lookup_batch_size
+        self._gsp_uri: str = gsp_uri
+        self._session: HttpSession = HttpSession(
+            pool_size, timeout, retries, backoff
+        )
+
+    def close(self) -> None:
+        """closes the kept-alive connections"""
+        self._session.close()
+
+    def _select(self, sparql: str) -> List[Dict[str, str]]:
+        """executes the select query and returns the bound values per row"""
+        payload: bytes = self._session.request(
+            "POST",
+            self._read_uri,
+            body=urlencode({"query": sparql}).encode("utf-8"),
+            headers={
+                "Accept": "application/sparql-results+json",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+        )
+        results = json.loads(payload)
+        return [
+            {var: binding["value"] for var, binding in row.items()}
+            for row in results["results"]["bindings"]
+        ]
+
+    def _update(self, sparql: str, idempotent: bool = True) -> None:
+        """executes the sparql update request, retried on transient errors
+        only if idempotent
+        """
+        assert self._write_uri, "cannot update a store without write_uri"
+        self._session.request(
+            "POST",
+            self._write_uri,
+            body=urlencode({"update": sparql}).encode("utf-8"),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            idempotent=idempotent,
+        )
+
+    def _touch_key(self, key: str) -> None:
+        """records the graph for the key as modified now, through the
+        registry update of the store's own insert (of no triples)
+        """
+        self.insert_for_key(Graph(), key)
+
+    def apply_delta_for_key(
+        self, removed: Graph, added: Graph, key: str
+    ) -> None:
+        """removes and adds the given triples to the graph for the key,
+        all in one update request (next to the one recording its lastmod)
+
+        :param removed: the triples to remove (should not have blank nodes)
+        :type removed: Graph
+        :param added: the triples to add
+        :type added: Graph
+        :param key: the key of the graph to change
+        :type key: str
+        """
+        assert is_ground(removed), "blank nodes cannot be targeted for removal"
+        ng: str = self._nmapper.key_to_ng(key)
+        operations = list()
+        if len(removed):
+            operations.append(
+                f"DELETE DATA {{ GRAPH <{ng}> {{\n"
+                f"{triples_block(removed)}\n}} }}"
+            )
+        if len(added):
+            operations.append(
+                f"INSERT DATA {{ GRAPH <{ng}> {{\n"
+                f"{triples_block(added)}\n}} }}"
+            )
+        if operations:
+            # added blank nodes would be added again by a retry
+            self._update(" ;\n".join(operations), idempotent=is_ground(added))
+        self._touch_key(key)
+
+    def upload_file_for_key(
+        self, fpath: str, content_type: str, key: str, replace: bool = True
+    ) -> None:
+        """streams the (decompressed) content of the file at fpath as-is to
+        the graph for the key through the graph store protocol endpoint.
+        Failing to record its lastmod fails the upload, so it is retried.
+
+        :param fpath: path of the file to upload
+        :type fpath: str
+        :param content_type: the media type of the file content
+        :type content_type: str
+        :param key: the key of the graph to upload to
+        :type key: str
+        :param replace: replace (PUT) the graph in stead of adding (POST) to it
+            optional - defaults to True
+        :type replace: bool
+        """
+        assert self._gsp_uri, "cannot upload files without gsp_uri"
+        ng: str = self._nmapper.key_to_ng(key)
+        url: str = self._gsp_uri + "?" + urlencode({"graph": ng})
+        headers = {"Content-Type": content_type}
+        with open_dump(fpath) as body:
+            if compression_of(fpath) is None:
+                size: int = os.fstat(body.fileno()).st_size
+                headers["Content-Length"] = str(size)
+            # else the decompressed size is unknown: sent in chunks
+            # (an added file could hold blank nodes, so only retry a PUT)
+            self._session.request(
+                "PUT" if replace else "POST",
+                url,
+                body=body,
+                headers=headers,
+                idempotent=replace,
+            )
+        self._touch_key(key)
+
+    def replace_graph_for_key(self, graph: Graph, key: str) -> None:
+        """replaces the content of the graph for the key, all in one update
+        request so it is applied as a single transaction (readers never see
+        it empty), then records its lastmod
+
+        :param graph: the new content of the graph
+        :type graph: Graph
+        :param key: the key of the graph to replace
+        :type key: str
+        """
+        ng: str = self._nmapper.key_to_ng(key)
+        operations: List[str] = [f"DROP SILENT GRAPH <{ng}>"]
+        if len(graph):
+            operations.append(
+                f"INSERT DATA {{ GRAPH <{ng}> {{\n"
+                f"{triples_block(graph)}\n}} }}"
+            )
+        self._update(" ;\n".join(operations))
+        self._touch_key(key)
+
+    def drop_graphs_for_keys(self, keys: Iterable[str]) -> None:
+        """drops the graphs for the keys all in one update request, then
+        forgets them in the admin registry
+
+        :param keys: the keys of the graphs to remove
+        :type keys: Iterable[str]
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        # else
+        self._update(
+            " ;\n".join(
+                f"DROP SILENT GRAPH <{self._nmapper.key_to_ng(key)}>"
+                for key in keys
+            )
+        )
+        for key in keys:
+            self.forget_graph_for_key(key)
+
+    def lastmod_by_key(
+        self, keys: Iterable[str]
+    ) -> Optional[Dict[str, Optional[datetime]]]:
+        """gets the lastmod for all keys in one query per batch of keys
+
+        :param keys: the keys to get the lastmod for
+        :type keys: Iterable[str]
+        :returns: the lastmod by key (None if the registry has none),
+            or None if the registry does not match the expected layout
+            (checked against the store's own lastmod of a found key)
+        :rtype: Dict[str, Optional[datetime]]
+        """
+        keys = list(keys)
+        lastmods: Dict[str, Optional[datetime]] = {key: None for key in keys}
+        if not keys:
+            return lastmods
+        # else
+        found: int = 0
+        for start in range(0, len(keys), self._lookup_batch_size):
+            batch = keys[start : start + self._lookup_batch_size]
+            key_by_ng = {self._nmapper.key_to_ng(key): key for key in batch}
+            values = " ".join(f"<{ng}>" for ng in key_by_ng)
+            sparql = (
+                "SELECT ?g ?lastmod WHERE { "
+                f"VALUES ?g {{ {values} }} "
+                f"GRAPH <{self._admin_graph}> "
+                f"{{ ?g <{SCHEMA_DATEMODIFIED}> ?lastmod . }} "
+                "}"
+            )
+            for row in self._select(sparql):
+                key = key_by_ng.get(row["g"])
+                if key is None:
+                    continue
+                lastmod = parse_xsd_datetime(row["lastmod"])
+                if lastmods[key] is None or lastmods[key] < lastmod:
+                    lastmods[key] = lastmod
+                found += 1
+        if not found:
+            log.warning(
+                "bulk lastmod lookup found nothing for the known keys, "
+                "the admin registry layout might not match"
+            )
+            return None
+        # else
+        probe: str = next(k for k in keys if lastmods[k] is not None)
+        if lastmod_of_key(self, probe) != lastmods[probe]:
+            log.warning(
+                "bulk lastmod lookup disagrees with the store, "
+                "the admin registry layout does not match"
+            )
+            return None
+        return lastmods
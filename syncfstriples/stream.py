@@ -0,0 +1,181 @@
+import mmap
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from rdflib import BNode, ConjunctiveGraph, Graph
+
+from syncfstriples.compression import compression_of, open_dump_text
+from syncfstriples.defaults import DEFAULT_CHUNK_SIZE
+from syncfstriples.plan import BYTES_PER_TRIPLE
+
+log = getLogger(__name__)
+
+# line-oriented formats that can be parsed in independent chunks of lines
+STREAMABLE_FORMATS = ("nt", "nquads")
+
+
+def collapse_quads(dataset: ConjunctiveGraph) -> Graph:
+    """collapses the quads of all graphs in the dataset into one graph
+    (since each file is synced to its own single named graph)
+
+    :param dataset: the dataset holding the parsed quads
+    :type dataset: ConjunctiveGraph
+    :returns: graph with the triples of all the quads
+    :rtype: Graph
+    """
+    graph: Graph = Graph()
+    for s, p, o, _ in dataset.quads((None, None, None, None)):
+        graph.add((s, p, o))
+    return graph
+
+
+def parse_lines(
+    lines: List[str], format: str, bnode_context: Dict[str, BNode] = None
+) -> Graph:
+    """parses the lines of an n-triples or n-quads dump into a graph
+
+    :param lines: the lines to parse
+    :type lines: List[str]
+    :param format: one of STREAMABLE_FORMATS
+    :type format: str
+    :param bnode_context: blank nodes by their label in the file, to share
+        between the chunks of one file
+        optional - defaults to None meaning the labels are local to the lines
+    :type bnode_context: Dict[str, BNode]
+    :returns: the graph with the parsed triples
+    :rtype: Graph
+    """
+    assert format in STREAMABLE_FORMATS, "cannot stream format " + format
+    data: str = "".join(lines)
+    if format == "nt":
+        return Graph().parse(
+            data=data, format=format, bnode_context=bnode_context
+        )
+    # else
+    dataset = ConjunctiveGraph()
+    # (parse gives the graph parsed into, so keep the dataset at hand)
+    dataset.parse(data=data, format=format, bnode_context=bnode_context)
+    return collapse_quads(dataset)
+
+
+def iter_line_chunks(fpath: Path, chunk_size: int) -> Iterator[List[str]]:
+    """reads the (possibly compressed) file at fpath in chunks of at most
+    chunk_size lines
+
+    :param fpath: path of the file to read
+    :type fpath: Path
+    :param chunk_size: max number of lines per chunk
+    :type chunk_size: int
+    :returns: iterator over the lists of lines
+    :rtype: Iterator[List[str]]
+    """
+    assert chunk_size > 0, "chunk_size should be positive"
+    chunk: List[str] = list()
+    with open_dump_text(fpath) as f:
+        for line in f:
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = list()
+    if chunk:
+        yield chunk
+
+
+def iter_graph_chunks(
+    fpath: Path, format: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Graph]:
+    """parses the n-triples or n-quads file at fpath in chunks of lines,
+    so the memory needed is bound by the chunk_size, not by the file size.
+    Blank node labels keep their meaning across the chunks.
+
+    :param fpath: path of the file to parse
+    :type fpath: Path
+    :param format: one of STREAMABLE_FORMATS
+    :type format: str
+    :param chunk_size: max number of lines parsed into one graph
+        optional - defaults to DEFAULT_CHUNK_SIZE = 100000
+    :type chunk_size: int
+    :returns: iterator over the graphs holding the chunks
+    :rtype: Iterator[Graph]
+    """
+    bnode_context: Dict[str, BNode] = dict()
+    for n, lines in enumerate(iter_line_chunks(fpath, chunk_size)):
+        log.debug(f"parsing chunk {n} ({len(lines)} lines) of {fpath}")
+        yield parse_lines(lines, format, bnode_context)
+
+
+class ScopedBNodes(dict):
+    """Blank nodes by their label in a file, derived from the label and a
+    scope unique to the file (and sync). So the chunks of one file parsed
+    apart (in other processes) agree on the blank nodes they share.
+    """
+
+    def __init__(self, scope: str):
+        super().__init__()
+        self.scope: str = scope
+
+    def get(self, label: str, default: BNode = None) -> BNode:
+        return self.setdefault(label, BNode(f"{self.scope}{label}"))
+
+
+def can_map(fpath: Path) -> bool:
+    """checks if the file at fpath can be memory-mapped to be parsed in
+    spans of lines (i.e. it is not compressed)
+    """
+    return compression_of(fpath) is None
+
+
+def iter_line_spans(
+    fpath: Path, format: str, chunk_size: int
+) -> Iterator[Tuple[int, int]]:
+    """splits the (not compressed) file at fpath on line boundaries into
+    spans of bytes holding about chunk_size lines each
+
+    :param fpath: path of the file to split
+    :type fpath: Path
+    :param format: one of STREAMABLE_FORMATS
+    :type format: str
+    :param chunk_size: the number of lines to aim for per span
+    :type chunk_size: int
+    :returns: iterator over the (start, end) byte offsets of the spans
+    :rtype: Iterator[Tuple[int, int]]
+    """
+    assert chunk_size > 0, "chunk_size should be positive"
+    span_bytes: int = chunk_size * BYTES_PER_TRIPLE[format]
+    with open(fpath, "rb") as f:
+        size: int = Path(fpath).stat().st_size
+        if size == 0:
+            return
+        # else
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start: int = 0
+            while start < size:
+                newline: int = mapped.find(b"\n", start + span_bytes - 1)
+                end: int = size if newline < 0 else newline + 1
+                yield start, end
+                start = end
+
+
+def parse_span(
+    fpath: Path, format: str, scope: str, span: Tuple[int, int]
+) -> Graph:
+    """parses the span of lines of the (not compressed) file at fpath,
+    mapping the file in memory so only the span is read
+
+    :param fpath: path of the n-triples or n-quads file to parse
+    :type fpath: Path
+    :param format: one of STREAMABLE_FORMATS
+    :type format: str
+    :param scope: prefix for the blank nodes, shared by all spans of the file
+    :type scope: str
+    :param span: the (start, end) byte offsets of the lines to parse
+    :type span: Tuple[int, int]
+    :returns: the graph with the parsed triples
+    :rtype: Graph
+    """
+    start, end = span
+    with open(fpath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data: str = mapped[start:end].decode("utf-8")
+    return parse_lines([data], format, ScopedBNodes(scope))
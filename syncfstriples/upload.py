@@ -0,0 +1,64 @@
+import json
+import re
+from logging import getLogger
+from pathlib import Path
+
+from pyrdfstore.store import RDFStore
+
+from syncfstriples.compression import open_dump, open_dump_text
+
+log = getLogger(__name__)
+
+# the formats a graph store can ingest natively, with their media type
+CONTENT_TYPE_BY_FORMAT = {
+    "turtle": "text/turtle",
+    "nt": "application/n-triples",
+    "json-ld": "application/ld+json",
+}
+NT_LINE = re.compile(r"^\s*(?:#.*|(?:<[^>]*>|_:\S+)\s.*\.\s*(?:#.*)?)?$")
+PRECHECK_BLOCK_SIZE = 1 << 20
+
+
+def can_upload(store: RDFStore, format: str) -> bool:
+    """checks if files in the format can be uploaded as-is to the store
+
+    :param store: the store to upload to
+    :type store: RDFStore
+    :param format: the rdflib format of the file
+    :type format: str
+    :rtype: bool
+    """
+    return (
+        getattr(store, "upload_file_for_key", None) is not None
+        and format in CONTENT_TYPE_BY_FORMAT
+    )
+
+
+def precheck_dump(fpath: Path, format: str) -> None:
+    """performs a fast syntax check of the dump at fpath, much cheaper
+    than parsing it with rdflib, but only catching the grossest errors:
+    invalid utf-8 (all formats), invalid json (json-ld), and lines not
+    looking like a triple (n-triples)
+
+    :param fpath: path of the file to check
+    :type fpath: Path
+    :param format: the rdflib format of the file
+    :type format: str
+    :raises ValueError: when the file fails the check
+    :rtype: None
+    """
+    try:
+        if format == "json-ld":
+            with open_dump(fpath) as f:
+                json.load(f)
+        elif format == "nt":
+            with open_dump_text(fpath) as f:
+                for n, line in enumerate(f, 1):
+                    if not NT_LINE.match(line):
+                        raise ValueError(f"line {n} is no n-triple")
+        else:
+            with open_dump_text(fpath) as f:
+                while f.read(PRECHECK_BLOCK_SIZE):
+                    pass
+    except ValueError as e:  # includes decoding errors
+        raise ValueError(f"precheck of {fpath} failed: {e}") from e
@@ -0,0 +1,315 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from logging import getLogger
+from pathlib import Path
+from threading import Event
+from typing import Callable, Dict, Optional, Set, Tuple
+
+log = getLogger(__name__)
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_POLL_INTERVAL = 10.0
+
+# see inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class PollingWatcher:
+    """Detects changes under root by periodically comparing scans of it.
+    Fallback for systems where inotify is not available.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        scan: Callable[[Path], Dict[str, os.stat_result]],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """Creates the watcher
+
+        :param root: the folder to watch
+        :type root: Path
+        :param scan: function listing the files (with their stat) in root
+        :type scan: Callable[[Path], Dict[str, os.stat_result]]
+        :param poll_interval: seconds between the scans
+            optional - defaults to DEFAULT_POLL_INTERVAL = 10.0
+        :type poll_interval: float
+        """
+        self.root: Path = Path(root)
+        self._scan = scan
+        self._poll_interval: float = poll_interval
+        self._snapshot: Dict[str, Tuple[float, int]] = self._take_snapshot()
+        self._next_poll: float = time.monotonic() + poll_interval
+
+    def _take_snapshot(self) -> Dict[str, Tuple[float, int]]:
+        return {
+            fname: (stat.st_mtime, stat.st_size)
+            for fname, stat in self._scan(self.root).items()
+        }
+
+    def read_events(self, timeout: float) -> Set[Path]:
+        """waits at most timeout seconds for changes
+
+        :param timeout: max seconds to wait
+        :type timeout: float
+        :returns: the paths that changed (empty if none within timeout)
+        :rtype: Set[Path]
+        """
+        wait: float = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        # else
+        time.sleep(max(0.0, wait))
+        self._next_poll = time.monotonic() + self._poll_interval
+        previous, self._snapshot = self._snapshot, self._take_snapshot()
+        changed = {
+            fname
+            for fname, info in self._snapshot.items()
+            if previous.get(fname) != info
+        }
+        changed |= set(previous) - set(self._snapshot)
+        return {Path(fname) for fname in changed}
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Detects changes under root through linux inotify events."""
+
+    def __init__(self, root: Path, accept_dir: Callable[[str], bool] = None):
+        """Creates the watcher, watching all folders nested in root
+
+        :param root: the folder to watch
+        :type root: Path
+        :param accept_dir: function deciding on the folders to watch,
+            given their '/'-separated path relative to root
+            optional - defaults to None meaning all folders are watched
+        :type accept_dir: Callable[[str], bool]
+        """
+        self.root: Path = Path(root)
+        self._accept_dir: Callable[[str], bool] = accept_dir
+        self._libc = InotifyWatcher._load_libc()
+        self._fd: int = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            InotifyWatcher._raise_errno("inotify_init1")
+        self._path_by_wd: Dict[int, Path] = dict()
+        try:
+            self._watch_tree(self.root)
+        except OSError:
+            self.close()
+            raise
+
+    @staticmethod
+    def _load_libc():
+        libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        libc.inotify_init1  # raises AttributeError if not available
+        return libc
+
+    @staticmethod
+    def available() -> bool:
+        """indicates if inotify can be used on this system"""
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            InotifyWatcher._load_libc()
+            return True
+        except (OSError, AttributeError):
+            return False
+
+    @staticmethod
+    def _raise_errno(what: str):
+        err: int = ctypes.get_errno()
+        raise OSError(err, f"{what} failed: {os.strerror(err)}")
+
+    def _watch_dir(self, dpath: Path) -> None:
+        wd: int = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(str(dpath)), WATCH_MASK
+        )
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOENT:
+                return  # gone before we got to it
+            InotifyWatcher._raise_errno(f"inotify_add_watch on {dpath}")
+        self._path_by_wd[wd] = dpath
+
+    def _accepts_dir(self, dpath: Path) -> bool:
+        if self._accept_dir is None or dpath == self.root:
+            return True
+        return self._accept_dir(dpath.relative_to(self.root).as_posix())
+
+    def _watch_tree(self, top: Path) -> None:
+        if not self._accepts_dir(top):
+            return
+        self._watch_dir(top)
+        for dirpath, dirnames, _ in os.walk(str(top)):
+            # prune the walk (in place) to the accepted folders
+            dirnames[:] = [
+                dirname
+                for dirname in dirnames
+                if self._accepts_dir(Path(dirpath) / dirname)
+            ]
+            for dirname in dirnames:
+                self._watch_dir(Path(dirpath) / dirname)
+
+    def read_events(self, timeout: float) -> Set[Path]:
+        """waits at most timeout seconds for changes
+
+        :param timeout: max seconds to wait
+        :type timeout: float
+        :returns: the paths that changed (empty if none within timeout),
+            the root itself is returned if events were lost
+        :rtype: Set[Path]
+        """
+        changed: Set[Path] = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        # else
+        while True:
+            try:
+                buffer: bytes = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            self._handle_events(buffer, changed)
+        return changed
+
+    def _handle_events(self, buffer: bytes, changed: Set[Path]) -> None:
+        offset: int = 0
+        while offset < len(buffer):
+            wd, mask, _, namelen = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            rawname: bytes = buffer[offset : offset + namelen].rstrip(b"\0")
+            offset += namelen
+            if mask & IN_Q_OVERFLOW:
+                log.warning("inotify queue overflow, events got lost")
+                changed.add(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self._path_by_wd.pop(wd, None)
+                continue
+            dpath: Optional[Path] = self._path_by_wd.get(wd)
+            if dpath is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # the folder itself is reported by the event in its parent
+                continue
+            path: Path = dpath / os.fsdecode(rawname)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+            changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(
+    root: Path,
+    scan: Callable[[Path], Dict[str, os.stat_result]],
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+    polling: bool = False,
+    accept_dir: Callable[[str], bool] = None,
+):
+    """creates the best available watcher for changes under root
+
+    :param root: the folder to watch
+    :type root: Path
+    :param scan: function listing the files (with their stat) in root
+        only used when falling back to polling
+    :type scan: Callable[[Path], Dict[str, os.stat_result]]
+    :param poll_interval: seconds between scans when polling
+    :type poll_interval: float
+    :param polling: forces the use of polling in stead of inotify
+    :type polling: bool
+    :param accept_dir: function deciding on the folders to watch
+        only used for inotify, the scan function is expected to prune itself
+    :type accept_dir: Callable[[str], bool]
+    :returns: a watcher offering read_events(timeout) and close()
+    """
+    if not polling and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(root, accept_dir)
+        except OSError as e:
+            log.warning(f"cannot use inotify ({e}), falling back to polling")
+    return PollingWatcher(root, scan, poll_interval)
+
+
+def watch_changes(
+    watcher,
+    on_changes: Callable[[Set[Path]], None],
+    stop_event: Event,
+    debounce: float = DEFAULT_DEBOUNCE,
+    max_delay: float = DEFAULT_MAX_DELAY,
+) -> None:
+    """collects the changes reported by the watcher until stop_event is set,
+    and passes them on in coalesced batches.
+    A batch is passed as soon as no new changes arrived for debounce seconds,
+    or when its first change is waiting for more then max_delay seconds.
+
+    :param watcher: the source of the change events
+    :param on_changes: handler receiving each batch of changed paths
+    :type on_changes: Callable[[Set[Path]], None]
+    :param stop_event: event signalling the watching should stop
+    :type stop_event: Event
+    :param debounce: seconds of quiet before a batch is passed on
+        optional - defaults to DEFAULT_DEBOUNCE = 2.0
+    :type debounce: float
+    :param max_delay: max seconds a change can be held back
+        optional - defaults to DEFAULT_MAX_DELAY = 30.0
+    :type max_delay: float
+    :rtype: None
+    """
+    pending: Set[Path] = set()
+    first_change: float = None
+    last_change: float = None
+    while not stop_event.is_set():
+        paths: Set[Path] = watcher.read_events(
+            timeout=debounce if pending else 1.0
+        )
+        now: float = time.monotonic()
+        if paths:
+            pending |= paths
+            first_change = first_change or now
+            last_change = now
+        if pending and (
+            now - last_change >= debounce or now - first_change >= max_delay
+        ):
+            batch, pending = pending, set()
+            first_change = None
+            log.debug(f"passing on {len(batch)} changed paths")
+            on_changes(batch)
@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+""" test_batch
+tests concerning the batched inserts and removals
+"""
+import pytest
+from conftest import make_sample_graph
+from pyrdfstore.store import GraphNameMapper, MemoryRDFStore
+from util4tests import log, run_single_test
+
+from syncfstriples.batch import InsertBatcher, remove_keys
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import perform_sync
+from syncfstriples.state import SyncStateIndex
+
+
+class BatchMemoryRDFStore(MemoryRDFStore):
+    """memory store offering the batched insert and removal,
+    failing the batches (and inserts) holding one of the bad keys
+    """
+
+    def __init__(self, *, mapper: GraphNameMapper = None, bad_keys=()):
+        super().__init__(mapper=mapper)
+        self.bad_keys = set(bad_keys)
+        self.insert_batches = list()
+        self.drop_batches = list()
+
+    def insert_for_key(self, graph, key):
+        if key in self.bad_keys:
+            raise ValueError(f"bad key {key}")
+        super().insert_for_key(graph, key)
+
+    def insert_for_keys(self, graph_by_key):
+        self.insert_batches.append(
+            {key: len(graph) for key, graph in graph_by_key.items()}
+        )
+        if self.bad_keys & set(graph_by_key):
+            raise ValueError("batch with bad key")
+        for key, graph in graph_by_key.items():
+            super().insert_for_key(graph, key)
+
+    def drop_graphs_for_keys(self, keys):
+        keys = list(keys)
+        self.drop_batches.append(keys)
+        for key in keys:
+            self.drop_graph_for_key(key)
+            self.forget_graph_for_key(key)
+
+
+@pytest.mark.usefixtures("nmapper")
+def test_insert_batcher(nmapper):
+    log.info("test_insert_batcher")
+    rdf_store = BatchMemoryRDFStore(mapper=nmapper, bad_keys=["bad"])
+    batcher = InsertBatcher(rdf_store, max_triples=10, max_graphs=3)
+    done = list()
+
+    def done_with(key):
+        return lambda: done.append(key)
+
+    for n in range(5):
+        key = f"g-{n}"
+        batcher.add(key, make_sample_graph(range(2)), done_with(key))
+    batcher.add("big", make_sample_graph(range(20)))
+    batcher.flush()
+    sizes = [len(batch) for batch in rdf_store.insert_batches]
+    assert sizes == [3, 2, 1]
+    assert all(
+        sum(batch.values()) <= 10 or len(batch) == 1
+        for batch in rdf_store.insert_batches
+    )
+    assert done == [f"g-{n}" for n in range(5)]
+    assert not batcher.failed
+
+    # a failing key does not fail the others in its batch
+    done.clear()
+    for key in ("ok-1", "bad", "ok-2"):
+        batcher.add(key, make_sample_graph(range(1)), done_with(key))
+    batcher.flush()
+    assert batcher.failed == {"bad"}
+    assert done == ["ok-1", "ok-2"]
+    assert "bad" not in set(rdf_store.keys)
+    assert {"ok-1", "ok-2"} <= set(rdf_store.keys)
+
+    removed = remove_keys(rdf_store, ["g-0", "g-1", "g-2", "g-3"], 3)
+    assert removed == ["g-0", "g-1", "g-2", "g-3"]
+    assert rdf_store.drop_batches == [["g-0", "g-1", "g-2"], ["g-3"]]
+
+
+@pytest.mark.usefixtures("nmapper")
+def test_insert_batcher_per_key(nmapper):
+    log.info("test_insert_batcher_per_key")
+    rdf_store = MemoryRDFStore(mapper=nmapper)
+    inserted = list()
+
+    def insert_for_key(graph, key):
+        inserted.append(key)
+        if key == "bad":
+            raise ValueError(f"bad key {key}")
+        MemoryRDFStore.insert_for_key(rdf_store, graph, key)
+
+    rdf_store.insert_for_key = insert_for_key
+    batcher = InsertBatcher(rdf_store, max_graphs=3)
+    for key in ("ok-1", "bad", "ok-2"):
+        batcher.add(key, make_sample_graph(range(1), bnode_subjects=True))
+    batcher.flush()
+    # without a bulk insert, no graph is inserted twice
+    assert inserted == ["ok-1", "bad", "ok-2"]
+    assert batcher.failed == {"bad"}
+    assert set(rdf_store.keys) == {"ok-1", "ok-2"}
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_sync_batched(nmapper, syncfolders):
+    log.info("test_sync_batched")
+    syncpath = syncfolders[0]
+    rdf_store = BatchMemoryRDFStore(mapper=nmapper, bad_keys=["tiny-03.ttl"])
+    fnames = [f"tiny-{n:02d}.ttl" for n in range(10)]
+    for n, fname in enumerate(fnames):
+        g = make_sample_graph(range(n * 10, n * 10 + 2))
+        g.serialize(destination=str(syncpath / fname), format="turtle")
+
+    state_path = SyncStateIndex.default_path(syncpath)
+    with SyncStateIndex(state_path) as state:
+        perform_sync(
+            syncpath,
+            rdf_store,
+            state=state,
+            options=SyncOptions(max_batch_graphs=4),
+        )
+        # the failing key is not recorded, so it is retried next time
+        assert set(state.entries) == set(fnames) - {"tiny-03.ttl"}
+    sizes = [len(batch) for batch in rdf_store.insert_batches]
+    # the batch with the failing key got retried per key
+    assert [size for size in sizes if size > 1] == [4, 4, 2]
+    failed_batch = next(
+        batch
+        for batch in rdf_store.insert_batches
+        if len(batch) > 1 and "tiny-03.ttl" in batch
+    )
+    assert sizes.count(1) == len(failed_batch)
+    assert set(rdf_store.keys) == set(fnames) - {"tiny-03.ttl"}
+
+    for fname in fnames[:5]:
+        (syncpath / fname).unlink()
+    rdf_store.bad_keys.clear()
+    with SyncStateIndex(state_path) as state:
+        perform_sync(
+            syncpath,
+            rdf_store,
+            state=state,
+            options=SyncOptions(max_batch_graphs=4),
+        )
+        assert set(state.entries) == set(fnames[5:])
+    assert [len(batch) for batch in rdf_store.drop_batches] == [4]
+    assert set(rdf_store.keys) == set(fnames[5:])
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+""" test_benchmark
+tests keeping the benchmark harness (corpus generator, stand-in endpoint
+and scenario runs) in working order, on a tiny scale
+"""
+from conftest import make_sample_graph
+from pyrdfstore.store import GraphNameMapper
+from rdflib import URIRef
+from util4tests import log, run_single_test
+
+from bench.benchmark import (
+    SCENARIOS,
+    StandInEndpoint,
+    change_corpus,
+    compare,
+    generate_corpus,
+    parse_format_mix,
+    run_benchmark,
+)
+from syncfstriples.store import (
+    SyncURIRDFStore,
+    insert_for_keys,
+    lastmod_by_key,
+)
+
+
+def test_generate_corpus(tmp_path):
+    log.info("test_generate_corpus")
+    mix = parse_format_mix("turtle:2,nt:1,json-ld:1")
+    assert mix == {"turtle": 2, "nt": 1, "json-ld": 1}
+    corpus = generate_corpus(
+        tmp_path, files=12, depth=2, triples=3, format_mix=mix, seed=1
+    )
+    assert len(corpus) == 12
+    assert all(entry.fpath.exists() for entry in corpus)
+    suffixes = {entry.fpath.suffix for entry in corpus}
+    assert suffixes <= {".ttl", ".nt", ".jsonld"}
+    depths = {len(e.fpath.relative_to(tmp_path).parts) for e in corpus}
+    assert depths == {1, 2, 3}
+    # generation is repeatable
+    again = generate_corpus(
+        tmp_path / "again", 12, depth=2, triples=3, format_mix=mix, seed=1
+    )
+    assert [e.fpath.suffix for e in again] == [e.fpath.suffix for e in corpus]
+
+    remaining = change_corpus(corpus, ratio=0.25, seed=1)
+    assert len(remaining) == 12 - 1
+    assert sum(e.triples == 4 for e in remaining) == 3
+
+
+def test_run_benchmark_memory(tmp_path):
+    log.info("test_run_benchmark_memory")
+    # the index (in stead of the store lastmods) spots the changed files,
+    # even when changed within the clock tick of the last sync
+    outcome = run_benchmark(
+        tmp_path,
+        stores=["memory"],
+        files=20,
+        triples=5,
+        change_ratio=0.2,
+        state=True,
+    )
+    runs = {r["scenario"]: r for r in outcome["results"]}
+    assert set(runs) == set(SCENARIOS)
+    assert runs["full"]["counters"]["files_added"] == 20
+    assert runs["full"]["counters"]["triples"] == 20 * 5
+    assert runs["incremental"]["counters"]["files_updated"] == 4
+    assert runs["incremental"]["counters"]["files_removed"] == 2
+    noop = runs["noop"]["counters"]
+    assert noop["files_added"] + noop["files_updated"] == 0
+    assert noop["files_scanned"] == 18
+    ratios, regressions = compare(outcome, outcome, tolerance=0.2)
+    assert len(ratios) == len(outcome["results"]) and not regressions
+
+
+def test_standin_endpoint(tmp_path):
+    log.info("test_standin_endpoint")
+    nmapper = GraphNameMapper(base="urn:test-bench:")
+    with StandInEndpoint() as endpoint:
+        store = SyncURIRDFStore(
+            endpoint.sparql_uri,
+            endpoint.sparql_uri,
+            mapper=nmapper,
+            gsp_uri=endpoint.gsp_uri,
+        )
+
+        def graph_of(key):
+            return endpoint.dataset.graph(URIRef(nmapper.key_to_ng(key)))
+
+        insert_for_keys(
+            store,
+            {
+                "one.ttl": make_sample_graph(range(3)),
+                "two.ttl": make_sample_graph(range(3, 5)),
+            },
+        )
+        assert len(graph_of("one.ttl")) == 3
+        assert len(graph_of("two.ttl")) == 2
+        lastmods = store.lastmod_by_key(["one.ttl", "two.ttl", "new.ttl"])
+        assert lastmods["one.ttl"] is not None
+        assert lastmods["new.ttl"] is None
+
+        store.replace_graph_for_key(make_sample_graph(range(7)), "one.ttl")
+        assert len(graph_of("one.ttl")) == 7
+        assert store.lastmod_by_key(["one.ttl"])["one.ttl"] >= (
+            lastmods["one.ttl"]
+        )
+
+        fpath = tmp_path / "up.nt"
+        make_sample_graph(range(4)).serialize(
+            destination=str(fpath), format="nt"
+        )
+        store.upload_file_for_key(str(fpath), "application/n-triples", "up.nt")
+        assert len(graph_of("up.nt")) == 4
+        assert store.lastmod_by_key(["up.nt"])["up.nt"] is not None
+
+        store.drop_graphs_for_keys(["one.ttl", "up.nt"])
+        assert len(graph_of("one.ttl")) == 0
+        lastmods = store.lastmod_by_key(["one.ttl", "two.ttl"])
+        assert lastmods["one.ttl"] is None
+        assert lastmods["two.ttl"] is not None
+        assert endpoint.requests > 0
+
+        # the registry is only bulk read where it matches the store
+        elsewhere = SyncURIRDFStore(
+            endpoint.sparql_uri, mapper=nmapper, admin_graph="urn:elsewhere"
+        )
+        assert elsewhere.lastmod_by_key(["two.ttl"]) is None
+        assert lastmod_by_key(store, []) == dict()
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
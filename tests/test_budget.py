@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+""" test_budget
+tests concerning the memory budget bounding the graphs in flight
+"""
+from pathlib import Path
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+import syncfstriples.service
+from syncfstriples.budget import MemoryBudget, estimate_memory, parse_size
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import iter_parsed_graphs, perform_sync
+
+
+def test_parse_size():
+    log.info("test_parse_size")
+    assert parse_size("1024") == 1024
+    assert parse_size("512M") == 512 << 20
+    assert parse_size("1.5g") == 3 << 29
+    assert parse_size("2GiB") == 2 << 30
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_memory_budget():
+    log.info("test_memory_budget")
+    assert estimate_memory(Path("a.nt.gz"), 100, "nt") > estimate_memory(
+        Path("a.nt"), 100, "nt"
+    )
+    budget = MemoryBudget(100)
+    assert budget.try_acquire(60)
+    assert not budget.try_acquire(60)
+    assert budget.try_acquire(40)
+    budget.release(60)
+    budget.release(40)
+    # larger than the budget, only when alone
+    assert budget.try_acquire(500)
+    assert not budget.try_acquire(1)
+    budget.release(500)
+    assert budget.in_use == 0 and budget.peak == 500
+
+
+def test_iter_parsed_graphs_admit(tmp_path):
+    log.info("test_iter_parsed_graphs_admit")
+    fpaths = list()
+    for n in range(6):
+        fpath = tmp_path / f"admit-{n}.ttl"
+        make_sample_graph(range(n, n + 2)).serialize(
+            destination=str(fpath), format="turtle"
+        )
+        fpaths.append(fpath)
+    admitted = list()
+
+    def admit_one(fpath):
+        # only one parse at a time may be pending
+        if len(admitted) > len(handled):
+            return False
+        admitted.append(fpath)
+        return True
+
+    handled = list()
+    for fpath, graph in iter_parsed_graphs(fpaths, 2, admit=admit_one):
+        assert len(graph) == 2
+        handled.append(fpath)
+    assert handled == fpaths
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_sync_with_budget(rdf_stores, syncfolders, monkeypatch):
+    log.info(f"test_sync_with_budget ({len(syncfolders)})")
+    budgets = list()
+
+    class RecordedBudget(MemoryBudget):
+        def __init__(self, max_bytes):
+            super().__init__(max_bytes)
+            budgets.append(self)
+
+    monkeypatch.setattr(syncfstriples.service, "MemoryBudget", RecordedBudget)
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"budget-{n:02d}.ttl" for n in range(8)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        cost = max(
+            estimate_memory(fpath, fpath.stat().st_size, "turtle")
+            for fpath in (syncpath / fname for fname in fnames)
+        )
+        for pipeline in (False, True):
+            budgets.clear()
+            for fname in fnames:
+                rdf_store.drop_graph_for_key(fname)
+                rdf_store.forget_graph_for_key(fname)
+            # files too large for the budget still get synced, one by one
+            perform_sync(
+                syncpath,
+                rdf_store,
+                options=SyncOptions(
+                    workers=2,
+                    pipeline=pipeline,
+                    max_batch_graphs=1,
+                    max_inflight_bytes=1,
+                ),
+            )
+            assert set(rdf_store.keys) == set(fnames)
+            (budget,) = budgets
+            assert budget.in_use == 0
+            assert budget.peak <= cost
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+""" test_compression
+tests concerning the sync of compressed dump files
+"""
+import bz2
+import gzip
+import lzma
+import sys
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.compression import open_dump
+from syncfstriples.formats import format_from_filepath, is_supported_dump
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import perform_sync
+
+COMPRESSORS = {
+    ".gz": gzip.compress,
+    ".bz2": bz2.compress,
+    ".xz": lzma.compress,
+}
+
+
+def test_compressed_suffixes():
+    log.info("test_compressed_suffixes")
+    assert is_supported_dump("data.ttl.gz")
+    assert is_supported_dump("data.jsonld.bz2")
+    assert is_supported_dump("data.nt.xz")
+    assert is_supported_dump("data.nq.zst")
+    assert not is_supported_dump("data.txt.gz")
+    assert not is_supported_dump("data.gz")
+    assert format_from_filepath("data.ttl.gz") == "turtle"
+    assert format_from_filepath("data.JSONLD.BZ2") == "json-ld"
+    assert format_from_filepath("data.nq.zst") == "nquads"
+
+
+def test_zstd_extra_missing(tmp_path, monkeypatch):
+    log.info("test_zstd_extra_missing")
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    with pytest.raises(ImportError, match=r"syncfstriples\[zstd\]"):
+        open_dump(tmp_path / "data.nt.zst")
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_compressed(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_compressed ({len(syncfolders)})")
+    sparql = "select * where {?s ?p ?o .}"
+    zstandard = None
+    try:
+        import zstandard
+    except ImportError:
+        log.warning("zstandard not available, not testing .zst dumps")
+    compressors = dict(COMPRESSORS)
+    if zstandard is not None:
+        compressors[".zst"] = zstandard.ZstdCompressor().compress
+
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        g = make_sample_graph(range(6))
+        keys = list()
+        for n, (compression, compress) in enumerate(compressors.items()):
+            for ext in ("ttl", "jsonld", "nt"):
+                fname = f"packed-{n}.{ext}{compression}"
+                data = g.serialize(
+                    format=format_from_filepath(fname), encoding="utf-8"
+                )
+                (syncpath / fname).write_bytes(compress(data))
+                keys.append(fname)
+
+        perform_sync(syncpath, rdf_store, options=SyncOptions(chunk_size=4))
+        # keys keep the compression suffix
+        assert set(rdf_store.keys) == set(keys)
+        for key in keys:
+            result = rdf_store.select(
+                sparql, named_graph=nmapper.key_to_ng(key)
+            )
+            assert len(result) == len(g)
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+""" test_contexts
+tests concerning the resolving (and caching) of json-ld contexts
+"""
+import json
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from rdflib import Literal, URIRef
+from util4tests import log, run_single_test
+
+from syncfstriples.contexts import (
+    SEED_INDEX_FNAME,
+    ContextResolver,
+    ContextUnavailable,
+    get_resolver,
+)
+from syncfstriples.options import SyncOptions
+from syncfstriples.report import SyncReport
+from syncfstriples.service import load_graph_fpath, perform_sync
+
+SCHEMA = "http://schema.org/"
+CONTEXT = {"@context": {"name": SCHEMA + "name", "@vocab": SCHEMA}}
+SEEDED_URL = "http://contexts.invalid/person.jsonld"
+
+
+class ContextHandler(BaseHTTPRequestHandler):
+    """serves CONTEXT at any path, counting the requests on its server"""
+
+    def do_GET(self):
+        self.server.hits += 1
+        payload = json.dumps(CONTEXT).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/ld+json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def context_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ContextHandler)
+    server.hits = 0
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def write_person(fpath, context, n: int = 0) -> None:
+    person = {"@context": context, "@id": f"urn:person:{n}", "name": f"P{n}"}
+    fpath.write_text(json.dumps(person))
+
+
+def assert_person(graph, n: int = 0) -> None:
+    name = (URIRef(f"urn:person:{n}"), URIRef(SCHEMA + "name"))
+    assert list(graph.objects(*name)) == [Literal(f"P{n}")]
+
+
+def test_resolver_cache(context_server, tmp_path):
+    log.info("test_resolver_cache")
+    url = "http://127.0.0.1:%d/person.jsonld" % context_server.server_port
+    for n in range(3):
+        write_person(tmp_path / f"person-{n}.jsonld", url, n)
+    cache_dir = tmp_path / "cache"
+
+    # loaded once per process
+    resolver = ContextResolver(cache_dir=cache_dir)
+    for n in range(3):
+        fpath = tmp_path / f"person-{n}.jsonld"
+        assert_person(load_graph_fpath(fpath, None, resolver), n)
+    assert context_server.hits == 1
+
+    # and once across runs, even offline
+    resolver = ContextResolver(cache_dir=cache_dir, offline=True)
+    fpath = tmp_path / "person-0.jsonld"
+    assert_person(load_graph_fpath(fpath, None, resolver))
+    assert context_server.hits == 1
+
+    with pytest.raises(ContextUnavailable):
+        load_graph_fpath(fpath, None, ContextResolver(offline=True))
+
+
+def test_resolver_seed(tmp_path):
+    log.info("test_resolver_seed")
+    seed_dir = tmp_path / "seed"
+    seed_dir.mkdir()
+    (seed_dir / "person.jsonld").write_text(json.dumps(CONTEXT))
+    index = {SEEDED_URL: "person.jsonld"}
+    (seed_dir / SEED_INDEX_FNAME).write_text(json.dumps(index))
+    resolver = get_resolver(seed_dir=seed_dir, offline=True)
+    # pickled (e.g. to a worker process) as the resolver of the process
+    assert pickle.loads(pickle.dumps(resolver)) is resolver
+
+    write_person(tmp_path / "plain.jsonld", SEEDED_URL)
+    assert_person(load_graph_fpath(tmp_path / "plain.jsonld", None, resolver))
+
+    # as do documents holding a list of objects
+    doc = json.loads((tmp_path / "plain.jsonld").read_text())
+    (tmp_path / "listed-doc.jsonld").write_text(json.dumps([doc]))
+    graph = load_graph_fpath(tmp_path / "listed-doc.jsonld", None, resolver)
+    assert_person(graph)
+
+    # relative, listed and imported contexts resolve as well
+    local = {"@context": {"@import": SEEDED_URL, "knows": SCHEMA + "knows"}}
+    (tmp_path / "local.jsonld").write_text(json.dumps(local))
+    write_person(tmp_path / "mixed.jsonld", [SEEDED_URL, "local.jsonld"])
+    graph = load_graph_fpath(tmp_path / "mixed.jsonld", None, resolver)
+    assert_person(graph)
+    write_person(tmp_path / "imported.jsonld", "local.jsonld")
+    graph = load_graph_fpath(tmp_path / "imported.jsonld", None, resolver)
+    assert_person(graph)
+
+    # only single contexts can be imported
+    listed = {"@context": [SEEDED_URL, {"knows": SCHEMA + "knows"}]}
+    (tmp_path / "listed.jsonld").write_text(json.dumps(listed))
+    importing = {"@context": {"@import": "listed.jsonld"}}
+    (tmp_path / "importing.jsonld").write_text(json.dumps(importing))
+    write_person(tmp_path / "bad.jsonld", "importing.jsonld")
+    with pytest.raises(ContextUnavailable):
+        load_graph_fpath(tmp_path / "bad.jsonld", None, resolver)
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_sync_jsonld_offline(rdf_stores, syncfolders, tmp_path):
+    log.info(f"test_sync_jsonld_offline ({len(syncfolders)})")
+    seed_dir = tmp_path / "seed"
+    seed_dir.mkdir()
+    (seed_dir / "person.jsonld").write_text(json.dumps(CONTEXT))
+    index = {SEEDED_URL: "person.jsonld"}
+    (seed_dir / SEED_INDEX_FNAME).write_text(json.dumps(index))
+    options = SyncOptions(
+        workers=2, jsonld_seed=str(seed_dir), jsonld_offline=True
+    )
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"person-{n}.jsonld" for n in range(4)]
+        for n, fname in enumerate(fnames):
+            write_person(syncpath / fname, SEEDED_URL, n)
+        write_person(syncpath / "unseeded.jsonld", "http://contexts.invalid/")
+
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, options, report=report)
+        assert set(rdf_store.keys) == set(fnames)
+        assert report.counters["files_failed"] == 1
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
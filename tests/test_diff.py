@@ -0,0 +1,148 @@
+#! /usr/bin/env python
+""" test_diff
+tests concerning the triple-level delta updates
+"""
+import os
+
+import pytest
+from conftest import make_sample_graph
+from rdflib import BNode, Graph, Literal, URIRef
+from util4tests import log, run_single_test
+
+from syncfstriples.diff import (
+    SnapshotStore,
+    graph_delta,
+    has_bnodes,
+    skolemize,
+)
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import perform_sync
+
+
+def test_graph_delta():
+    log.info("test_graph_delta")
+    previous = make_sample_graph(range(0, 5))
+    current = make_sample_graph(range(2, 8))
+    removed, added = graph_delta(previous, current)
+    assert set(removed) == set(make_sample_graph(range(0, 2)))
+    assert set(added) == set(make_sample_graph(range(5, 8)))
+
+    removed, added = graph_delta(current, current)
+    assert len(removed) == 0 and len(added) == 0
+
+
+def test_skolemize():
+    log.info("test_skolemize")
+    base = "urn:test-skolem:"
+    g = make_sample_graph(range(3), bnode_subjects=True)
+    assert has_bnodes(g)
+    # same content with other blank node labels
+    other = Graph()
+    relabel = dict()
+    for s, p, o in g:
+        other.add((relabel.setdefault(s, BNode()), p, o))
+
+    skolemized = skolemize(g, base)
+    assert not has_bnodes(skolemized)
+    assert len(skolemized) == len(g)
+    assert set(skolemized) == set(skolemize(other, base))
+    assert all(str(s).startswith(base) for s, _, _ in skolemized)
+
+    plain = make_sample_graph(range(3))
+    assert skolemize(plain, base) is plain
+
+
+@pytest.mark.usefixtures("syncfolders")
+def test_snapshot_store(syncfolders):
+    log.info("test_snapshot_store")
+    snapshots = SnapshotStore(SnapshotStore.default_path(syncfolders[0]))
+    key = "sub/snap.ttl"
+    assert snapshots.load(key) is None
+    g = make_sample_graph(range(4))
+    snapshots.save(key, g)
+    # literals spanning lines don't break the snapshot
+    g.add(
+        (
+            URIRef("urn:snap:s"),
+            URIRef("urn:snap:p"),
+            Literal("first line\nsecond line"),
+        )
+    )
+    snapshots.save(key, g)
+    loaded = snapshots.load(key)
+    assert set(loaded) == set(g)
+    snapshots.forget(key)
+    assert snapshots.load(key) is None
+    snapshots.forget(key)  # forgetting twice is fine
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_with_snapshots(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_with_snapshots ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fname = "delta.ttl"
+        fpath = syncpath / fname
+        make_sample_graph(range(5)).serialize(
+            destination=str(fpath), format="turtle"
+        )
+        snapshots = SnapshotStore(syncpath / ".snapshots")
+        perform_sync(syncpath, rdf_store, snapshots=snapshots)
+        assert set(snapshots.load(fname)) == set(make_sample_graph(range(5)))
+
+        # an append-only change does not drop the graph
+        def no_drops(*args, **kwargs):
+            raise AssertionError("append-only change should not drop")
+
+        drop_graph_for_key = rdf_store.drop_graph_for_key
+        rdf_store.drop_graph_for_key = no_drops
+        make_sample_graph(range(7)).serialize(
+            destination=str(fpath), format="turtle"
+        )
+        stat = fpath.stat()
+        os.utime(fpath, (stat.st_atime, stat.st_mtime + 3600))
+        perform_sync(syncpath, rdf_store, snapshots=snapshots)
+        assert set(snapshots.load(fname)) == set(make_sample_graph(range(7)))
+        rdf_store.drop_graph_for_key = drop_graph_for_key
+
+        # a removed file also removes its snapshot
+        fpath.unlink()
+        perform_sync(syncpath, rdf_store, snapshots=snapshots)
+        assert fname not in set(rdf_store.keys)
+        assert snapshots.load(fname) is None
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_skolemized_bnodes(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_skolemized_bnodes ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fname = "bnodes.ttl"
+        make_sample_graph(range(3), bnode_subjects=True).serialize(
+            destination=str(syncpath / fname), format="turtle"
+        )
+        snapshots = SnapshotStore(syncpath / ".snapshots")
+        perform_sync(
+            syncpath,
+            rdf_store,
+            snapshots=snapshots,
+            options=SyncOptions(bnode_mode="skolemize"),
+        )
+        snapshot = snapshots.load(fname)
+        assert len(snapshot) == 3
+        assert not has_bnodes(snapshot)
+        skolem_base = nmapper.key_to_ng(fname)
+        assert all(
+            isinstance(s, URIRef) and str(s).startswith(skolem_base)
+            for s, _, _ in snapshot
+        )
+
+        # in 'reload' mode graphs with blank nodes keep no snapshot
+        other = "reloaded.ttl"
+        make_sample_graph(range(3), bnode_subjects=True).serialize(
+            destination=str(syncpath / other), format="turtle"
+        )
+        perform_sync(syncpath, rdf_store, snapshots=snapshots)
+        assert snapshots.load(other) is None
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
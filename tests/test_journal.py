@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+""" test_journal
+tests concerning the journal to resume interrupted syncs from
+"""
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.journal import SyncJournal
+from syncfstriples.report import SyncReport
+from syncfstriples.service import perform_sync
+
+
+def test_journal_pending(tmp_path):
+    log.info("test_journal_pending")
+    journal = SyncJournal(SyncJournal.default_path(tmp_path))
+    assert journal.pending() is None
+    journal.start(tmp_path, ["gone.ttl"], ["one.ttl", "two.ttl", "new.ttl"])
+    journal.done("gone.ttl")
+    journal.done("one.ttl")
+    journal.close()
+    # as if interrupted while writing a line
+    with open(journal.path, "a") as f:
+        f.write('{"done":"tw')
+    pending = journal.pending()
+    assert pending.root == str(tmp_path.absolute())
+    assert pending.removals == []
+    assert pending.syncs == ["two.ttl", "new.ttl"]
+
+    journal.resume()
+    journal.done("two.ttl")
+    journal.close()
+    assert journal.pending().syncs == ["new.ttl"]
+    journal.finish()
+    assert not journal.path.exists()
+    assert journal.pending() is None
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_resume_sync(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_resume_sync ({len(syncfolders)})")
+    sparql = "select * where {?s ?p ?o .}"
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"resume-{n:02d}.ttl" for n in range(5)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        # an interrupted sync: 2 files done, 1 written in part
+        journal = SyncJournal(SyncJournal.default_path(syncpath))
+        journal.start(syncpath, [], fnames)
+        for n, fname in enumerate(fnames[:2]):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            rdf_store.insert_for_key(g, fname)
+            journal.done(fname)
+        rdf_store.insert_for_key(make_sample_graph(range(99, 101)), fnames[2])
+        journal.close()
+        # files appearing after the interruption wait for the next sync
+        make_sample_graph(range(3)).serialize(
+            destination=str(syncpath / "later.ttl"), format="turtle"
+        )
+
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, report=report, journal=journal)
+        assert not journal.path.exists()
+        assert report.counters["files_updated"] == len(fnames) - 2
+        assert set(rdf_store.keys) == set(fnames)
+        # the graph written in part got repaired
+        ng = nmapper.key_to_ng(fnames[2])
+        assert len(rdf_store.select(sparql, named_graph=ng)) == 3
+
+        perform_sync(syncpath, rdf_store, journal=journal)
+        assert set(rdf_store.keys) == set(fnames) | {"later.ttl"}
+        assert not journal.path.exists()
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_resume_failed_sync(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_resume_failed_sync ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"failing-{n:02d}.ttl" for n in range(3)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        (syncpath / fnames[1]).write_text("this is no turtle")
+
+        # the failed file stays pending in the journal
+        journal = SyncJournal(SyncJournal.default_path(syncpath))
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, report=report, journal=journal)
+        assert report.counters["files_failed"] == 1
+        assert journal.path.exists()
+        assert journal.pending().syncs == [fnames[1]]
+
+        # and is retried by the next sync, which completes the journal
+        make_sample_graph(range(10, 13)).serialize(
+            destination=str(syncpath / fnames[1]), format="turtle"
+        )
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, report=report, journal=journal)
+        assert report.counters["files_updated"] == 1
+        assert set(rdf_store.keys) == set(fnames)
+        assert not journal.path.exists()
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
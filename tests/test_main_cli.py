@@ -2,14 +2,52 @@
 """ test_main_cli
 tests concerning the cli call functioning
 """
+import io
+import json
+import os
 import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
 from uuid import uuid4
 
 import pytest
-from conftest import TEST_INPUT_FOLDER
+from conftest import TEST_INPUT_FOLDER, make_sample_graph
 from util4tests import log, run_single_test
 
+from syncfstriples.__main__ import get_arg_parser, main, nothing_to_sync
+
+# runs the cli in a fresh interpreter, telling which heavy modules it loaded
+CLI_PROBE = """
+import sys
 from syncfstriples.__main__ import main
+try:
+    main(*sys.argv[1:])
+except SystemExit:
+    pass
+print([m for m in ("rdflib", "pyrdfstore") if m in sys.modules])
+"""
+# generous bound on the wall time of the probed cli startup (interpreter
+# included), only to catch gross slowdowns: slow ci runners make a tight one
+# flaky, the check on the loaded modules is the actual regression guard
+CLI_STARTUP_MAX_SECONDS = 5.0
+
+
+def run_cli_probe(*cli_args) -> str:
+    env = dict(os.environ)
+    package_root = str(Path(__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, (package_root, env.get("PYTHONPATH")))
+    )
+    done = subprocess.run(
+        [sys.executable, "-c", CLI_PROBE, *cli_args],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return done.stdout.strip().splitlines()[-1]
 
 
 @pytest.mark.usefixtures("store_builds", "syncfolders")
@@ -40,5 +78,88 @@ def test_main_logconf():
         main(*args_list)  # pass as individual arguments
 
 
+def test_main_files_from(tmp_path, monkeypatch):
+    log.info("test_main_files_from")
+    root = tmp_path / "root"
+    root.mkdir()
+    for name in ("listed.ttl", "unlisted.ttl"):
+        g = make_sample_graph(range(3))
+        g.serialize(destination=str(root / name), format="turtle")
+    report = tmp_path / "report.json"
+    args = ("--root", str(root), "--report", str(report))
+    listing = tmp_path / "listing.txt"
+    listing.write_text("listed.ttl\n\n")
+    main(*args, "--files-from", str(listing))
+    assert json.loads(report.read_text())["counters"]["files_added"] == 1
+
+    monkeypatch.setattr("sys.stdin", io.StringIO("gone.ttl\nlisted.ttl\n"))
+    main(*args, "--files-from", "-")
+    assert json.loads(report.read_text())["counters"]["files_added"] == 1
+
+    with pytest.raises(SystemExit):
+        main("--root", str(root), "--files-from", "-", "--dry-run")
+
+
+def test_main_startup(tmp_path):
+    log.info("test_main_startup")
+    # the fast startup comes from not loading rdflib and pyrdfstore (checked
+    # by the probe), the timing is only bounded loosely on top of that
+    t0 = time.perf_counter()
+    assert run_cli_probe("--help") == "[]"
+    took = time.perf_counter() - t0
+    log.debug(f"cli --help took {took:.3f}s")
+    assert took < CLI_STARTUP_MAX_SECONDS
+
+    # a no-op run ends before loading the rdf stack
+    root = tmp_path / "root"
+    root.mkdir()
+    for n in range(3):
+        g = make_sample_graph(range(n, n + 3))
+        g.serialize(destination=str(root / f"noop-{n}.ttl"), format="turtle")
+    report = tmp_path / "report.json"
+    args = ("--root", str(root), "--state", "--report", str(report))
+    main(*args)
+    assert json.loads(report.read_text())["counters"]["files_added"] == 3
+    t0 = time.perf_counter()
+    assert run_cli_probe(*args) == "[]"
+    took = time.perf_counter() - t0
+    log.debug(f"cli no-op run took {took:.3f}s")
+    assert took < CLI_STARTUP_MAX_SECONDS
+    counters = json.loads(report.read_text())["counters"]
+    assert counters["files_skipped"] == 3 and counters["files_added"] == 0
+
+
+def test_main_noop(tmp_path):
+    log.info("test_main_noop")
+    root = tmp_path / "root"
+    root.mkdir()
+    for n in range(3):
+        g = make_sample_graph(range(n, n + 3))
+        g.serialize(destination=str(root / f"noop-{n}.ttl"), format="turtle")
+    ap = get_arg_parser()
+    args = ("--root", str(root), "--state")
+    # no state index yet
+    assert not nothing_to_sync(ap.parse_args(args))
+    main(*args)
+    assert nothing_to_sync(ap.parse_args(args))
+    # only plain syncs can be skipped
+    for extra in (("--reconcile",), ("--dry-run",), ("--watch",)):
+        assert not nothing_to_sync(ap.parse_args(args + extra))
+    assert not nothing_to_sync(ap.parse_args(("--root", str(root))))
+    # nor after an interrupted sync
+    (root / ".syncfs-journal.jsonl").write_text("")
+    assert not nothing_to_sync(ap.parse_args(args + ("--journal",)))
+    (root / ".syncfs-journal.jsonl").unlink()
+    # any change in the tree
+    (root / "noop-0.ttl").touch()
+    assert not nothing_to_sync(ap.parse_args(args))
+    main(*args)
+    assert nothing_to_sync(ap.parse_args(args))
+    (root / "noop-1.ttl").unlink()
+    assert not nothing_to_sync(ap.parse_args(args))
+    main(*args)
+    assert nothing_to_sync(ap.parse_args(args))
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+""" test_pipeline
+tests concerning the asyncio pipeline overlapping parsing and writing
+"""
+import threading
+import time
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.options import SyncOptions
+from syncfstriples.pipeline import AsyncPipeline
+from syncfstriples.service import perform_sync
+
+
+def parse_sample(n):
+    return make_sample_graph(range(n, n + 2))
+
+
+def test_pipeline_inflight():
+    log.info("test_pipeline_inflight")
+    pipeline = AsyncPipeline(workers=1, inflight=3)
+    lock = threading.Lock()
+    active, peak, done = [0], [0], list()
+
+    def slow_write(n):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return n
+
+    def handle(n, graph):
+        assert len(graph) == 2
+        pipeline.submit(lambda: slow_write(n), done.append)
+
+    started = time.monotonic()
+    pipeline.run(range(9), parse_sample, handle)
+    elapsed = time.monotonic() - started
+    assert sorted(done) == list(range(9))
+    assert peak[0] == 3
+    # the writes overlapped, so far less than 9 sequential ones
+    assert elapsed < 9 * 0.05
+
+
+def test_pipeline_error():
+    log.info("test_pipeline_error")
+    pipeline = AsyncPipeline(workers=1, inflight=2, concurrent_writes=False)
+    done = list()
+
+    def write(n):
+        if n == 3:
+            raise ValueError("failing write")
+        return n
+
+    def handle(n, graph):
+        pipeline.submit(lambda: write(n), done.append)
+
+    with pytest.raises(ValueError):
+        pipeline.run(range(50), parse_sample, handle)
+    assert 3 not in done
+    assert len(done) < 50
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_pipelined(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_pipelined ({len(syncfolders)})")
+    sparql = "select * where {?s ?p ?o .}"
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"piped-{n:02d}.ttl" for n in range(12)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        make_sample_graph(range(7)).serialize(
+            destination=str(syncpath / "piped.nt"), format="nt"
+        )
+        fnames.append("piped.nt")
+
+        perform_sync(
+            syncpath,
+            rdf_store,
+            options=SyncOptions(
+                pipeline=True, inflight=3, max_batch_graphs=5, chunk_size=3
+            ),
+        )
+        assert set(rdf_store.keys) == set(fnames)
+        for fname in fnames:
+            result = rdf_store.select(
+                sparql, named_graph=nmapper.key_to_ng(fname)
+            )
+            assert len(result) == (7 if fname == "piped.nt" else 3)
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
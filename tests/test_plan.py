@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+""" test_plan
+tests concerning the sync plan (dry-run) and its execution
+"""
+import os
+from pathlib import Path
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.__main__ import main
+from syncfstriples.options import SyncOptions
+from syncfstriples.plan import TooManyRemovals, estimate_triples
+from syncfstriples.service import (
+    execute_plan,
+    perform_sync,
+    plan_sync,
+    sync_paths,
+)
+from syncfstriples.state import SyncStateIndex
+
+
+def test_estimate_triples():
+    log.info("test_estimate_triples")
+    plain = estimate_triples(Path("dump.nt"), 110000, "nt")
+    assert plain == 1000
+    # compressed dumps hold more than their size shows
+    assert estimate_triples(Path("dump.nt.gz"), 110000, "nt") > plain
+    assert estimate_triples(Path("dump.ttl"), 0, "turtle") == 0
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_plan_and_execute(rdf_stores, syncfolders):
+    log.info(f"test_plan_and_execute ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"plan-{n:02d}.ttl" for n in range(3)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 5))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+
+        state_path = SyncStateIndex.default_path(syncpath)
+        with SyncStateIndex(state_path) as state:
+            plan = plan_sync(syncpath, rdf_store, state=state)
+            # planning does not touch the store
+            assert not set(rdf_store.keys) & set(fnames)
+            summary = plan.summary()
+            assert summary["additions"]["files"] == len(fnames)
+            assert summary["additions"]["bytes"] == sum(
+                (syncpath / fname).stat().st_size for fname in fnames
+            )
+            assert summary["additions"]["triples"] > 0
+            assert not plan.is_empty
+            assert "additions" in str(plan)
+
+            execute_plan(plan, rdf_store, state=state)
+            assert set(state.entries) == set(fnames)
+        assert set(rdf_store.keys) == set(fnames)
+
+        # nothing left to do
+        with SyncStateIndex(state_path) as state:
+            plan = plan_sync(syncpath, rdf_store, state=state)
+        assert plan.is_empty
+        assert sorted(plan.skipped) == fnames
+
+        # updates and removals get planned, and executed as planned
+        stat = (syncpath / fnames[0]).stat()
+        os.utime(syncpath / fnames[0], (stat.st_atime, stat.st_mtime + 3600))
+        (syncpath / fnames[-1]).unlink()
+        with SyncStateIndex(state_path) as state:
+            plan = plan_sync(syncpath, rdf_store, state=state)
+            assert plan.updates == [syncpath / fnames[0]]
+            assert plan.removals == [fnames[-1]]
+            assert plan.summary()["removals"]["files"] == 1
+            assert fnames[-1] in set(rdf_store.keys)
+            execute_plan(plan, rdf_store, state=state)
+            assert set(state.entries) == set(fnames[:-1])
+        assert set(rdf_store.keys) == set(fnames[:-1])
+
+
+def test_main_dry_run(tmp_path, capsys):
+    log.info("test_main_dry_run")
+    g = make_sample_graph(range(4))
+    g.serialize(destination=str(tmp_path / "dry.ttl"), format="turtle")
+    main("--root", str(tmp_path), "--dry-run")
+    out = capsys.readouterr().out
+    assert "sync plan for" in out
+    assert "additions" in out
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_max_removal_pct(rdf_stores, syncfolders):
+    log.info(f"test_max_removal_pct ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"keep-{n:02d}.ttl" for n in range(4)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 2))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        perform_sync(
+            syncpath, rdf_store, options=SyncOptions(max_removal_pct=50)
+        )
+
+        # as if the volume got unmounted
+        for fname in fnames[:3]:
+            (syncpath / fname).unlink()
+        with pytest.raises(TooManyRemovals):
+            perform_sync(
+                syncpath, rdf_store, options=SyncOptions(max_removal_pct=50)
+            )
+        with pytest.raises(TooManyRemovals):
+            sync_paths(
+                syncpath,
+                rdf_store,
+                [syncpath / fname for fname in fnames[:3]],
+                set(rdf_store.keys),
+                options=SyncOptions(max_removal_pct=50),
+            )
+        assert set(rdf_store.keys) == set(fnames)
+        # within the limit, or without one, the removals are done
+        perform_sync(
+            syncpath, rdf_store, options=SyncOptions(max_removal_pct=75)
+        )
+        assert set(rdf_store.keys) == {fnames[3]}
+        (syncpath / fnames[3]).unlink()
+        perform_sync(syncpath, rdf_store)
+        assert len(rdf_store.keys) == 0
+
+
+def test_main_force(tmp_path):
+    log.info("test_main_force")
+    state = str(tmp_path / "state.sqlite")
+    root = tmp_path / "root"
+    root.mkdir()
+    make_sample_graph(range(2)).serialize(
+        destination=str(root / "only.ttl"), format="turtle"
+    )
+    args = ("--root", str(root), "--state", state, "--max-removal-pct", "10")
+    main(*args)
+    (root / "only.ttl").unlink()
+    with pytest.raises(TooManyRemovals):
+        main(*args)
+    with SyncStateIndex(state) as index:
+        assert set(index.entries) == {"only.ttl"}
+    main(*args, "--force")
+    with SyncStateIndex(state) as index:
+        assert len(index.entries) == 0
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
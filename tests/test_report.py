@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+""" test_report
+tests concerning the timing and counters reported on a sync
+"""
+import json
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples import SyncFsTriples
+from syncfstriples.report import PHASES, SyncReport
+from syncfstriples.service import perform_sync
+
+
+def test_report_output(tmp_path):
+    log.info("test_report_output")
+    report = SyncReport()
+    with report.phase("parse", "some.ttl"):
+        pass
+    report.add_time("parse", 0.5, "some.ttl")
+    report.count("files_added")
+    report.count("triples", 7)
+    report.finish()
+    assert report.seconds["parse"] >= 0.5
+    assert report.file_seconds["some.ttl"] >= 0.5
+
+    json_path = tmp_path / "report.json"
+    report.write_json(json_path)
+    dumped = json.loads(json_path.read_text())
+    assert dumped["counters"]["files_added"] == 1
+    assert dumped["counters"]["triples"] == 7
+    assert set(dumped["seconds"]) == set(PHASES)
+    assert dumped["elapsed"] == report.elapsed
+
+    prom_path = tmp_path / "sync.prom"
+    report.write_prometheus(prom_path)
+    lines = prom_path.read_text().splitlines()
+    assert "syncfstriples_triples 7" in lines
+    assert any(
+        line.startswith('syncfstriples_phase_seconds{phase="parse"} ')
+        for line in lines
+    )
+    # no temporary files left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "report.json",
+        "sync.prom",
+    ]
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_sync_report(rdf_stores, syncfolders):
+    log.info(f"test_sync_report ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"report-{n:02d}.ttl" for n in range(3)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 4))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, report=report)
+        counters = report.counters
+        assert counters["files_scanned"] == len(fnames)
+        assert counters["files_added"] == len(fnames)
+        assert counters["triples"] == sum(
+            len(make_sample_graph(range(4))) for _ in fnames
+        )
+        assert counters["bytes"] == sum(
+            (syncpath / fname).stat().st_size for fname in fnames
+        )
+        assert counters["requests"] >= 1
+        assert set(report.file_seconds) == set(fnames)
+
+        (syncpath / fnames[0]).unlink()
+        report = SyncReport()
+        perform_sync(syncpath, rdf_store, report=report)
+        assert report.counters["files_removed"] == 1
+        assert report.counters["files_skipped"] == len(fnames) - 1
+        assert report.counters["files_added"] == 0
+
+
+def test_service_report(tmp_path):
+    log.info("test_service_report")
+    root = tmp_path / "root"
+    root.mkdir()
+    g = make_sample_graph(range(3))
+    g.serialize(destination=str(root / "one.ttl"), format="turtle")
+    sft = SyncFsTriples(
+        str(root),
+        report_path=str(tmp_path / "report.json"),
+        metrics_path=str(tmp_path / "sync.prom"),
+    )
+    report = sft.process()
+    assert report.counters["files_added"] == 1
+    dumped = json.loads((tmp_path / "report.json").read_text())
+    assert dumped["counters"]["files_added"] == 1
+    assert "syncfstriples_files_added 1" in (
+        (tmp_path / "sync.prom").read_text().splitlines()
+    )
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
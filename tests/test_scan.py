@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+""" test_scan
+tests concerning the listing of the files to sync
+"""
+from pathlib import Path
+
+import pytest
+from util4tests import log, run_single_test
+
+from syncfstriples.scan import Shard, TreeScanner, matches_any
+from syncfstriples.service import get_stat_by_fname, make_scanner
+
+TREE = [
+    "top.ttl",
+    "top.txt",
+    ".git/objects/hidden.ttl",
+    "data/raw/big.ttl",
+    "data/raw/skip.ttl.bak",
+    "data/clean/one.jsonld",
+    "data/clean/two.ttl",
+    "assets/logo.png",
+]
+
+
+def relnames(root: Path, stat_by_fname: dict) -> set:
+    return {
+        Path(fname).relative_to(root).as_posix() for fname in stat_by_fname
+    }
+
+
+@pytest.fixture()
+def tree(syncfolders) -> Path:
+    root = syncfolders[0]
+    for relname in TREE:
+        fpath = root / relname
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        fpath.write_text(relname)
+    return root
+
+
+def test_matches_any():
+    log.info("test_matches_any")
+    assert matches_any("data/raw/big.ttl", ["*.ttl"])
+    assert matches_any("data/raw/big.ttl", ["data/raw/*"])
+    assert not matches_any("data/raw/big.ttl", ["raw/*"])
+    assert matches_any("data/raw", ["raw"])
+    assert not matches_any("data/raw", [])
+
+
+def test_scan_defaults(tree: Path):
+    log.info("test_scan_defaults")
+    found = get_stat_by_fname(tree)
+    assert relnames(tree, found) == {
+        "top.ttl",
+        "data/raw/big.ttl",
+        "data/clean/one.jsonld",
+        "data/clean/two.ttl",
+    }
+    for fname, stat in found.items():
+        assert stat.st_size == Path(fname).stat().st_size
+
+
+def test_scan_include_exclude(tree: Path):
+    log.info("test_scan_include_exclude")
+    scanner = make_scanner(include=["data/*"], exclude=[".git", "raw"])
+    found = get_stat_by_fname(tree, scanner)
+    assert relnames(tree, found) == {
+        "data/clean/one.jsonld",
+        "data/clean/two.ttl",
+    }
+    assert not scanner.accepts_path("data/raw/big.ttl")
+    assert not scanner.accepts_path("data/raw", is_dir=True)
+    assert scanner.accepts_path("data/clean", is_dir=True)
+    assert scanner.accepts_path("data/clean/two.ttl")
+    # scanning from a nested top keeps the patterns relative to the root
+    found = scanner.scan(tree, top=tree / "data" / "clean")
+    assert relnames(tree, found) == {
+        "data/clean/one.jsonld",
+        "data/clean/two.ttl",
+    }
+
+
+def test_scan_without_accept(tree: Path):
+    log.info("test_scan_without_accept")
+    found = TreeScanner(exclude=None).scan(tree)
+    assert relnames(tree, found) == set(TREE)
+
+
+def test_scan_shards(tree: Path):
+    log.info("test_scan_shards")
+    shard = Shard.parse("1/3")
+    assert shard == Shard(1, 3) and str(shard) == "1/3"
+    for spec in ("3/3", "-1/3", "1/0"):
+        with pytest.raises(AssertionError):
+            Shard.parse(spec)
+    # each path is owned by exactly one shard, the same every time
+    paths = [f"data/part-{n}/file-{n}.ttl" for n in range(300)]
+    owners = [[s for s in range(3) if Shard(s, 3).owns(p)] for p in paths]
+    assert all(len(owned) == 1 for owned in owners)
+    assert all(sum(o == [s] for o in owners) > 50 for s in range(3))
+
+    # together the shards scan the complete tree, without overlap
+    found = [
+        relnames(tree, make_scanner(shard=Shard(s, 2)).scan(tree))
+        for s in range(2)
+    ]
+    assert not found[0] & found[1]
+    assert found[0] | found[1] == relnames(tree, get_stat_by_fname(tree))
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+""" test_session
+tests concerning the pooled http session and the isolation of failures
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.report import SyncReport
+from syncfstriples.service import perform_sync
+from syncfstriples.session import HttpSession
+from syncfstriples.state import SyncStateIndex
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """answers with the statuses queued on its server (then 200), over
+    keep-alive connections, recording the client port of each request
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _answer(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.ports.append(self.client_address[1])
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        payload = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def flaky_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    server.statuses = list()
+    server.ports = list()
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_keep_alive(flaky_server):
+    log.info("test_session_keep_alive")
+    url = "http://127.0.0.1:%d/sparql" % flaky_server.server_address[1]
+    session = HttpSession(pool_size=2)
+    for _ in range(5):
+        assert session.request("POST", url, body=b"q=1") == b"ok"
+    # all requests went over the one kept-alive connection
+    assert len(flaky_server.ports) == 5
+    assert len(set(flaky_server.ports)) == 1
+    session.close()
+
+
+def test_session_retries(flaky_server):
+    log.info("test_session_retries")
+    url = "http://127.0.0.1:%d/sparql" % flaky_server.server_address[1]
+    session = HttpSession(retries=2, backoff=0.01)
+
+    # transient errors on idempotent requests are retried
+    flaky_server.statuses = [503, 502]
+    assert session.request("POST", url, body=b"q=1") == b"ok"
+    assert len(flaky_server.ports) == 3
+
+    # but only so many times
+    flaky_server.statuses = [503, 503, 503]
+    with pytest.raises(HTTPError) as error:
+        session.request("POST", url, body=b"q=1")
+    assert error.value.code == 503
+
+    # non-idempotent requests nor other errors are retried
+    flaky_server.ports.clear()
+    flaky_server.statuses = [503]
+    with pytest.raises(HTTPError):
+        session.request("POST", url, body=b"q=1", idempotent=False)
+    flaky_server.statuses = [400]
+    with pytest.raises(HTTPError):
+        session.request("POST", url, body=b"q=1")
+    assert len(flaky_server.ports) == 2
+    session.close()
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_sync_isolates_failures(rdf_stores, syncfolders):
+    log.info(f"test_sync_isolates_failures ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"fine-{n:02d}.ttl" for n in range(3)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+        (syncpath / "broken.ttl").write_text("<not> <valid turtle")
+
+        report = SyncReport()
+        state_path = SyncStateIndex.default_path(syncpath)
+        with SyncStateIndex(state_path) as state:
+            perform_sync(syncpath, rdf_store, state=state, report=report)
+            # the broken file is not recorded, so retried the next time
+            assert set(state.entries) == set(fnames)
+        assert set(rdf_store.keys) == set(fnames)
+        assert report.counters["files_failed"] == 1
+        assert report.counters["files_added"] == len(fnames)
+
+        # once fixed it gets synced
+        make_sample_graph(range(100, 102)).serialize(
+            destination=str(syncpath / "broken.ttl"), format="turtle"
+        )
+        with SyncStateIndex(state_path) as state:
+            perform_sync(syncpath, rdf_store, state=state)
+        assert set(rdf_store.keys) == set(fnames) | {"broken.ttl"}
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
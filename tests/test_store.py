@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+""" test_store
+tests concerning the use of (optional) bulk store capabilities
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from conftest import make_sample_graph
+from pyrdfstore.store import GraphNameMapper, MemoryRDFStore
+from util4tests import log, run_single_test
+
+from syncfstriples.service import perform_sync
+from syncfstriples.store import lastmod_of_key, parse_xsd_datetime
+
+
+class BulkMemoryRDFStore(MemoryRDFStore):
+    """memory store offering the bulk lastmod lookup"""
+
+    def __init__(self, *, mapper: GraphNameMapper = None):
+        super().__init__(mapper=mapper)
+        self.bulk_lookups = 0
+
+    def lastmod_by_key(self, keys):
+        self.bulk_lookups += 1
+        return {key: lastmod_of_key(self, key) for key in keys}
+
+    def verify_max_age_of_key(self, *args, **kwargs):
+        raise AssertionError("store should not be questioned per key")
+
+
+class ReplacingMemoryRDFStore(MemoryRDFStore):
+    """memory store offering the single-request replace"""
+
+    def __init__(self, *, mapper: GraphNameMapper = None):
+        super().__init__(mapper=mapper)
+        self.replaced = list()
+
+    def replace_graph_for_key(self, graph, key):
+        self.replaced.append(key)
+        MemoryRDFStore.drop_graph_for_key(self, key)
+        self.insert_for_key(graph, key)
+
+    def drop_graph_for_key(self, key):
+        raise AssertionError("updates should not drop the graph separately")
+
+
+def test_parse_xsd_datetime():
+    log.info("test_parse_xsd_datetime")
+    utc = timezone.utc
+    expected = datetime(2024, 3, 3, 12, 30, 15, tzinfo=utc)
+    assert parse_xsd_datetime("2024-03-03T12:30:15Z") == expected
+    assert parse_xsd_datetime("2024-03-03T12:30:15") == expected
+    assert parse_xsd_datetime("2024-03-03T13:30:15+01:00") == expected
+    later = parse_xsd_datetime("2024-03-03T12:30:15.5Z")
+    assert later - expected == timedelta(milliseconds=500)
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_bulk_lastmod_lookup(nmapper, syncfolders):
+    log.info("test_bulk_lastmod_lookup")
+    syncpath = syncfolders[0]
+    rdf_store = BulkMemoryRDFStore(mapper=nmapper)
+    fnames = [f"bulk-{n:02d}.ttl" for n in range(4)]
+    for n, fname in enumerate(fnames):
+        g = make_sample_graph(range(n * 10, n * 10 + 3))
+        g.serialize(destination=str(syncpath / fname), format="turtle")
+
+    perform_sync(syncpath, rdf_store)
+    assert set(rdf_store.keys) == set(fnames)
+    lastmods = {key: lastmod_of_key(rdf_store, key) for key in fnames}
+
+    # a resync decides on all files with a single lookup
+    rdf_store.bulk_lookups = 0
+    perform_sync(syncpath, rdf_store)
+    assert rdf_store.bulk_lookups == 1
+    assert lastmods == {key: lastmod_of_key(rdf_store, key) for key in fnames}
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_replace_on_update(nmapper, syncfolders):
+    log.info("test_replace_on_update")
+    syncpath = syncfolders[0]
+    rdf_store = ReplacingMemoryRDFStore(mapper=nmapper)
+    fpath = syncpath / "replaced.ttl"
+    make_sample_graph(range(5)).serialize(
+        destination=str(fpath), format="turtle"
+    )
+    perform_sync(syncpath, rdf_store)
+    assert rdf_store.replaced == []
+
+    make_sample_graph(range(2)).serialize(
+        destination=str(fpath), format="turtle"
+    )
+    stat = fpath.stat()
+    os.utime(fpath, (stat.st_atime, stat.st_mtime + 3600))
+    perform_sync(syncpath, rdf_store)
+    assert rdf_store.replaced == ["replaced.ttl"]
+    result = rdf_store.select(
+        "select * where {?s ?p ?o .}",
+        named_graph=nmapper.key_to_ng("replaced.ttl"),
+    )
+    assert len(result) == 2
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
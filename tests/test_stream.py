@@ -0,0 +1,127 @@
+#! /usr/bin/env python
+""" test_stream
+tests concerning the chunked ingestion of n-triples and n-quads dumps
+"""
+import gzip
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import is_streamable, perform_sync
+from syncfstriples.stream import iter_graph_chunks, iter_line_spans, parse_span
+
+
+@pytest.mark.usefixtures("syncfolders")
+def test_iter_graph_chunks(syncfolders):
+    log.info("test_iter_graph_chunks")
+    fpath = syncfolders[0] / "chunked.nt"
+    g = make_sample_graph(range(10), bnode_subjects=True)
+    g.serialize(destination=str(fpath), format="nt")
+
+    chunks = list(iter_graph_chunks(fpath, "nt", chunk_size=3))
+    assert len(chunks) == 4
+    assert all(len(chunk) <= 3 for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == len(g)
+    # blank nodes keep their identity across the chunks
+    subjects = {s for chunk in chunks for s, _, _ in chunk}
+    assert len(subjects) == len({s for s, _, _ in g})
+
+
+@pytest.mark.usefixtures("syncfolders")
+def test_iter_line_spans(syncfolders):
+    log.info("test_iter_line_spans")
+    fpath = syncfolders[0] / "spanned.nt"
+    g = make_sample_graph(range(30), bnode_subjects=True)
+    g.serialize(destination=str(fpath), format="nt")
+    content = fpath.read_bytes()
+
+    spans = list(iter_line_spans(fpath, "nt", chunk_size=5))
+    assert len(spans) > 1
+    # the spans cover the file, split on line boundaries
+    assert spans[0][0] == 0 and spans[-1][1] == len(content)
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end == start and content[end - 1 : end] == b"\n"
+
+    chunks = [parse_span(fpath, "nt", "scope", span) for span in spans]
+    assert sum(len(chunk) for chunk in chunks) == len(g)
+    # blank nodes parsed apart keep their identity across the chunks
+    subjects = {s for chunk in chunks for s, _, _ in chunk}
+    assert len(subjects) == len({s for s, _, _ in g})
+
+    (fpath.parent / "empty.nt").write_text("")
+    assert list(iter_line_spans(fpath.parent / "empty.nt", "nt", 5)) == []
+
+
+def test_is_streamable(tmp_path):
+    log.info("test_is_streamable")
+    g = make_sample_graph(range(10))
+    g.serialize(destination=str(tmp_path / "small.nt"), format="nt")
+    g.serialize(destination=str(tmp_path / "small.ttl"), format="turtle")
+    # only n-triples (and n-quads) files larger than a chunk are streamed
+    assert is_streamable(tmp_path / "small.nt", chunk_size=4)
+    assert not is_streamable(tmp_path / "small.nt", chunk_size=100)
+    assert not is_streamable(tmp_path / "small.nt", chunk_size=0)
+    assert not is_streamable(tmp_path / "small.ttl", chunk_size=4)
+    assert not is_streamable(tmp_path / "gone.nt", chunk_size=4)
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_streamed(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_streamed ({len(syncfolders)})")
+    sparql = "select * where {?s ?p ?o .}"
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        g = make_sample_graph(range(10))
+        g.serialize(destination=str(syncpath / "big.nt"), format="nt")
+        with open(syncpath / "big.nq", "w") as nq:
+            for triple in g:
+                terms = " ".join(term.n3() for term in triple)
+                nq.write(f"{terms} <urn:test:quads> .\n")
+
+        inserts = list()
+        insert_for_key = rdf_store.insert_for_key
+
+        def counting_insert(graph, key):
+            inserts.append((key, len(graph)))
+            insert_for_key(graph, key)
+
+        rdf_store.insert_for_key = counting_insert
+        perform_sync(syncpath, rdf_store, options=SyncOptions(chunk_size=4))
+        rdf_store.insert_for_key = insert_for_key
+
+        assert set(rdf_store.keys) == {"big.nt", "big.nq"}
+        for key in ("big.nt", "big.nq"):
+            sizes = [size for k, size in inserts if k == key]
+            assert sizes and max(sizes) <= 4
+            assert sum(sizes) == len(g)
+            result = rdf_store.select(
+                sparql, named_graph=nmapper.key_to_ng(key)
+            )
+            assert len(result) == len(g)
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_streamed_parallel(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_streamed_parallel ({len(syncfolders)})")
+    sparql = "select distinct ?s where {?s ?p ?o .}"
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        g = make_sample_graph(range(40), bnode_subjects=True)
+        g.serialize(destination=str(syncpath / "huge.nt"), format="nt")
+        with gzip.open(syncpath / "huge.nt.gz", "wb") as gz:
+            gz.write(g.serialize(format="nt", encoding="utf-8"))
+
+        perform_sync(
+            syncpath, rdf_store, options=SyncOptions(chunk_size=4, workers=2)
+        )
+        assert {"huge.nt", "huge.nt.gz"} <= set(rdf_store.keys)
+        subjects = {s for s, _, _ in g}
+        for key in ("huge.nt", "huge.nt.gz"):
+            result = rdf_store.select(
+                sparql, named_graph=nmapper.key_to_ng(key)
+            )
+            assert len(result) == len(subjects)
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
@@ -8,11 +8,15 @@ import pytest
 from conftest import make_sample_graph
 from util4tests import log, run_single_test
 
+from syncfstriples.options import SyncOptions
+from syncfstriples.scan import Shard
 from syncfstriples.service import (
     format_from_filepath,
+    make_scanner,
     perform_sync,
     relative_pathname,
 )
+from syncfstriples.state import SyncStateIndex
 
 
 @pytest.mark.usefixtures("base", "nmapper", "rdf_stores", "syncfolders")
@@ -127,5 +131,68 @@ def test_perform_sync(base, nmapper, rdf_stores, syncfolders):
         assert rdf_store.lastmod_ts(first_ng) > first_store_lastmod
 
 
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_perform_sync_parallel(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_perform_sync_parallel ({len(syncfolders)})")
+    num = 6
+    graphsize = 5
+    sparql = "select * where {?s ?p ?o .}"
+
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        relfpaths = list()
+        for n in range(num):
+            fpath = syncpath / f"par-{n:02d}.ttl"
+            g = make_sample_graph(range(n * 10, n * 10 + graphsize))
+            g.serialize(destination=str(fpath), format="turtle")
+            relfpaths.append(relative_pathname(fpath, syncpath))
+
+        perform_sync(syncpath, rdf_store, options=SyncOptions(workers=2))
+        assert set(rdf_store.keys) == set(relfpaths)
+        for fname in relfpaths:
+            ng = nmapper.key_to_ng(fname)
+            result = rdf_store.select(sparql, named_graph=ng)
+            assert len(result) == graphsize
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_perform_sync_sharded(rdf_stores, syncfolders):
+    log.info(f"test_perform_sync_sharded ({len(syncfolders)})")
+    shards = [Shard(n, 3) for n in range(3)]
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"shard-{n:02d}.ttl" for n in range(30)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n, n + 2))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+
+        def sync_shard(shard):
+            state_path = SyncStateIndex.default_path(syncpath, shard)
+            with SyncStateIndex(state_path) as state:
+                perform_sync(
+                    syncpath,
+                    rdf_store,
+                    state=state,
+                    scanner=make_scanner(shard=shard),
+                )
+
+        # each shard adds its own part, leaving the others alone
+        owned = {s: {f for f in fnames if s.owns(f)} for s in shards}
+        sync_shard(shards[0])
+        assert set(rdf_store.keys) == owned[shards[0]]
+        for shard in shards[1:]:
+            sync_shard(shard)
+        assert set(rdf_store.keys) == set(fnames)
+
+        # removals are only done by the owning shard
+        removed = {sorted(owned[s])[0] for s in shards}
+        for fname in removed:
+            (syncpath / fname).unlink()
+        sync_shard(shards[1])
+        gone = removed & owned[shards[1]]
+        assert set(rdf_store.keys) == set(fnames) - gone
+        for shard in shards:
+            sync_shard(shard)
+        assert set(rdf_store.keys) == set(fnames) - removed
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
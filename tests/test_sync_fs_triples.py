@@ -5,7 +5,7 @@ tests concerning the service wrapper for sembench "SyncFsTriples"
 import shutil
 
 import pytest
-from conftest import TEST_INPUT_FOLDER
+from conftest import TEST_INPUT_FOLDER, make_sample_graph
 from util4tests import log, run_single_test
 
 from syncfstriples import SyncFsTriples
@@ -44,5 +44,49 @@ def test_service_wrapper(store_builds, syncfolders):
         assert len(ng_set) == len(file_set)
 
 
+@pytest.mark.usefixtures("store_builds", "syncfolders")
+def test_process_listed_paths(store_builds, syncfolders):
+    log.info(f"test_process_listed_paths ({len(store_builds)})")
+    base = "urn:sync:via-listed:"
+
+    def write(fpath, n):
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        g = make_sample_graph(range(n, n + 2))
+        g.serialize(destination=str(fpath), format="turtle")
+
+    for store_build, syncpath in zip(store_builds, syncfolders):
+        for state in (False, True):
+            root = syncpath / f"state-{state}"
+            root.mkdir()
+            sft = SyncFsTriples(
+                str(root), base, *store_build.store_info, state=state
+            )
+            write(root / "one.ttl", 1)
+            write(root / "sub" / "two.ttl", 2)
+            write(root / "unlisted.ttl", 3)
+            report = sft.process(paths=["one.ttl", "sub/two.ttl"])
+            assert report.counters["files_added"] == 2
+            keys = set(sft.rdfstore.keys)
+            assert {"one.ttl", "sub/two.ttl"} <= keys
+            assert "unlisted.ttl" not in keys
+
+            # listed files are updated or removed, the others left alone
+            write(root / "one.ttl", 4)
+            (root / "sub" / "two.ttl").unlink()
+            report = sft.process(paths=["one.ttl", "./sub/two.ttl"])
+            assert report.counters["files_updated"] == 1
+            assert report.counters["files_removed"] == 1
+            keys = set(sft.rdfstore.keys)
+            assert "one.ttl" in keys
+            assert "sub/two.ttl" not in keys
+            assert "unlisted.ttl" not in keys
+
+            with pytest.raises(AssertionError):
+                sft.process(paths=["../outside.ttl"])
+            # a full sync catches up with the unlisted
+            sft.process()
+            assert "unlisted.ttl" in set(sft.rdfstore.keys)
+
+
 if __name__ == "__main__":
     run_single_test(__file__)
@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+""" test_sync_state
+tests concerning the local sync-state index
+"""
+import os
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples.options import SyncOptions
+from syncfstriples.service import perform_sync
+from syncfstriples.state import SyncStateIndex, content_hash
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_with_state(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_with_state ({len(syncfolders)})")
+
+    def no_store_questions(*args, **kwargs):
+        raise AssertionError("store should not be questioned per file")
+
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fnames = [f"state-{n:02d}.ttl" for n in range(3)]
+        for n, fname in enumerate(fnames):
+            g = make_sample_graph(range(n * 10, n * 10 + 3))
+            g.serialize(destination=str(syncpath / fname), format="turtle")
+
+        state_path = SyncStateIndex.default_path(syncpath)
+        with SyncStateIndex(state_path) as state:
+            assert not state.reconciled
+            perform_sync(syncpath, rdf_store, state=state)
+            assert state.reconciled
+            assert set(state.entries) == set(fnames)
+        assert set(rdf_store.keys) == set(fnames)
+
+        # unchanged files are decided upon without the store
+        rdf_store.verify_max_age_of_key = no_store_questions
+        first_ng = nmapper.key_to_ng(fnames[0])
+        first_lastmod = rdf_store.lastmod_ts(first_ng)
+        with SyncStateIndex(state_path) as state:
+            perform_sync(syncpath, rdf_store, state=state)
+        assert rdf_store.lastmod_ts(first_ng) == first_lastmod
+
+        # changed and removed files are picked up from the index too
+        stat = (syncpath / fnames[0]).stat()
+        os.utime(syncpath / fnames[0], (stat.st_atime, stat.st_mtime + 3600))
+        (syncpath / fnames[-1]).unlink()
+        with SyncStateIndex(state_path) as state:
+            perform_sync(syncpath, rdf_store, state=state)
+            assert set(state.entries) == set(fnames[:-1])
+        assert set(rdf_store.keys) == set(fnames[:-1])
+        assert rdf_store.lastmod_ts(first_ng) > first_lastmod
+
+        # edits with an mtime before the last sync are not lost either
+        second_ng = nmapper.key_to_ng(fnames[1])
+        second_lastmod = rdf_store.lastmod_ts(second_ng)
+        stat = (syncpath / fnames[1]).stat()
+        g = make_sample_graph(range(10, 14))
+        g.serialize(destination=str(syncpath / fnames[1]), format="turtle")
+        os.utime(syncpath / fnames[1], (stat.st_atime, stat.st_mtime - 3600))
+        with SyncStateIndex(state_path) as state:
+            perform_sync(syncpath, rdf_store, state=state)
+        assert rdf_store.lastmod_ts(second_ng) > second_lastmod
+
+        # reconcile rebuilds the index from the store
+        with SyncStateIndex(state_path) as state:
+            state.forget(fnames[1])
+            perform_sync(syncpath, rdf_store, state=state, reconcile=True)
+            assert set(state.entries) == set(fnames[:-1])
+
+
+@pytest.mark.usefixtures("nmapper", "rdf_stores", "syncfolders")
+def test_sync_with_hash_detection(nmapper, rdf_stores, syncfolders):
+    log.info(f"test_sync_with_hash_detection ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        fpath = syncpath / "hashed.ttl"
+        g = make_sample_graph(range(3))
+        g.serialize(destination=str(fpath), format="turtle")
+        ng = nmapper.key_to_ng("hashed.ttl")
+
+        state_path = SyncStateIndex.default_path(syncpath)
+        with SyncStateIndex(state_path) as state:
+            perform_sync(
+                syncpath,
+                rdf_store,
+                state=state,
+                options=SyncOptions(change_detection="hash"),
+            )
+            assert state.get("hashed.ttl").hash is not None
+        first_lastmod = rdf_store.lastmod_ts(ng)
+
+        # a touched file with the same content is not reloaded
+        stat = fpath.stat()
+        os.utime(fpath, (stat.st_atime, stat.st_mtime + 3600))
+        with SyncStateIndex(state_path) as state:
+            perform_sync(
+                syncpath,
+                rdf_store,
+                state=state,
+                options=SyncOptions(change_detection="hash"),
+            )
+            assert state.get("hashed.ttl").mtime == stat.st_mtime + 3600
+        assert rdf_store.lastmod_ts(ng) == first_lastmod
+
+        # while changed content is, even if the mtime went back
+        g = make_sample_graph(range(4))
+        g.serialize(destination=str(fpath), format="turtle")
+        os.utime(fpath, (stat.st_atime, stat.st_mtime - 3600))
+        with SyncStateIndex(state_path) as state:
+            perform_sync(
+                syncpath,
+                rdf_store,
+                state=state,
+                options=SyncOptions(change_detection="hash"),
+            )
+        assert rdf_store.lastmod_ts(ng) > first_lastmod
+
+        # and so is content that only changed in size
+        stat = fpath.stat()
+        g = make_sample_graph(range(5))
+        g.serialize(destination=str(fpath), format="turtle")
+        os.utime(fpath, (stat.st_atime, stat.st_mtime))
+        with SyncStateIndex(state_path) as state:
+            perform_sync(
+                syncpath,
+                rdf_store,
+                state=state,
+                options=SyncOptions(change_detection="hash"),
+            )
+            assert state.get("hashed.ttl").hash == content_hash(fpath)
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
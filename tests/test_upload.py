@@ -0,0 +1,196 @@
+#! /usr/bin/env python
+""" test_upload
+tests concerning the passthrough upload of files as-is
+"""
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from conftest import make_sample_graph
+from pyrdfstore.store import GraphNameMapper, MemoryRDFStore
+from util4tests import log, run_single_test
+
+import syncfstriples.service
+from syncfstriples.options import SyncOptions
+from syncfstriples.report import SyncReport
+from syncfstriples.service import format_from_filepath, perform_sync
+from syncfstriples.state import SyncStateIndex
+from syncfstriples.store import SyncURIRDFStore
+from syncfstriples.upload import precheck_dump
+
+
+class UploadingMemoryRDFStore(MemoryRDFStore):
+    """memory store accepting files as-is (parsing them itself)"""
+
+    def __init__(self, *, mapper: GraphNameMapper = None):
+        super().__init__(mapper=mapper)
+        self.uploads = list()
+
+    def upload_file_for_key(self, fpath, content_type, key, replace=True):
+        self.uploads.append((key, content_type, replace))
+        g = syncfstriples.service.parse_graph(
+            format_from_filepath(fpath), location=fpath
+        )
+        if replace:
+            self.drop_graph_for_key(key)
+        self.insert_for_key(g, key)
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """records the requests it gets in the requests list of its server"""
+
+    def _body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if not size:
+                    return body
+                body += chunk
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _record(self):
+        self.server.requests.append(
+            (self.command, self.path, dict(self.headers), self._body())
+        )
+        self.send_response(204)
+        self.end_headers()
+
+    do_PUT = do_POST = _record
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def recording_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    server.requests = list()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.usefixtures("syncfolders")
+def test_precheck(syncfolders):
+    log.info("test_precheck")
+    syncpath = syncfolders[0]
+    good = syncpath / "good.nt"
+    make_sample_graph(range(3)).serialize(destination=str(good), format="nt")
+    precheck_dump(good, "nt")
+
+    bad = syncpath / "bad.nt"
+    bad.write_text("<urn:a> <urn:b> <urn:c> .\nthis is no triple\n")
+    with pytest.raises(ValueError):
+        precheck_dump(bad, "nt")
+
+    bad_json = syncpath / "bad.jsonld"
+    bad_json.write_text('{"@id": "urn:a", ')
+    with pytest.raises(ValueError):
+        precheck_dump(bad_json, "json-ld")
+
+    bad_utf8 = syncpath / "bad.ttl"
+    bad_utf8.write_bytes(b"<urn:a> <urn:b> '\xff\xfe' .")
+    with pytest.raises(ValueError):
+        precheck_dump(bad_utf8, "turtle")
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_sync_passthrough(nmapper, syncfolders, monkeypatch):
+    log.info("test_sync_passthrough")
+    syncpath = syncfolders[0]
+    rdf_store = UploadingMemoryRDFStore(mapper=nmapper)
+    g = make_sample_graph(range(4))
+    fnames = ["up.ttl", "up.nt", "up.jsonld"]
+    for fname in fnames:
+        g.serialize(
+            destination=str(syncpath / fname),
+            format=format_from_filepath(fname),
+        )
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("passthrough files should not be parsed")
+
+    monkeypatch.setattr(syncfstriples.service, "load_graph_fpath", no_parsing)
+    perform_sync(
+        syncpath,
+        rdf_store,
+        options=SyncOptions(upload="passthrough", precheck=True),
+    )
+    assert set(rdf_store.keys) == set(fnames)
+    assert {key for key, _, _ in rdf_store.uploads} == set(fnames)
+    assert all(not replace for _, _, replace in rdf_store.uploads)
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_upload_request(nmapper, syncfolders, recording_server):
+    log.info("test_upload_request")
+    syncpath = syncfolders[0]
+    host, port = recording_server.server_address
+    uri = f"http://{host}:{port}"
+    rdf_store = SyncURIRDFStore(
+        f"{uri}/query", f"{uri}/update", mapper=nmapper, gsp_uri=f"{uri}/gsp"
+    )
+    data = make_sample_graph(range(3)).serialize(
+        format="turtle", encoding="utf-8"
+    )
+    (syncpath / "put.ttl").write_bytes(data)
+    (syncpath / "put.ttl.gz").write_bytes(gzip.compress(data))
+
+    for fname in ("put.ttl", "put.ttl.gz"):
+        recording_server.requests.clear()
+        rdf_store.upload_file_for_key(
+            str(syncpath / fname), "text/turtle", fname
+        )
+        (method, path, headers, body), registry = recording_server.requests
+        assert method == "PUT"
+        url = urlparse(path)
+        assert url.path == "/gsp"
+        assert parse_qs(url.query)["graph"] == [nmapper.key_to_ng(fname)]
+        assert headers["Content-Type"] == "text/turtle"
+        assert body == data
+        assert registry[0] == "POST" and registry[1] == "/update"
+
+
+@pytest.mark.usefixtures("nmapper", "syncfolders")
+def test_upload_registry_failure(nmapper, syncfolders, recording_server):
+    log.info("test_upload_registry_failure")
+    syncpath = syncfolders[0]
+    host, port = recording_server.server_address
+    uri = f"http://{host}:{port}"
+    rdf_store = SyncURIRDFStore(
+        f"{uri}/query", f"{uri}/update", mapper=nmapper, gsp_uri=f"{uri}/gsp"
+    )
+    make_sample_graph(range(3)).serialize(
+        destination=str(syncpath / "up.nt"), format="nt"
+    )
+
+    def failing_registry(graph, key):
+        raise ConnectionError("registry unavailable")
+
+    # the lastmod is recorded through the store's own insert
+    rdf_store.insert_for_key = failing_registry
+    report = SyncReport()
+    with SyncStateIndex(SyncStateIndex.default_path(syncpath)) as state:
+        state.reconcile(dict())
+        perform_sync(
+            syncpath,
+            rdf_store,
+            options=SyncOptions(upload="passthrough"),
+            state=state,
+            report=report,
+        )
+        # uploaded, but without its lastmod: to be uploaded again
+        ((method, path, _, _),) = recording_server.requests
+        assert method == "POST" and urlparse(path).path == "/gsp"
+        assert report.counters["files_failed"] == 1
+        assert "up.nt" not in state.entries
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)
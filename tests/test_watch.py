@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+""" test_watch
+tests concerning the watch mode syncing changes from filesystem events
+"""
+import shutil
+import time
+from pathlib import Path
+from threading import Event, Thread
+
+import pytest
+from conftest import make_sample_graph
+from util4tests import log, run_single_test
+
+from syncfstriples import SyncFsTriples
+from syncfstriples.service import get_stat_by_fname, perform_sync, sync_paths
+from syncfstriples.watch import InotifyWatcher, PollingWatcher, watch_changes
+
+
+class ScriptedWatcher:
+    """watcher replaying a script of change batches, then stopping"""
+
+    def __init__(self, script, stop_event):
+        self._script = list(script)
+        self._stop_event = stop_event
+
+    def read_events(self, timeout):
+        if not self._script:
+            self._stop_event.set()
+            return set()
+        return self._script.pop(0)
+
+
+def write_sample(fpath: Path, n: int) -> None:
+    g = make_sample_graph(range(n * 10, n * 10 + 3))
+    g.serialize(destination=str(fpath), format="turtle")
+
+
+def test_watch_changes_coalesce():
+    log.info("test_watch_changes_coalesce")
+    stop_event = Event()
+    a, b, c = Path("a.ttl"), Path("b.ttl"), Path("c.ttl")
+    # with a zero debounce every non-empty read is passed on directly
+    # while the empty reads (quiet periods) flush the pending changes
+    watcher = ScriptedWatcher([{a}, {a, b}, set(), {c}], stop_event)
+    batches = list()
+    watch_changes(watcher, batches.append, stop_event, debounce=0)
+    assert batches == [{a}, {a, b}, {c}]
+
+    stop_event = Event()
+    watcher = ScriptedWatcher([{a}, {a, b}, {c}, set()], stop_event)
+    batches = list()
+    watch_changes(watcher, batches.append, stop_event, debounce=60)
+    assert batches == []  # still waiting for quiet when stopped
+
+
+@pytest.mark.usefixtures("syncfolders")
+def test_polling_watcher(syncfolders):
+    log.info("test_polling_watcher")
+    syncpath = syncfolders[0]
+    fpath = syncpath / "polled.ttl"
+    watcher = PollingWatcher(syncpath, get_stat_by_fname, poll_interval=0)
+    assert watcher.read_events(timeout=0) == set()
+    write_sample(fpath, 1)
+    assert watcher.read_events(timeout=0) == {fpath}
+    fpath.unlink()
+    assert watcher.read_events(timeout=0) == {fpath}
+
+
+@pytest.mark.skipif(
+    not InotifyWatcher.available(), reason="inotify not available"
+)
+@pytest.mark.usefixtures("syncfolders")
+def test_inotify_watcher(syncfolders):
+    log.info("test_inotify_watcher")
+    syncpath = syncfolders[0]
+    watcher = InotifyWatcher(syncpath)
+    try:
+        assert watcher.read_events(timeout=0) == set()
+        subpath = syncpath / "sub"
+        subpath.mkdir()
+        assert subpath in watcher.read_events(timeout=1)
+        fpath = subpath / "notified.ttl"
+        write_sample(fpath, 1)
+        assert fpath in watcher.read_events(timeout=1)
+    finally:
+        watcher.close()
+
+
+@pytest.mark.usefixtures("rdf_stores", "syncfolders")
+def test_sync_paths(rdf_stores, syncfolders):
+    log.info(f"test_sync_paths ({len(syncfolders)})")
+    for rdf_store, syncpath in zip(rdf_stores, syncfolders):
+        subpath = syncpath / "sub"
+        subpath.mkdir()
+        write_sample(syncpath / "top.ttl", 1)
+        write_sample(subpath / "nested-1.ttl", 2)
+        write_sample(subpath / "nested-2.ttl", 3)
+        perform_sync(syncpath, rdf_store)
+        known_keys = set(rdf_store.keys)
+        assert len(known_keys) == 3
+
+        # only what is reported gets synced
+        write_sample(syncpath / "new.ttl", 4)
+        write_sample(syncpath / "unreported.ttl", 5)
+        sync_paths(syncpath, rdf_store, [syncpath / "new.ttl"], known_keys)
+        assert set(rdf_store.keys) == known_keys
+        assert "new.ttl" in known_keys
+        assert "unreported.ttl" not in known_keys
+
+        # removing a folder removes all nested
+        shutil.rmtree(subpath)
+        sync_paths(syncpath, rdf_store, [subpath], known_keys)
+        assert set(rdf_store.keys) == known_keys == {"top.ttl", "new.ttl"}
+
+
+@pytest.mark.usefixtures("store_builds", "syncfolders")
+def test_service_watch(store_builds, syncfolders):
+    log.info(f"test_service_watch ({len(store_builds)})")
+    base = "urn:sync:via-watch:"
+    for store_build, syncpath in zip(store_builds, syncfolders):
+        write_sample(syncpath / "initial.ttl", 1)
+        sft = SyncFsTriples(str(syncpath), base, *store_build.store_info)
+        stop_event = Event()
+        watching = Thread(
+            target=sft.watch,
+            kwargs=dict(
+                stop_event=stop_event,
+                debounce=0.1,
+                poll_interval=0.1,
+                polling=True,
+            ),
+        )
+        watching.start()
+        try:
+
+            def wait_for_keys(expected: set) -> bool:
+                deadline = time.monotonic() + 10
+                while time.monotonic() < deadline:
+                    if set(sft.rdfstore.keys) == expected:
+                        return True
+                    time.sleep(0.1)
+                return False
+
+            assert wait_for_keys({"initial.ttl"})
+            write_sample(syncpath / "watched.ttl", 2)
+            assert wait_for_keys({"initial.ttl", "watched.ttl"})
+            (syncpath / "initial.ttl").unlink()
+            assert wait_for_keys({"watched.ttl"})
+        finally:
+            stop_event.set()
+            watching.join()
+
+
+if __name__ == "__main__":
+    run_single_test(__file__)